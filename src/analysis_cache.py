@@ -0,0 +1,171 @@
+"""Bounded in-memory cache for loaded files, groups and analysis results.
+
+Results are keyed by a fingerprint of the columns they were computed from (or of the file they were read from) plus the variables and parameters used, so a rerun of the website with the same inputs does not hash or copy the whole DataFrame. Entries are evicted least recently used first once the cache holds more than its memory budget.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+import numpy as np
+import pandas as pd
+from instrumentation import stage
+from helper_methods import GroupStats, build_results, check_groups, get_descriptive_stats, get_groups
+
+
+def dataset_fingerprint(df: pd.DataFrame, columns: List[str] = None) -> str:
+    """Hashes the values of the given columns of df (all columns if not passed). Equal data gives an equal fingerprint."""
+    if columns is not None:
+        df = df[columns]
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((df.shape, list(df.columns), [str(dtype) for dtype in df.dtypes])).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def content_fingerprint(content: bytes) -> str:
+    """Hashes the raw contents of a data file. Usable in place of dataset_fingerprint for any columns read from that file, without hashing them again."""
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def params_key(params: dict) -> tuple:
+    """Hashable, order-independent version of a params dict."""
+    return tuple(sorted(params.items()))
+
+
+def estimate_size(value) -> int:
+    """Approximate number of bytes held by a cached value."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value.values())
+    if hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class AnalysisCache:
+    """Least recently used cache with a memory budget and hit/miss counters. Safe to share between threads.
+
+    Cached objects are returned as they are, not copied, so callers must not modify them.
+
+    Args:
+        max_bytes (int): Memory budget. Least recently used entries are evicted once the estimated size of all entries exceeds it.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value) -> None:
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # Values larger than the whole budget are not kept
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return
+
+    def get_or_compute(self, key: Hashable, compute: Callable):
+        """Returns the cached value of key, computing and storing it with compute() on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def items(self) -> list:
+        """(key, value) of every entry, least recently used first."""
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+        return
+
+    def info(self) -> dict:
+        """Counters and memory use of the cache."""
+        with self._lock:
+            return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions, 'entries':len(self._entries), 'bytes':self.current_bytes, 'max_bytes':self.max_bytes}
+
+
+# Shared by every session of the website; the budget can be set in megabytes with ANALYSIS_CACHE_MAX_MB
+default_cache = AnalysisCache(max_bytes=int(float(os.environ.get('ANALYSIS_CACHE_MAX_MB', 256)) * 2**20))
+
+
+def cached_get_groups(df: pd.DataFrame, measure_var: str, group_var: str, cache: AnalysisCache = default_cache, fingerprint: str = None):
+    """get_groups, cached by fingerprint or, if not passed, by the fingerprint of the two columns used."""
+    if fingerprint is None:
+        fingerprint = dataset_fingerprint(df, [measure_var, group_var])
+    key = (fingerprint, measure_var, group_var, 'groups')
+    with stage('get_groups'):
+        return cache.get_or_compute(key, lambda: get_groups(df=df, measure_var=measure_var, group_var=group_var))
+
+
+def run_cached_analysis(df: pd.DataFrame, measure_var: str, group_var: str, params: dict, cache: AnalysisCache = default_cache, fingerprint: str = None) -> dict:
+    """Runs every step of the analysis like helper_methods.run_analysis, caching each step's result separately.
+
+    Args:
+        df (pd.DataFrame): Original dataset.
+
+        measure_var (str): Variable in df upon which groups are compared.
+
+        group_var (str): Variable in df upon which groupings are performed.
+
+        params (dict): Collection of passed parameters, see helper_methods.get_default_params.
+
+        cache (AnalysisCache): Cache to use. Defaults to the cache shared by the website.
+
+        fingerprint (str, optional): Fingerprint of the data, such as the content_fingerprint of the file df was read from. Defaults to the dataset_fingerprint of the measure_var and group_var columns.
+
+    Returns:
+        results (dict): Result tables of helper_methods.build_results.
+
+    Raises:
+        GroupingError: If the groups fail helper_methods.check_groups.
+    """
+    if fingerprint is None:
+        with stage('fingerprint'):
+            fingerprint = dataset_fingerprint(df, [measure_var, group_var])
+    group_names, groups = cached_get_groups(df=df, measure_var=measure_var, group_var=group_var, cache=cache, fingerprint=fingerprint)
+    check_groups(group_names=group_names, groups=groups, params=params)
+
+    def step(name: str, compute: Callable, use_params: bool = True):
+        key = (fingerprint, measure_var, group_var, name, params_key(params) if use_params else None)
+        with stage(name):
+            return cache.get_or_compute(key, compute)
+
+    group_stats = step('group_stats', lambda: GroupStats.from_groups(groups), use_params=False)
+    descriptive_stats = step('descriptive_stats', lambda: get_descriptive_stats(df=df, group_var=group_var, measure_var=measure_var, group_names=group_names, group_stats=group_stats), use_params=False)
+    return build_results(group_names=group_names, groups=groups, group_stats=group_stats, params=params, descriptive_stats=descriptive_stats, step=step)
@@ -0,0 +1,382 @@
+"""Local HTTP/JSON service that runs the analysis for other systems, such as a district portal.
+
+Each analysis runs in a bounded pool of worker processes, so a slow request never blocks the server. Identical requests that arrive while the first is still running share its result instead of being computed again, and finished results are kept in an AnalysisCache. Uses only the standard library and does not import streamlit.
+
+Endpoints (all bodies are JSON):
+    GET  /health     Status, worker count, requests in flight and cache counters.
+    POST /datasets   Stores a dataset and returns its dataset_id for later requests.
+    POST /analyze    Analyzes one measurement/grouping variable combination.
+    POST /batch      Analyzes many combinations of one dataset at once.
+
+A dataset is given inline as {"columns": [...], "data": [[...], ...]}, as {"records": [{...}, ...]}, as {"csv": "..."}, or by reference as {"dataset_id": "..."} or {"path": "..."} (a file inside --data-dir).
+
+Example:
+    python src/analysis_service.py --port 8765 --workers 4 --data-dir ./example_data
+    curl -s localhost:8765/analyze -d '{"dataset": {"path": "example_data.csv"}, "measure_var": "Final", "group_var": "Race"}'
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+import pandas as pd
+from analysis_cache import AnalysisCache, dataset_fingerprint, params_key
+from batch_analysis import get_combinations
+from helper_methods import categorize_columns, file_to_dataframe, flatten_table, get_default_params, run_analysis
+
+
+# Type of each parameter in get_default_params. Numbers given for a float may be whole; booleans are never numbers
+PARAM_TYPES = {
+    'alpha': float,
+    'center': str,
+    'normality_checker': str,
+    'normality_sample_size': int,
+    'homoskedasticity_checker': str,
+    'proportiontocut': float,
+    'correction': str,
+    'group_test': str,
+    'resampling': bool,
+    'n_resamples': int,
+    'max_resampled_values': int,
+    'resampling_workers': int,
+    'resampling_memory_mb': float,
+    'seed': int,
+    'min_group_size': int,
+    'max_groups': int,
+    'max_pairs': int,
+    'significant_pairs_only': bool
+}
+# Parameters that may also be null
+NULLABLE_PARAMS = {'normality_sample_size'}
+
+
+def is_param_type(name: str, value) -> bool:
+    """Whether value has the type of parameter name in PARAM_TYPES."""
+    if value is None:
+        return name in NULLABLE_PARAMS
+    expected = PARAM_TYPES[name]
+    if expected is bool:
+        return isinstance(value, bool)
+    if isinstance(value, bool):
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+class RequestError(Exception):
+    """A request that cannot be served, with the HTTP status to answer it with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def analyze_columns(df: pd.DataFrame, measure_var: str, group_var: str, params: dict) -> dict:
+    """Runs helper_methods.run_analysis in a worker process and converts every result table to a list of JSON records."""
+    results = run_analysis(df=df, measure_var=measure_var, group_var=group_var, params=params)
+    return {name: json.loads(flatten_table(table).to_json(orient='records')) for name, table in results.items()}
+
+
+class AnalysisService:
+    """Runs analyses in a bounded process pool, coalescing identical concurrent requests.
+
+    Args:
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+
+        max_pending (int): Largest number of analyses queued or running at once. Further requests wait for a free slot.
+
+        queue_timeout (float): Seconds a request waits for a free slot before it is turned away.
+
+        data_dir (str, optional): Directory that datasets may be referenced from by path. Path references are refused if not set.
+
+        cache_mb (float): Memory budget of the stored datasets and of the cached results, each.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = 64, queue_timeout: float = 30.0, data_dir: str = None, cache_mb: float = 256):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = self._create_executor()
+        self.queue_timeout = queue_timeout
+        self.data_dir = Path(data_dir).resolve() if data_dir is not None else None
+        self.datasets = AnalysisCache(max_bytes=int(cache_mb * 2**20))
+        self.results = AnalysisCache(max_bytes=int(cache_mb * 2**20))
+        self.coalesced = 0
+        self._in_flight = {}
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Worker processes are spawned rather than forked from the multithreaded server
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _submit_job(self, *args) -> Future:
+        """Submits to the pool, replacing it first if a worker died (for example, killed for using too much memory), which breaks the whole pool."""
+        try:
+            return self.executor.submit(*args)
+        except BrokenProcessPool:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._create_executor()
+            return self.executor.submit(*args)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        return
+
+    def load_dataset(self, spec: dict) -> pd.DataFrame:
+        """Builds the DataFrame described by a request's dataset spec."""
+        if not isinstance(spec, dict):
+            raise RequestError('dataset must be an object.')
+        if 'dataset_id' in spec:
+            df = self.datasets.get(spec['dataset_id'])
+            if df is None:
+                raise RequestError(f"Unknown dataset_id {spec['dataset_id']}. Store the dataset again with POST /datasets.", status=404)
+            return df
+        if 'path' in spec:
+            return self._load_path(spec['path'])
+        try:
+            if 'csv' in spec:
+                df = pd.read_csv(io.StringIO(spec['csv']))
+            elif 'records' in spec:
+                df = pd.DataFrame.from_records(spec['records'])
+            elif 'data' in spec:
+                df = pd.DataFrame(data=spec['data'], columns=spec.get('columns'))
+            else:
+                raise RequestError('dataset needs one of: columns and data, records, csv, dataset_id or path.')
+        except (ValueError, TypeError) as error:
+            raise RequestError(f'Could not read dataset: {error}') from error
+        return categorize_columns(df)
+
+    def _load_path(self, path: str) -> pd.DataFrame:
+        if self.data_dir is None:
+            raise RequestError('Datasets cannot be referenced by path because the service was started without --data-dir.', status=403)
+        resolved = (self.data_dir / path).resolve()
+        if self.data_dir not in resolved.parents or not resolved.is_file():
+            raise RequestError(f'No dataset at {path} in the data directory.', status=404)
+        key = ('path', str(resolved), resolved.stat().st_mtime_ns)
+        try:
+            return self.datasets.get_or_compute(key, lambda: file_to_dataframe(str(resolved)))
+        except TypeError as error:
+            raise RequestError(str(error)) from error
+
+    def store_dataset(self, spec: dict) -> dict:
+        df = self.load_dataset(spec)
+        dataset_id = dataset_fingerprint(df)
+        self.datasets.put(dataset_id, df)
+        return {'dataset_id': dataset_id, 'rows': len(df), 'columns': df.columns.to_list()}
+
+    def submit(self, df: pd.DataFrame, measure_var: str, group_var: str, params: dict) -> Future:
+        """Starts (or joins) the analysis of one combination. The future's result is the JSON-ready result tables."""
+        for var in (measure_var, group_var):
+            if var not in df.columns:
+                raise RequestError(f'Column {var} is not in the dataset.')
+        if measure_var == group_var:
+            raise RequestError('The measurement variable cannot be the same as the grouping variable.')
+        try:
+            key = (dataset_fingerprint(df, [measure_var, group_var]), measure_var, group_var, params_key(params))
+            hash(key)
+        except TypeError as error:
+            raise RequestError('params values must be numbers, strings, booleans or null.') from error
+
+        joined = self._join(key)
+        if joined is not None:
+            return joined
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise RequestError('The service is busy. Try again later.', status=503)
+        with self._lock:
+            # Another request may have started the same analysis while this one waited for a slot
+            if key in self._in_flight:
+                self._slots.release()
+                self.coalesced += 1
+                return self._in_flight[key]
+            future = self._submit_job(analyze_columns, df[[measure_var, group_var]], measure_var, group_var, params)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _join(self, key: tuple):
+        """Returns a future for a cached or running analysis of key, or None if it has to be started."""
+        missing = object()
+        cached = self.results.get(key, missing)
+        if cached is not missing:
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            if key in self._in_flight:
+                self.coalesced += 1
+                return self._in_flight[key]
+        return None
+
+    def _finish(self, key: tuple, future: Future) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is None:
+            self.results.put(key, future.result())
+        return
+
+    def analyze(self, body: dict) -> dict:
+        df = self.load_dataset(body.get('dataset'))
+        params = self._get_params(body)
+        measure_var, group_var = self._get_variables(body)
+        return {'measure_var': measure_var, 'group_var': group_var, **self._collect(self.submit(df, measure_var, group_var, params))}
+
+    def batch(self, body: dict) -> dict:
+        """Analyzes every requested combination concurrently. Combinations default to every numeric column except identifiers x every non-numeric column, as in batch_analysis.get_combinations."""
+        df = self.load_dataset(body.get('dataset'))
+        params = self._get_params(body)
+        pairs = body.get('pairs')
+        if pairs is None:
+            pairs = get_combinations(df)
+        elif not isinstance(pairs, list) or not all(isinstance(pair, list) and len(pair) == 2 for pair in pairs):
+            raise RequestError('pairs must be a list of [measure_var, group_var] pairs.')
+        submitted = []
+        for measure_var, group_var in pairs:
+            try:
+                submitted.append(self.submit(df, measure_var, group_var, params))
+            except RequestError as error:
+                if error.status == 503:
+                    raise
+                submitted.append(error)
+        analyses = []
+        for (measure_var, group_var), job in zip(pairs, submitted):
+            outcome = {'error': str(job)} if isinstance(job, RequestError) else self._collect(job)
+            analyses.append({'measure_var': measure_var, 'group_var': group_var, **outcome})
+        return {'analyses': analyses}
+
+    def _collect(self, future: Future) -> dict:
+        """Waits for an analysis. Errors of the analysis itself (such as unusable groups) are reported in the response."""
+        try:
+            return {'results': future.result()}
+        except (ValueError, KeyError, TypeError) as error:
+            return {'error': str(error)}
+        except BrokenProcessPool:
+            return {'error': 'The worker process stopped unexpectedly, possibly because it ran out of memory. Try again later.'}
+
+    def _get_params(self, body: dict) -> dict:
+        params = body.get('params', {})
+        if not isinstance(params, dict):
+            raise RequestError('params must be an object.')
+        unknown = set(params) - set(get_default_params())
+        if unknown:
+            raise RequestError(f"Unknown params: {', '.join(sorted(unknown))}.")
+        invalid = [name for name, value in params.items() if not is_param_type(name, value)]
+        if invalid:
+            raise RequestError(f"Params of the wrong type: {', '.join(f'{name} must be {PARAM_TYPES[name].__name__}' for name in sorted(invalid))}.")
+        return {**get_default_params(), **params}
+
+    def _get_variables(self, body: dict) -> tuple:
+        measure_var, group_var = body.get('measure_var'), body.get('group_var')
+        if not isinstance(measure_var, str) or not isinstance(group_var, str):
+            raise RequestError('measure_var and group_var are required.')
+        return measure_var, group_var
+
+    def health(self) -> dict:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {'status': 'ok', 'workers': self.workers, 'in_flight': in_flight, 'coalesced': self.coalesced, 'results_cache': self.results.info(), 'datasets_cache': self.datasets.info()}
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """Routes requests to the AnalysisService of the server."""
+
+    protocol_version = 'HTTP/1.1'
+    routes = {
+        ('GET', '/health'): lambda service, body: service.health(),
+        ('POST', '/datasets'): lambda service, body: service.store_dataset(body.get('dataset')),
+        ('POST', '/analyze'): lambda service, body: service.analyze(body),
+        ('POST', '/batch'): lambda service, body: service.batch(body)
+    }
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method: str) -> None:
+        try:
+            route = self.routes.get((method, self.path.split('?')[0].rstrip('/') or '/'))
+            if route is None:
+                raise RequestError(f'No endpoint {method} {self.path}.', status=404)
+            response = route(self.server.service, self._read_body() if method == 'POST' else {})
+            self._send(200, response)
+        except RequestError as error:
+            self._send(error.status, {'error': str(error)})
+        except Exception as error:
+            self.log_error('Unexpected error: %r', error)
+            self._send(500, {'error': f'{type(error).__name__}: {error}'})
+        return
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > self.server.max_body_bytes:
+            raise RequestError(f'Request body is larger than {self.server.max_body_bytes} bytes.', status=413)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as error:
+            raise RequestError(f'Request body is not valid JSON: {error}') from error
+        if not isinstance(body, dict):
+            raise RequestError('Request body must be a JSON object.')
+        return body
+
+    def _send(self, status: int, response: dict) -> None:
+        content = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        return
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the AnalysisService its handlers use."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, service: AnalysisService, max_body_bytes: int = 100 * 2**20):
+        super().__init__(address, AnalysisRequestHandler)
+        self.service = service
+        self.max_body_bytes = max_body_bytes
+
+
+def serve(host: str = '127.0.0.1', port: int = 8765, **service_options) -> AnalysisServer:
+    """Creates a server listening on host:port (port 0 picks a free port, see server.server_address). Call serve_forever() to run it, for example in a thread."""
+    return AnalysisServer((host, port), AnalysisService(**service_options))
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Serve the analysis as a local HTTP/JSON service.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on. Defaults to localhost only.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Number of worker processes. Defaults to the number of CPUs.')
+    parser.add_argument('--max-pending', type=int, default=64, help='Largest number of analyses queued or running at once.')
+    parser.add_argument('--queue-timeout', type=float, default=30.0, help='Seconds a request waits for a free slot before getting a 503.')
+    parser.add_argument('--data-dir', default=None, help='Directory that datasets may be referenced from by path.')
+    parser.add_argument('--cache-mb', type=float, default=256, help='Memory budget of stored datasets and of cached results, each.')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> None:
+    args = parse_args(argv)
+    server = serve(host=args.host, port=args.port, workers=args.workers, max_pending=args.max_pending, queue_timeout=args.queue_timeout, data_dir=args.data_dir, cache_mb=args.cache_mb)
+    print(f'Serving the analysis on http://{server.server_address[0]}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Headless batch analysis of a directory of gradebooks.
+
+Runs the same analysis as the website (descriptive stats, normality, homoskedasticity, ANOVA and pairwise tests) for every measurement column x grouping column of every file, and writes one consolidated report. Does not import streamlit.
+
+Example:
+    python src/batch_analysis.py ./gradebooks --output report.parquet --workers 8
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+import pandas as pd
+from helper_methods import NORMALITY_CHECKERS, file_to_dataframe, flatten_table, get_default_measure_vars, get_default_params, run_analysis
+from results_store import write_results
+
+FILE_TYPES = ['.csv', '.xls', '.xlsx']
+REPORT_KEYS = ['File', 'Measure Variable', 'Group Variable', 'Analysis', 'Group', 'Other Group']
+
+
+def find_gradebooks(directory: str, recursive: bool = False) -> List[Path]:
+    """Lists the csv/xls/xlsx files in directory, sorted by path."""
+    pattern = '**/*' if recursive else '*'
+    return sorted(path for path in Path(directory).glob(pattern) if path.suffix.lower() in FILE_TYPES)
+
+
+def get_combinations(df: pd.DataFrame, measure_vars: List[str] = None, group_vars: List[str] = None) -> List[tuple]:
+    """Lists the (measure_var, group_var) pairs to analyze. Defaults to every numeric column that is not an identifier (see helper_methods.get_default_measure_vars) x every non-numeric column."""
+    if measure_vars is None:
+        measure_vars = get_default_measure_vars(df)
+    if group_vars is None:
+        group_vars = df.select_dtypes(exclude='number').columns.to_list()
+    return [(measure_var, group_var) for measure_var in measure_vars for group_var in group_vars
+            if measure_var != group_var and measure_var in df.columns and group_var in df.columns]
+
+
+def results_to_records(results: dict) -> pd.DataFrame:
+    """Flattens the result tables of run_analysis into one long table with an Analysis column."""
+    tables = []
+    for analysis, table in results.items():
+        table = flatten_table(table)
+        table.insert(0, 'Analysis', analysis)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True, sort=False)
+
+
+def analyze_file(path: Path, params: dict, measure_vars: List[str] = None, group_vars: List[str] = None, results_dir: str = None) -> pd.DataFrame:
+    """Analyzes every combination of one file. Failures are recorded in the Error column instead of stopping the batch. If results_dir is passed, the results of every combination are also saved there with results_store.write_results."""
+    try:
+        with open(path, 'rb') as file:
+            df = file_to_dataframe(file)
+    except TypeError:
+        return pd.DataFrame([{'File': str(path), 'Analysis': 'error', 'Error': 'Could not read file as csv or excel.'}])
+
+    reports = []
+    for measure_var, group_var in get_combinations(df, measure_vars=measure_vars, group_vars=group_vars):
+        try:
+            results = run_analysis(df=df, measure_var=measure_var, group_var=group_var, params=params)
+            if results_dir is not None:
+                write_results(results, results_dir, df=df, measure_var=measure_var, group_var=group_var, params=params)
+            report = results_to_records(results)
+        except Exception as error:
+            report = pd.DataFrame([{'Analysis': 'error', 'Error': f'{type(error).__name__}: {error}'}])
+        report.insert(0, 'Group Variable', group_var)
+        report.insert(0, 'Measure Variable', measure_var)
+        report.insert(0, 'File', str(path))
+        reports.append(report)
+    if not reports:
+        return pd.DataFrame(columns=REPORT_KEYS)
+    return pd.concat(reports, ignore_index=True, sort=False)
+
+
+def run_batch(paths: List[Path], params: dict, measure_vars: List[str] = None, group_vars: List[str] = None, workers: int = None, results_dir: str = None) -> pd.DataFrame:
+    """Analyzes every file in a process pool and concatenates the reports in file order."""
+    if workers == 1:
+        reports = [analyze_file(path, params, measure_vars, group_vars, results_dir) for path in paths]
+    else:
+        chunksize = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            reports = list(executor.map(
+                analyze_file,
+                paths,
+                [params] * len(paths),
+                [measure_vars] * len(paths),
+                [group_vars] * len(paths),
+                [results_dir] * len(paths),
+                chunksize=chunksize
+            ))
+    if not reports:
+        return pd.DataFrame(columns=REPORT_KEYS)
+    return pd.concat(reports, ignore_index=True, sort=False)
+
+
+def write_report(report: pd.DataFrame, output: str) -> None:
+    """Writes the report as Parquet if output ends in .parquet, otherwise as csv."""
+    if Path(output).suffix.lower() == '.parquet':
+        # Mixed-type columns (e.g. Higher, conclusions with gaps) are stored as strings
+        for column in report.columns[report.dtypes == object]:
+            report[column] = report[column].map(lambda x: x if x is None or pd.isna(x) else str(x))
+        report.to_parquet(output, index=False)
+    else:
+        report.to_csv(output, index=False)
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    defaults = get_default_params()
+    parser = argparse.ArgumentParser(description='Analyze every gradebook in a directory without the website.')
+    parser.add_argument('directory', help='Directory containing .csv, .xls or .xlsx gradebooks.')
+    parser.add_argument('-o', '--output', default='report.csv', help='Report path. Written as Parquet if it ends in .parquet, otherwise csv.')
+    parser.add_argument('-r', '--recursive', action='store_true', help='Also search subdirectories.')
+    parser.add_argument('-m', '--measure', action='append', dest='measure_vars', help='Measurement column to analyze. Repeatable. Defaults to every numeric column except identifiers such as Student ID.')
+    parser.add_argument('-g', '--group', action='append', dest='group_vars', help='Grouping column to analyze. Repeatable. Defaults to every non-numeric column.')
+    parser.add_argument('--results-dir', default=None, help='Also save every analysis to this directory for later queries with results_store.py.')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Number of worker processes. Defaults to the number of CPUs.')
+    parser.add_argument('--confidence-level', type=float, default=round(1 - defaults['alpha'], 10))
+    parser.add_argument('--center', choices=['mean', 'median', 'trimmed'], default=defaults['center'])
+    parser.add_argument('--proportiontocut', type=float, default=defaults['proportiontocut'])
+    parser.add_argument('--correction', choices=['None', 'Holm', 'Bonferroni'], default=defaults['correction'])
+    parser.add_argument('--normality-checker', choices=NORMALITY_CHECKERS, default=defaults['normality_checker'])
+    parser.add_argument('--normality-sample-size', type=int, default=defaults['normality_sample_size'], help='Test normality on a random sample of this many values of larger groups.')
+    parser.add_argument('--group-test', choices=['ANOVA', 'Kruskal-Wallis', 'Automatic'], default=defaults['group_test'], help='Kruskal-Wallis and Dunn results are only reported with Kruskal-Wallis, or with Automatic when not all groups are normally distributed.')
+    parser.add_argument('--resampling', action='store_true', help='Also run the permutation ANOVA and bootstrap confidence intervals.')
+    parser.add_argument('--n-resamples', type=int, default=defaults['n_resamples'], help='Number of permutations and bootstrap resamples.')
+    parser.add_argument('--seed', type=int, default=defaults['seed'], help='Seed of the resampling and of normality samples, for reproducible results.')
+    parser.add_argument('--resampling-workers', type=int, default=defaults['resampling_workers'], help='Processes each permutation test and bootstrap spreads its resamples over. Results are the same for any number.')
+    parser.add_argument('--resampling-memory-mb', type=float, default=defaults['resampling_memory_mb'], help='Memory budget of each resampling process in megabytes.')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> None:
+    args = parse_args(argv)
+    params = get_default_params()
+    # Rounded like the website's sidebar, so equal settings give equal cache keys and results store paths
+    params.update({'alpha':round(1 - args.confidence_level, 10), 'center':args.center, 'proportiontocut':args.proportiontocut, 'correction':args.correction, 'normality_checker':args.normality_checker, 'normality_sample_size':args.normality_sample_size, 'group_test':args.group_test, 'resampling':args.resampling, 'n_resamples':args.n_resamples, 'seed':args.seed, 'resampling_workers':args.resampling_workers, 'resampling_memory_mb':args.resampling_memory_mb})
+    paths = find_gradebooks(args.directory, recursive=args.recursive)
+    report = run_batch(paths, params, measure_vars=args.measure_vars, group_vars=args.group_vars, workers=args.workers, results_dir=args.results_dir)
+    write_report(report, args.output)
+    print(f'Analyzed {len(paths)} files, wrote {len(report)} rows to {args.output}')
+    return
+
+
+if __name__ == '__main__':
+    main()
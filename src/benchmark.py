@@ -0,0 +1,98 @@
+"""Times and memory-profiles the analysis helpers across a grid of dataset sizes.
+
+Writes one JSON object per (rows, groups, step) to the output file so runs can be compared to catch regressions.
+
+Example:
+    python src/benchmark.py --rows 1000 100000 1000000 --groups 4 50 --output bench.jsonl
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from typing import Callable, List
+import numpy as np
+import pandas as pd
+import scipy
+from create_sample_data import create_sample_data
+from helper_methods import GroupStats, get_default_params, get_descriptive_stats, get_groups, run_multi_measure_analysis, test_anova, test_homoskedasticity, test_normality, test_pairwise
+
+
+def measure(function: Callable, repeat: int) -> dict:
+    """Best wall time over repeat calls, and the peak memory allocated during one more call."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds':min(times), 'mean_seconds':float(np.mean(times)), 'peak_bytes':peak}
+
+
+def benchmark_size(num_rows: int, num_groups: int, repeat: int, seed: int) -> List[dict]:
+    """Benchmarks every analysis step on one generated dataset."""
+    df = create_sample_data(num_rows=num_rows, num_groups=num_groups, seed=seed)
+    measure_var, group_var = 'Total', 'Race'
+    params = get_default_params()
+    group_names, groups = get_groups(df=df, measure_var=measure_var, group_var=group_var)
+    group_stats = GroupStats.from_groups(groups)
+    descriptive_stats = get_descriptive_stats(df=df, group_var=group_var, measure_var=measure_var, group_names=group_names, group_stats=group_stats)
+    measure_vars = df.select_dtypes(include='number').columns.drop('Student ID').to_list()
+
+    steps = {
+        'get_groups': lambda: get_groups(df=df, measure_var=measure_var, group_var=group_var),
+        'get_descriptive_stats': lambda: get_descriptive_stats(df=df, group_var=group_var, measure_var=measure_var),
+        'test_normality': lambda: test_normality(group_names=group_names, groups=groups, params=params),
+        'test_homoskedasticity': lambda: test_homoskedasticity(groups=groups, params=params),
+        'test_anova': lambda: test_anova(groups=groups, params=params),
+        'test_pairwise': lambda: test_pairwise(group_names=group_names, groups=groups, params=params, equal_var=True, descriptive_stats=descriptive_stats),
+        'run_multi_measure_analysis': lambda: run_multi_measure_analysis(df=df, measure_vars=measure_vars, group_var=group_var, params=params)
+    }
+    records = []
+    for step, function in steps.items():
+        record = {'step':step, 'rows':num_rows, 'groups':len(group_names)}
+        record.update(measure(function, repeat=repeat))
+        records.append(record)
+    return records
+
+
+def get_environment() -> dict:
+    return {
+        'timestamp':datetime.now(timezone.utc).isoformat(),
+        'python':platform.python_version(),
+        'numpy':np.__version__,
+        'pandas':pd.__version__,
+        'scipy':scipy.__version__,
+        'machine':platform.machine()
+    }
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the analysis helpers across dataset sizes.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--groups', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--repeat', type=int, default=3, help='Timed calls per step. The fastest is reported.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench.jsonl', help='JSON lines file to append results to.')
+    args = parser.parse_args(argv)
+
+    environment = get_environment()
+    # Shapiro-Wilk warns about large groups; the warnings are not part of the benchmark
+    warnings.simplefilter('ignore')
+    with open(args.output, 'a') as output:
+        for num_rows in args.rows:
+            for num_groups in args.groups:
+                for record in benchmark_size(num_rows=num_rows, num_groups=num_groups, repeat=args.repeat, seed=args.seed):
+                    record.update(environment)
+                    output.write(json.dumps(record) + '\n')
+                    print(f"{record['step']:>26} rows={num_rows:<9} groups={record['groups']:<5} {record['seconds'] * 1000:10.2f} ms {record['peak_bytes'] / 2**20:10.2f} MiB")
+    return
+
+
+if __name__ == '__main__':
+    main()
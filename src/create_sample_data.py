@@ -1,99 +1,89 @@
+import argparse
 import numpy as np
 import pandas as pd
 from helper_methods import get_descriptive_stats
 
-n = 40
+NEIGHBORHOODS = ['West Central', 'Logan', 'Riverside', 'Peaceful Valley', "Brown's Addition"]
+RACES = ['White', 'Black', 'American Indian', 'Asian']
+# (name, mean, standard deviation) of the first measurement columns
+MEASURES = [('Quiz 1', 30, 15), ('Test 1', 50, 8), ('Final', 57, 28)]
 
-columns = ['Student ID', 'Quiz 1', 'Test 1', 'Final', 'Neighborhood', 'Race']
-# Create data
-data = np.ndarray(shape=(n, len(columns)), dtype='object')
-# Student
-data[:,0] = np.arange(0,n)
-# Quiz 1
-data[:,1] = np.random.normal(loc=30, scale=15, size=n)
-# Test 1
-data[:,2] = np.random.normal(loc=50, scale=8, size=n)
-# Final
-data[:,3] = np.random.normal(loc=57, scale=28, size=n)
-# Neighborhood
-neighborhoods = ['West Central', 'Logan', 'Riverside', 'Peaceful Valley', "Brown's Addition"]
-data[:,4] = np.random.choice(neighborhoods, n)
-# Race
-races = ['White', 'Black', 'American Indian', 'Asian']
-data[:,5] = np.random.choice(races, n)
 
+def get_group_labels(default_labels: list, num_groups: int, prefix: str) -> list:
+    """Uses the default labels if there are enough of them, otherwise numbered labels."""
+    if num_groups is None:
+        return default_labels
+    if num_groups <= len(default_labels):
+        return default_labels[:num_groups]
+    return [f'{prefix} {i + 1}' for i in range(num_groups)]
 
-# Create DataFrame
-df = pd.DataFrame(
-    columns = columns,
-    data = data,
-    dtype = 'object'
-)
 
+def get_group_probabilities(num_groups: int, group_skew: float) -> np.ndarray:
+    """Probability of each group, proportional to 1 / (rank ** group_skew). A skew of 0 gives equally likely groups."""
+    weights = 1 / np.arange(1, num_groups + 1) ** group_skew
+    return weights / weights.sum()
 
-# Convert to float
-numerical_cols = ['Quiz 1', 'Test 1', 'Final']
-for numerical_col in numerical_cols:
-    df[numerical_col] = df[numerical_col].astype('float')
 
+def create_sample_data(num_rows: int = 40, num_groups: int = None, num_measures: int = 3, group_skew: float = 0.0, effect_size: float = 1.0, seed: int = None) -> pd.DataFrame:
+    """Creates an artificial gradebook with two grouping variables (Neighborhood and Race) that shift the measurements.
 
-# Quiz 1 score adjustments
-df.loc[df['Race'] == races[0], 'Quiz 1'] = df.loc[df['Race'] == races[0], ['Quiz 1']].apply(lambda x: x - 20)
+    Args:
+        num_rows (int): Number of students.
 
-df.loc[df['Race'] == races[1],'Quiz 1'] = df.loc[df['Race'] == races[1], ['Quiz 1']].apply(lambda x: x + 15)
+        num_groups (int, optional): Number of groups of each grouping variable. Uses 5 neighborhoods and 4 races if not passed.
 
-df.loc[df['Race'] == races[2],'Quiz 1'] = df.loc[df['Race'] == races[2], ['Quiz 1']].apply(lambda x: x + 50)
+        num_measures (int): Number of measurement columns, not counting Total.
 
-df.loc[df['Race'] == races[3],'Quiz 1'] = df.loc[df['Race'] == races[3],['Quiz 1']].apply(lambda x: x - 10)
+        group_skew (float): How unevenly students are spread over groups. 0 gives groups of about equal size; larger values make the first groups larger.
 
-df.loc[df['Neighborhood'] == neighborhoods[0], ['Quiz 1']] = 50
+        effect_size (float): Standard deviation of each group's shift in mean, in units of the measurement's standard deviation. 0 gives no differences between groups.
 
-df.loc[df['Neighborhood'] == neighborhoods[1], ['Quiz 1']] = 30
+        seed (int, optional): Seed for reproducible data.
 
-df.loc[df['Neighborhood'] == neighborhoods[3], ['Quiz 1']] = 70
+    Returns:
+        df (pd.DataFrame): The gradebook, with columns Student ID, the measurements, Total, Neighborhood and Race.
+    """
+    rng = np.random.default_rng(seed)
+    neighborhoods = get_group_labels(NEIGHBORHOODS, num_groups, 'Neighborhood')
+    races = get_group_labels(RACES, num_groups, 'Race')
+    neighborhood_codes = rng.choice(len(neighborhoods), size=num_rows, p=get_group_probabilities(len(neighborhoods), group_skew))
+    race_codes = rng.choice(len(races), size=num_rows, p=get_group_probabilities(len(races), group_skew))
 
+    measures = MEASURES[:num_measures] + [(f'Assignment {i + 1}', 50, 15) for i in range(len(MEASURES), num_measures)]
+    means = np.array([mean for _, mean, _ in measures])
+    scales = np.array([scale for _, _, scale in measures])
+    # Each group shifts the mean of every measurement
+    neighborhood_effects = rng.normal(scale=effect_size, size=(len(neighborhoods), len(measures))) * scales
+    race_effects = rng.normal(scale=effect_size, size=(len(races), len(measures))) * scales
+    values = means + scales * rng.standard_normal((num_rows, len(measures))) + neighborhood_effects[neighborhood_codes] + race_effects[race_codes]
 
-# Test 1 score adjustments
-df[df['Race'] == races[3]]['Test 1'].update(df[df['Race'] == races[3]]['Test 1'].apply(lambda x: np.random.normal(loc=30, scale=2)))
+    df = pd.DataFrame(data=values, columns=[name for name, _, _ in measures])
+    df.insert(0, 'Student ID', np.arange(num_rows))
+    df['Total'] = values.sum(axis=1)
+    df['Neighborhood'] = pd.Categorical.from_codes(neighborhood_codes, categories=neighborhoods)
+    df['Race'] = pd.Categorical.from_codes(race_codes, categories=races)
+    return df
 
-df[df['Neighborhood'] == neighborhoods[0]]['Test 1'].update(df[df['Neighborhood'] == neighborhoods[0]]['Test 1'].apply(lambda x: x + 40))
 
-df[df['Neighborhood'] == neighborhoods[1]]['Test 1'].update(df[df['Neighborhood'] == neighborhoods[1]]['Test 1'].apply(lambda x: x -  30))
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create an artificial gradebook.')
+    parser.add_argument('--rows', type=int, default=40)
+    parser.add_argument('--groups', type=int, default=None)
+    parser.add_argument('--measures', type=int, default=3)
+    parser.add_argument('--group-skew', type=float, default=0.0)
+    parser.add_argument('--effect-size', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default='./example_data/example_data.csv')
+    args = parser.parse_args()
 
+    df = create_sample_data(num_rows=args.rows, num_groups=args.groups, num_measures=args.measures, group_skew=args.group_skew, effect_size=args.effect_size, seed=args.seed)
 
-# Final score adjustments
-df[df['Race'] == races[0]]['Final'].update(df[df['Race'] == races[0]]['Final'].apply(lambda x: np.random.normal(loc=90, scale=2)))
+    # Save data
+    df.to_csv(args.output, index=False)
 
-df[df['Race'] == races[1]]['Final'].update(df[df['Race'] == races[1]]['Final'].apply(lambda x: np.random.normal(loc=70, scale=3)))
-
-df[df['Race'] == races[2]]['Final'].update(df[df['Race'] == races[2]]['Final'].apply(lambda x: np.random.normal(loc=30, scale=1)))
-
-df[df['Race'] == races[3]]['Final'].update(df[df['Race'] == races[3]]['Final'].apply(lambda x: np.random.normal(loc=10, scale=2)))
-
-df[df['Neighborhood'] == neighborhoods[0]]['Final'].update(df[df['Neighborhood'] == neighborhoods[0]]['Final'].apply(lambda x: x -  30))
-
-df[df['Neighborhood'] == neighborhoods[1]]['Final'].update(df[df['Neighborhood'] == neighborhoods[1]]['Final'].apply(lambda x: x -  10))
-
-df[df['Neighborhood'] == neighborhoods[2]]['Final'].update(df[df['Neighborhood'] == neighborhoods[2]]['Final'].apply(lambda x: x +  30))
-
-df[df['Neighborhood'] == neighborhoods[3]]['Final'].update(df[df['Neighborhood'] == neighborhoods[3]]['Final'].apply(lambda x: x +  10))
-
-
-# Create Total
-df['Total'] = df[['Quiz 1', 'Test 1', 'Final']].sum(axis=1)
-
-
-# Rearrange columns
-df = df[['Student ID', 'Quiz 1', 'Test 1', 'Final', 'Total', 'Neighborhood', 'Race']]
-
-
-# Save data
-filename = './example_data/example_data.csv'
-df.to_csv(filename, index=False)
-
-
-# Print to check
-for group_var in ['Race', 'Neighborhood']:
-    for measure_var in numerical_cols:
-        print(f'\n\nGroup Var: {group_var}, Measure Var: {measure_var}')
-        print(get_descriptive_stats(df=df, group_var=group_var, measure_var=measure_var))
\ No newline at end of file
+    # Print to check
+    numerical_cols = [column for column in df.columns if column not in ['Student ID', 'Neighborhood', 'Race']]
+    for group_var in ['Race', 'Neighborhood']:
+        for measure_var in numerical_cols:
+            print(f'\n\nGroup Var: {group_var}, Measure Var: {measure_var}')
+            print(get_descriptive_stats(df=df, group_var=group_var, measure_var=measure_var))
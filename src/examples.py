@@ -0,0 +1,129 @@
+"""Bundled example gradebook and its precomputed analysis results.
+
+The website opens on the example data, so the analyses of every measurement/grouping variable combination of it with the default parameters can be computed ahead of time and stored next to the data. On a cold start they are then loaded into the shared AnalysisCache, so the first render does not run any tests. Stored results are only used if they came from the same analysis code and parameters; they are keyed by the content_fingerprint of the data file and the parameters like any other cached result.
+
+The stored results are pickled with the installed libraries, so they are not committed. Where the deployment has a build step, compute them there, with the same environment the website runs in:
+    python src/examples.py --precompute
+Without them (as on Streamlit Community Cloud) nothing is computed ahead of time: each combination is analyzed when a session first selects it and is then cached for every other session, like any other data.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import pickle
+import urllib.request
+from typing import List
+from urllib.parse import urlparse
+import pandas as pd
+import analysis_cache
+import helper_methods
+from analysis_cache import AnalysisCache, content_fingerprint, run_cached_analysis
+from batch_analysis import get_combinations
+from file_methods import atomic_write
+from helper_methods import GroupingError, get_default_params
+
+EXAMPLE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'example_data'))
+EXAMPLE_DATA_PATH = os.path.join(EXAMPLE_DIR, 'example_data.csv')
+EXAMPLE_RESULTS_PATH = os.path.join(EXAMPLE_DIR, 'example_results.pkl')
+
+
+def get_example_source() -> str:
+    """The bundled example data, unless the EXAMPLE_DATA_URL environment variable points to another copy."""
+    return os.environ.get('EXAMPLE_DATA_URL', EXAMPLE_DATA_PATH)
+
+
+def read_example_file(source: str = None) -> bytes:
+    """Raw contents of the example data at a local path or URL."""
+    source = source or get_example_source()
+    if urlparse(source).scheme in ('http', 'https', 'ftp', 'file'):
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+    with open(source, 'rb') as example_file:
+        return example_file.read()
+
+
+def load_example_data(source: str = None) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(read_example_file(source)))
+
+
+def get_analysis_version(params: dict = None) -> str:
+    """Hash of the analysis code and the parameters the stored results were computed with, so that results of other code or parameters are not reused."""
+    params = get_default_params() if params is None else params
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for module in (helper_methods, analysis_cache):
+        with open(module.__file__, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def precompute_example_results(path: str = EXAMPLE_RESULTS_PATH, params: dict = None) -> int:
+    """Analyzes every combination of the bundled example data and stores the cache entries at path.
+
+    Args:
+        path (str): Where to store the results.
+
+        params (dict, optional): Parameters to analyze with. Defaults to get_default_params, which matches the default sidebar.
+
+    Returns:
+        num_entries (int): Number of cache entries stored.
+    """
+    content = read_example_file(EXAMPLE_DATA_PATH)
+    df = pd.read_csv(io.BytesIO(content))
+    fingerprint = content_fingerprint(content)
+    params = get_default_params() if params is None else params
+    cache = AnalysisCache(max_bytes=2**40)
+    for measure_var, group_var in get_combinations(df):
+        try:
+            run_cached_analysis(df=df, measure_var=measure_var, group_var=group_var, params=params, cache=cache, fingerprint=fingerprint)
+        except GroupingError:
+            continue
+    entries = cache.items()
+    with atomic_write(path) as temporary:
+        with open(temporary, 'wb') as output:
+            # The version is written as a line of JSON ahead of the pickle, so it can be checked without unpickling
+            output.write(json.dumps({'version':get_analysis_version(params)}).encode() + b'\n')
+            pickle.dump(entries, output)
+    return len(entries)
+
+
+def seed_example_results(cache: AnalysisCache, path: str = EXAMPLE_RESULTS_PATH) -> int:
+    """Puts the stored example results into cache.
+
+    Returns:
+        num_entries (int): Number of entries loaded. 0 if there are no stored results, they came from other analysis code or parameters, or they cannot be read.
+    """
+    try:
+        with open(path, 'rb') as stored_file:
+            header = json.loads(stored_file.readline())
+            if header.get('version') != get_analysis_version():
+                return 0
+            entries = pickle.load(stored_file)
+    except Exception:
+        # Precomputed results only save time, so anything unreadable is recomputed instead
+        return 0
+    for key, value in entries:
+        cache.put(key, value)
+    return len(entries)
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Precompute the analyses of the bundled example data for the website.')
+    parser.add_argument('--precompute', action='store_true', help='Analyze every combination of the example data with the default parameters and store the results. Run in the build step of the deployment, if it has one.')
+    parser.add_argument('-o', '--output', default=EXAMPLE_RESULTS_PATH, help='Where to store the results.')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> None:
+    args = parse_args(argv)
+    if not args.precompute:
+        print('Nothing to do; pass --precompute to store the example results.')
+        return
+    num_entries = precompute_example_results(path=args.output)
+    print(f'Stored {num_entries} precomputed results in {args.output}')
+    return
+
+
+if __name__ == '__main__':
+    main()
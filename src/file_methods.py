@@ -0,0 +1,29 @@
+"""File helpers shared by the modules that write results, metrics and precomputed data."""
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path: str):
+    """Yields a temporary path next to path to write to, which replaces path once the with block succeeds.
+
+    Readers never see a partial file. Every call gets its own uniquely named temporary file, so concurrent writers (such as the threads serving website sessions) never overwrite each other's output; the last to finish wins. The temporary file is removed if the with block fails.
+
+    Args:
+        path (str): File to write. Its directory must exist.
+
+    Yields:
+        temporary (str): Path to write the contents to. Hidden and ending in .tmp, so directory scans and textfile collectors skip it.
+    """
+    path = os.fspath(path)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    os.close(descriptor)
+    try:
+        yield temporary
+        # mkstemp creates the file readable by its owner only; readers such as a metrics collector may run as another user
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
@@ -1,100 +1,558 @@
-from typing import List
-from scipy.stats import f_oneway, shapiro, levene, ttest_ind
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Union
+import numpy as np
 import pandas as pd
-import streamlit as st
+from instrumentation import stage
+# scipy is imported inside the functions that run tests, so importing this module (and starting the website) does not load it
+
+
+FILE_SIGNATURES = {
+    b'PK\x03\x04': 'xlsx',
+    b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1': 'xls'
+}
+
+
+def detect_file_format(file) -> str:
+    """Detects whether a file is csv, xls or xlsx from its first bytes, falling back to its extension.
+
+    Args:
+        file: Path, file object or bytes of the file. File objects are left at their current position.
+
+    Returns:
+        file_format (str): One of 'csv', 'xls' and 'xlsx'.
+    """
+    if isinstance(file, bytes):
+        header = file[:8]
+        name = ''
+    elif isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as opened:
+            header = opened.read(8)
+        name = str(file)
+    else:
+        position = file.tell()
+        header = file.read(8)
+        file.seek(position)
+        name = getattr(file, 'name', '') or ''
+    for signature, file_format in FILE_SIGNATURES.items():
+        if header.startswith(signature):
+            return file_format
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    if extension in ('xls', 'xlsx'):
+        return extension
+    return 'csv'
+
+
+def get_csv_engine() -> str:
+    """Returns the fastest csv parser available: pyarrow (needs pandas 1.4+) or pandas' own C parser."""
+    if importlib.util.find_spec('pyarrow') is None:
+        return 'c'
+    major, minor = (int(part) for part in pd.__version__.split('.')[:2])
+    return 'pyarrow' if (major, minor) >= (1, 4) else 'c'
+
+
+def categorize_columns(df: pd.DataFrame, max_unique_ratio: float = 0.5) -> pd.DataFrame:
+    """Converts low-cardinality text columns to the category dtype so that grouping on them is cheap.
+
+    Args:
+        df (pd.DataFrame): Dataset to convert in place.
+
+        max_unique_ratio (float): Text columns with at most this many distinct values per row are converted.
+
+    Returns:
+        df (pd.DataFrame): The converted dataset.
+    """
+    for column in df.select_dtypes(include=['object', 'string']).columns:
+        if df[column].nunique() <= max_unique_ratio * len(df):
+            df[column] = df[column].astype('category')
+    return df
+
 
-@st.cache
 def file_to_dataframe(file) -> pd.DataFrame:
+    """Reads a csv, xls or xlsx file. The format is detected from the file contents rather than by trial and error.
+
+    Args:
+        file: Path, file object or bytes of the file.
+
+    Returns:
+        df (pd.DataFrame): The dataset, with low-cardinality text columns as categories.
+    """
+    if isinstance(file, bytes):
+        file = io.BytesIO(file)
+    file_format = detect_file_format(file)
     try:
-        # read csv
-        df=pd.read_csv(file)
-    except:
-        try:
-            # read xls or xlsx
-            df=pd.read_excel(file)
-        except:
-            raise TypeError
-    return df
+        if file_format == 'csv':
+            df = pd.read_csv(file, engine=get_csv_engine())
+        else:
+            df = pd.read_excel(file)
+    except (ValueError, UnicodeDecodeError, zipfile.BadZipFile) as error:
+        raise TypeError(f'Could not read file as {file_format}.') from error
+    return categorize_columns(df)
 
 
-@st.cache
-def get_example_data() -> pd.DataFrame:
-    source = 'https://raw.githubusercontent.com/middlec000/grades_vs_student_characteristic/main/example_data/example_data.csv'
-    # source = './example_data/example1_data.csv'
-    return pd.read_csv(source)
+class GroupedArray:
+    """Groups of continuous values stored in one contiguous float64 buffer plus offsets.
 
+    Group i is values[offsets[i]:offsets[i+1]]. Indexing returns a zero-copy NumPy view, so a GroupedArray can be used anywhere a list of groups is expected: indexing, iteration, len() and unpacking into scipy.stats functions. The values may also be a 2D array of rows x measures, in which case each group is a block of rows.
+    """
 
-def create_sidebar() -> dict:
-    st.sidebar.write('# Additional Parameters')
-    confidence_level = st.sidebar.number_input(
-        label='Confidence Level:',
-        min_value=0.0,
-        max_value=1.0,
-        value=0.95
-    )
-    alpha = 1 - confidence_level
+    def __init__(self, values: np.ndarray, offsets: np.ndarray):
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
 
-    center = st.sidebar.selectbox(
-        label = 'Measure of Center:',
-        options = ['mean', 'median', 'trimmed'],
-        index = 0
-    )
+    @classmethod
+    def from_groups(cls, groups) -> 'GroupedArray':
+        """Packs a list of groups into a GroupedArray. A GroupedArray is returned unchanged."""
+        if isinstance(groups, cls):
+            return groups
+        arrays = [np.asarray(group, dtype=np.float64) for group in groups]
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(array) for array in arrays])
+        values = np.concatenate(arrays) if arrays else np.empty(0)
+        return cls(values=values, offsets=offsets)
 
-    if center == 'trimmed':
-        proportiontocut = st.sidebar.number_input(
-        label = 'Proportion to Cut:',
-        min_value=0.0,
-        max_value=1.0,
-        value=0.5
-    )
-    else:
-        proportiontocut = 0.5
+    @classmethod
+    def from_codes(cls, values: np.ndarray, codes: np.ndarray, offsets: np.ndarray) -> 'GroupedArray':
+        """Gathers the rows of values into groups with one stable argsort of their group codes, as returned by factorize_groups. Rows with code -1 are left out."""
+        rows = np.flatnonzero(codes >= 0)
+        order = rows[np.argsort(codes[rows], kind='stable')]
+        return cls(values=np.asarray(values)[order], offsets=offsets)
 
-    normality_checker = st.sidebar.selectbox(
-        label = 'How to Check Normality Assumption:',
-        options = ['Shapiro-Wilk Test'],
-        index = 0
-    )
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
 
-    homoskedasticity_checker = st.sidebar.selectbox(
-        label = 'How to Check Homoskedasticity Assumption:',
-        options = ['Levene Test'],
-        index = 0
-    )
+    def __getitem__(self, i: int) -> np.ndarray:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('group index out of range')
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Number of values in each group."""
+        return np.diff(self.offsets)
+
+    @property
+    def codes(self) -> np.ndarray:
+        """Group index of every value in the buffer."""
+        return np.repeat(np.arange(len(self)), self.sizes)
+
+
+class GroupStats:
+    """Per-group sufficient statistics computed in a single pass over a GroupedArray.
+
+    Stores the count, sum, sum of squared deviations from the group mean (m2), min, max and median of each group. The sum of squares is kept centered rather than raw so that variances stay accurate for large measurements, and so that two sets of statistics can be merged exactly. Descriptive stats, the one-way ANOVA and the pairwise t-tests are all derived from these arrays.
+    """
+
+    def __init__(self, counts: np.ndarray, sums: np.ndarray, m2: np.ndarray, mins: np.ndarray, maxs: np.ndarray, medians: np.ndarray):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.sums = np.asarray(sums, dtype=np.float64)
+        self.m2 = np.asarray(m2, dtype=np.float64)
+        self.mins = np.asarray(mins, dtype=np.float64)
+        self.maxs = np.asarray(maxs, dtype=np.float64)
+        self.medians = np.asarray(medians, dtype=np.float64)
+
+    @classmethod
+    def from_groups(cls, groups) -> 'GroupStats':
+        """Computes the statistics of each group. Accepts a GroupedArray, a list of groups, or a GroupStats (returned unchanged)."""
+        if isinstance(groups, cls):
+            return groups
+        groups = GroupedArray.from_groups(groups)
+        k = len(groups)
+        counts = groups.sizes
+        codes = groups.codes
+        values = groups.values
+        sums = np.bincount(codes, weights=values, minlength=k)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+        m2 = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=k)
+
+        # Sort within groups once for min, max and median
+        mins = np.full(k, np.nan)
+        maxs = np.full(k, np.nan)
+        medians = np.full(k, np.nan)
+        nonempty = counts > 0
+        if nonempty.any():
+            ordered = values[np.lexsort((values, codes))]
+            starts = groups.offsets[:-1][nonempty]
+            ends = groups.offsets[1:][nonempty]
+            mins[nonempty] = ordered[starts]
+            maxs[nonempty] = ordered[ends - 1]
+            medians[nonempty] = (ordered[(starts + ends - 1) // 2] + ordered[(starts + ends) // 2]) / 2
+        return cls(counts=counts, sums=sums, m2=m2, mins=mins, maxs=maxs, medians=medians)
+
+    @classmethod
+    def from_matrix(cls, groups: 'GroupedArray', medians: bool = True) -> 'GroupStats':
+        """Computes the statistics of each group in every column of a GroupedArray of rows x measures. Missing (NaN) values are skipped per column.
+
+        Each statistic is an array of groups x measures. Groups must be non-empty, as from get_grouped_matrix. Medians are left NaN if medians is False.
+        """
+        values = groups.values
+        starts = groups.offsets[:-1]
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        counts = np.add.reduceat(present, starts, axis=0)
+        sums = np.add.reduceat(filled, starts, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+        deviations = np.where(present, values - means[groups.codes], 0.0)
+        m2 = np.add.reduceat(deviations ** 2, starts, axis=0)
+        mins = np.fmin.reduceat(values, starts, axis=0)
+        maxs = np.fmax.reduceat(values, starts, axis=0)
+        # One vectorized median per group across every measure
+        group_medians = np.full(counts.shape, np.nan)
+        for i in np.flatnonzero(counts.any(axis=1)) if medians else []:
+            columns = counts[i] > 0
+            block = groups[i][:, columns]
+            # nanmedian falls back to a per-column loop, so only use it where values are missing
+            group_medians[i, columns] = np.median(block, axis=0) if present[groups.offsets[i]:groups.offsets[i + 1]].all() else np.nanmedian(block, axis=0)
+        return cls(counts=counts, sums=sums, m2=m2, mins=mins, maxs=maxs, medians=group_medians)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def means(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.sums / self.counts
+
+    @property
+    def variances(self) -> np.ndarray:
+        """Sample variance (ddof=1) of each group."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.m2 / (self.counts - 1)
+
+    @property
+    def stds(self) -> np.ndarray:
+        return np.sqrt(self.variances)
+
+    @classmethod
+    def empty(cls, num_groups: int) -> 'GroupStats':
+        """Statistics of num_groups groups that have no values yet."""
+        return cls(
+            counts=np.zeros(num_groups),
+            sums=np.zeros(num_groups),
+            m2=np.zeros(num_groups),
+            mins=np.full(num_groups, np.nan),
+            maxs=np.full(num_groups, np.nan),
+            medians=np.full(num_groups, np.nan)
+        )
+
+    def scatter(self, index: np.ndarray, num_groups: int) -> 'GroupStats':
+        """Places these groups at positions index of a larger set of num_groups groups. The other groups are empty."""
+        scattered = GroupStats.empty(num_groups)
+        for attr in ['counts', 'sums', 'm2', 'mins', 'maxs', 'medians']:
+            getattr(scattered, attr)[index] = getattr(self, attr)
+        return scattered
+
+    def take(self, index: np.ndarray) -> 'GroupStats':
+        """Statistics of the groups at positions index, in that order."""
+        return GroupStats(
+            counts=self.counts[index],
+            sums=self.sums[index],
+            m2=self.m2[index],
+            mins=self.mins[index],
+            maxs=self.maxs[index],
+            medians=self.medians[index]
+        )
+
+    def merge(self, other: 'GroupStats') -> 'GroupStats':
+        """Combines the statistics of the same groups computed on two disjoint sets of rows.
+
+        Uses the pairwise form of Welford's online algorithm (Chan et al.) for the sum of squared deviations, so it stays numerically stable however many times it is applied. Medians cannot be combined; they are kept only where one side is empty and are NaN elsewhere.
+        """
+        n_a, n_b = self.counts, other.counts
+        n = n_a + n_b
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = other.means - self.means
+            m2 = self.m2 + other.m2 + delta ** 2 * n_a * n_b / n
+        m2 = np.where(n_a == 0, other.m2, np.where(n_b == 0, self.m2, m2))
+        medians = np.where(n_b == 0, self.medians, np.where(n_a == 0, other.medians, np.nan))
+        return GroupStats(
+            counts=n,
+            sums=self.sums + other.sums,
+            m2=m2,
+            mins=np.fmin(self.mins, other.mins),
+            maxs=np.fmax(self.maxs, other.maxs),
+            medians=medians
+        )
 
-    return {'alpha':alpha, 'center':center, 'normality_checker':normality_checker, 'homoskedasticity_checker':homoskedasticity_checker, 'proportiontocut':proportiontocut}
+    def subtract(self, other: 'GroupStats') -> 'GroupStats':
+        """Removes the statistics of rows (other) from the statistics of a set of rows that contains them. The inverse of merge.
 
+        Min, max and median cannot be updated this way; they are kept where nothing is removed and are NaN elsewhere.
+        """
+        n, n_b = self.counts, other.counts
+        n_a = n - n_b
+        sums = self.sums - other.sums
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = other.means - sums / n_a
+            m2 = self.m2 - other.m2 - delta ** 2 * n_a * n_b / n
+        m2 = np.where(n_b == 0, self.m2, np.where(n_a <= 0, 0.0, np.maximum(m2, 0.0)))
+        sums = np.where(n_a <= 0, 0.0, sums)
+        untouched = n_b == 0
+        return GroupStats(
+            counts=np.maximum(n_a, 0),
+            sums=sums,
+            m2=m2,
+            mins=np.where(untouched, self.mins, np.nan),
+            maxs=np.where(untouched, self.maxs, np.nan),
+            medians=np.where(untouched, self.medians, np.nan)
+        )
 
-def visual_check(df: pd.DataFrame) -> None:
-    st.write('## Visually Check Data')
-    st.write('Below are the first few rows of your file. Please check that these are correct.')
-    st.write(df.head())
+
+class GroupRanks:
+    """Rank sums of each group from a single ranking of all values pooled together.
+
+    Ties get the average of the ranks they span. The ranking is done once, with one sort of the pooled values, and is shared by the Kruskal-Wallis test and every pairwise Dunn comparison.
+    """
+
+    def __init__(self, counts: np.ndarray, rank_sums: np.ndarray, tie_sum: float):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.rank_sums = np.asarray(rank_sums, dtype=np.float64)
+        # Sum of t^3 - t over every run of t tied values
+        self.tie_sum = float(tie_sum)
+
+    @classmethod
+    def from_groups(cls, groups) -> 'GroupRanks':
+        """Ranks the pooled values of the groups. Accepts a GroupedArray, a list of groups, or a GroupRanks (returned unchanged)."""
+        if isinstance(groups, cls):
+            return groups
+        groups = GroupedArray.from_groups(groups)
+        values = groups.values
+        total = len(values)
+        order = np.argsort(values, kind='stable')
+        ordered = values[order]
+        # Runs of equal values share the average of their ranks
+        run_starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]]) if total else np.empty(0, dtype=np.int64)
+        run_lengths = np.diff(np.r_[run_starts, total])
+        run_ranks = run_starts + (run_lengths + 1) / 2
+        ranks = np.empty(total)
+        ranks[order] = np.repeat(run_ranks, run_lengths)
+        rank_sums = np.bincount(groups.codes, weights=ranks, minlength=len(groups))
+        tie_sum = np.sum(run_lengths.astype(np.float64) ** 3 - run_lengths)
+        return cls(counts=groups.sizes, rank_sums=rank_sums, tie_sum=tie_sum)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def mean_ranks(self) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.rank_sums / self.counts
+
+
+class CellIndex:
+    """Sparse index of the cells of a crossing of several grouping variables, such as Race x Neighborhood.
+
+    Only the combinations of levels that occur in the data are stored. Cell i is the combination of levels levels[f][codes[i, f]] of each factor f, and cells are sorted by their codes.
+
+    Args:
+        factor_names (List[str]): Names of the grouping variables.
+
+        levels (List[List[str]]): Sorted names of the levels of each grouping variable.
+
+        codes (np.ndarray): Level code of each cell in each grouping variable, one row per cell.
+    """
+
+    def __init__(self, factor_names: List[str], levels: List[List[str]], codes: np.ndarray):
+        self.factor_names = list(factor_names)
+        self.levels = [list(factor_levels) for factor_levels in levels]
+        self.codes = np.asarray(codes, dtype=np.int64).reshape(-1, len(self.factor_names))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def names(self) -> List[str]:
+        """Name of each cell, such as 'Asian / Logan'."""
+        columns = [np.asarray(factor_levels, dtype=object)[self.codes[:, f]] for f, factor_levels in enumerate(self.levels)]
+        return [' / '.join(str(level) for level in cell) for cell in zip(*columns)]
+
+
+class GroupingError(ValueError):
+    """Raised when the groups of a grouping variable cannot be analyzed, such as when every student is in a group of their own."""
+
+
+def check_groups(group_names: List[str], groups: Union['GroupStats', 'GroupedArray', List[List[float]]], params: dict) -> None:
+    """Checks that the groups can be analyzed before any test runs. Catches grouping variables with too many distinct values, such as Student ID.
+
+    Args:
+        group_names (List[str]): Names of the groups.
+
+        groups (GroupStats | GroupedArray | List[List[float]]): Groups from get_groups, or their statistics.
+
+        params (dict): Collection of passed parameters as follows:
+            max_groups (int): Largest number of groups allowed. Defaults to 1000 if missing.
+
+            min_group_size (int): Smallest number of values allowed in a group. Defaults to 3 if missing.
+
+    Raises:
+        GroupingError: If there are fewer than 2 or more than max_groups groups, or a group has fewer than min_group_size values. The message is meant to be shown to the user.
+    """
+    sizes = groups.counts if isinstance(groups, GroupStats) else GroupedArray.from_groups(groups).sizes
+    max_groups = params.get('max_groups', 1000)
+    min_group_size = params.get('min_group_size', 3)
+    if len(group_names) < 2:
+        raise GroupingError('All students are in the same group. Choose a grouping variable that splits the students into multiple groups.')
+    if len(group_names) > max_groups:
+        raise GroupingError(f'The grouping variable has {len(group_names)} different values, more than the {max_groups} groups that can be compared. Choose a grouping variable with fewer values, such as a category rather than an identifier.')
+    small = np.flatnonzero(np.asarray(sizes) < min_group_size)
+    if len(small):
+        examples = ', '.join(str(group_names[i]) for i in small[:5])
+        raise GroupingError(f'{len(small)} of {len(group_names)} groups have fewer than {min_group_size} students (for example {examples}). Choose a grouping variable with larger groups, or combine small groups in your file.')
     return
 
 
-@st.cache
+def group_labels(column: pd.Series) -> pd.Series:
+    """Names of the groups of a grouping column as strings, missing where the group is.
+
+    A whole-number column is read as float when it has missing values, so whole-number floats are named like integers: group 1 is '1' whether or not some rows (or some chunks of a file) are missing their group.
+    """
+    if pd.api.types.is_float_dtype(column.dtype):
+        values = column.dropna()
+        # Beyond 2**53 floats are all whole numbers and no longer exact integers
+        if (values.abs() < 2**53).all() and (values % 1 == 0).all():
+            column = column.astype('Int64')
+    return column.astype(str).where(column.notna())
+
+
+def factorize_groups(column: pd.Series, keep: np.ndarray = None):
+    """Numbers the groups of a grouping column in sorted order of their names.
+
+    Args:
+        column (pd.Series): Grouping column. Categories are used as they are; other columns are named with group_labels.
+
+        keep (np.ndarray, optional): Which rows to count. Groups without a kept row are left out. Defaults to every row with a group.
+
+    Returns:
+        codes (np.ndarray): Group of each row, or -1 for rows without a group or not kept.
+
+        labels (List[str]): Sorted names of the groups.
+
+        offsets (np.ndarray): Where each group starts and ends once the rows are sorted by code, as in GroupedArray.
+    """
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = group_labels(column)
+    codes, uniques = pd.factorize(column, sort=True)
+    if keep is not None:
+        codes = np.where(keep, codes, -1)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    # Drop groups that lost all of their rows
+    present = counts > 0
+    labels = [str(name) for name in np.asarray(uniques)[present]]
+    codes = np.where(codes >= 0, (np.cumsum(present) - 1)[codes], -1)
+    offsets = np.zeros(len(labels) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts[present])
+    return codes, labels, offsets
+
+
 def get_groups(df: pd.DataFrame, measure_var: str, group_var: str):
-    group_names = list(df[group_var].astype(str).unique())
-    groups = []
-    for group_name in group_names:
-        groups += [list(df[df[group_var] == group_name][measure_var].values)]
-    # Check there are 2 or more groups
-    num_groups = len(group_names)
-    if num_groups == 1:
-        st.warning(f'All students have the same {group_var}. Choose another grouping variable that will split the students into multiple groups.')
-    return group_names, groups
-
-
-def get_menu_items() -> dict:
-    menu = {
-        "Get Help": None,
-        "Report a Bug": 'https://github.com/middlec000/grades_vs_student_characteristic',
-        "About": "Last Updated: December 5, 2021\n\nThis site is intended to be used by teachers to test if there are statistically significant differences in class performance between groups of students. These groups are formed using characteristics of the students such as ethnicity, income level, or neighborhood. These characteristics must be present in the data file before it is uploaded and likely must be added to the grades file by the teacher.\n\nThis site may be used by anyone wishing to investigate differences in a continuous variable between groups where groups are based on a categorical variable.\n\nView code at: [https://github.com/middlec000/grades_vs_student_characteristic](https://github.com/middlec000/grades_vs_student_characteristic)\n\nCreated by Colin Middleton.\n\nPersonal website: [https://middlec000.github.io/](https://middlec000.github.io/)"
-    }
-    return menu
+    """Splits measure_var into groups by the values of group_var.
+
+    The group column is factorized once and the measurements are gathered with a single stable argsort, so grouping is O(n log n) regardless of the number of groups. Rows with a missing measurement are dropped.
+
+    Args:
+        df (pd.DataFrame): Original dataset.
+
+        measure_var (str): Variable in df upon which groups are compared.
+
+        group_var (str): Variable in df upon which groupings are performed.
+
+    Returns:
+        group_names (List[str]): Sorted names of the groups.
+
+        groups (GroupedArray): Measurements of each group, in the same order as group_names.
+    """
+    values = df[measure_var].to_numpy(dtype=np.float64)
+    codes, group_names, offsets = factorize_groups(df[group_var], keep=~np.isnan(values))
+    return group_names, GroupedArray.from_codes(values, codes, offsets)
+
+
+def get_grouped_matrix(df: pd.DataFrame, measure_vars: List[str], group_var: str):
+    """Splits several measurement columns into groups by the values of group_var at once, for analyzing every measure together.
+
+    Like get_groups, but the rows are gathered into one 2D array of rows x measures with a single argsort. Missing measurements are kept as NaN so that each measure keeps all of its rows; rows with a missing group are dropped.
+
+    Args:
+        df (pd.DataFrame): Original dataset.
+
+        measure_vars (List[str]): Variables in df upon which groups are compared.
+
+        group_var (str): Variable in df upon which groupings are performed.
+
+    Returns:
+        group_names (List[str]): Sorted names of the groups.
+
+        groups (GroupedArray): Rows of each group, in the same order as group_names, with one column per measure.
+    """
+    values = df[measure_vars].to_numpy(dtype=np.float64)
+    codes, group_names, offsets = factorize_groups(df[group_var])
+    return group_names, GroupedArray.from_codes(values, codes, offsets)
+
+
+def get_cells(df: pd.DataFrame, measure_var: str, group_vars: List[str]):
+    """Splits measure_var into the cells of the crossing of several grouping variables.
+
+    Each grouping variable is factorized once and the level codes are combined into one integer per row, so only the cells that occur are ever created. Rows with a missing measurement or a missing level are dropped.
+
+    Args:
+        df (pd.DataFrame): Original dataset.
+
+        measure_var (str): Variable in df upon which groups are compared.
+
+        group_vars (List[str]): Variables in df upon which groupings are performed.
+
+    Returns:
+        cells (CellIndex): The occupied cells, in sorted order.
+
+        groups (GroupedArray): Measurements of each cell, in the same order as cells.
+    """
+    values = df[measure_var].to_numpy(dtype=np.float64)
+    keep = ~np.isnan(values)
+    factor_codes = []
+    levels = []
+    for group_var in group_vars:
+        codes, factor_levels, _ = factorize_groups(df[group_var])
+        keep &= codes >= 0
+        factor_codes.append(codes)
+        levels.append(factor_levels)
+    factor_codes = np.stack(factor_codes, axis=1)[keep]
+    values = values[keep]
+
+    # Combine the codes into one integer per row, or compare rows directly if the crossing is too large for int64
+    shape = [max(len(factor_levels), 1) for factor_levels in levels]
+    if np.prod(np.array(shape, dtype=float)) < 2 ** 62:
+        combined = np.ravel_multi_index(tuple(factor_codes.T), shape) if len(values) else np.empty(0, dtype=np.int64)
+        cell_ids, cell_codes = np.unique(combined, return_inverse=True)
+        cells = np.stack(np.unravel_index(cell_ids, shape), axis=1)
+    else:
+        cells, cell_codes = np.unique(factor_codes, axis=0, return_inverse=True)
+    cell_codes = cell_codes.ravel()
+
+    offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(cell_codes, minlength=len(cells)))
+    groups = GroupedArray.from_codes(values, cell_codes, offsets)
+    return CellIndex(factor_names=group_vars, levels=levels, codes=cells), groups
 
 
-def get_descriptive_stats(df: pd.DataFrame, group_var: str, measure_var: str) -> pd.DataFrame:
+def get_descriptive_stats(df: pd.DataFrame, group_var: str, measure_var: str, group_names: List[str] = None, group_stats: GroupStats = None) -> pd.DataFrame:
     """Generates descriptive statistics for each group.
 
     Args:
@@ -104,54 +562,194 @@ def get_descriptive_stats(df: pd.DataFrame, group_var: str, measure_var: str) ->
 
         measure_var (str): Variable in df upon which groups are compared.
 
+        group_names (List[str], optional): Names of the groups from get_groups. Required if group_stats is passed.
+
+        group_stats (GroupStats, optional): Precomputed statistics of the groups. If not passed, the groups are formed from df.
+
     Returns:
         summary (pd.DataFrame): Descriptive statistics of groups.
     """
-    summary = df.groupby(group_var)[measure_var].agg([
-        ('Min', 'min'),
-        ('Max', 'max'),
-        ('Mean','mean'),
-        ('Median', 'median'),
-        ('Standard Deviation', 'std')
-    ])
+    if group_stats is None:
+        group_names, groups = get_groups(df=df, measure_var=measure_var, group_var=group_var)
+        group_stats = GroupStats.from_groups(groups)
+    summary = pd.DataFrame(
+        index=pd.Index(group_names, name=group_var),
+        data={
+            'Min': group_stats.mins,
+            'Max': group_stats.maxs,
+            'Mean': group_stats.means,
+            'Median': group_stats.medians,
+            'Standard Deviation': group_stats.stds
+        }
+    )
     return summary
 
 
-def test_normality(group_names: List[str], groups: List[List[float]], params: dict) -> pd.DataFrame:
-    """Performs Shapiro-Wilk Test for normality. Tests each group to determine if it is normally distributed.
+NORMALITY_CHECKERS = ['Shapiro-Wilk Test', "D'Agostino K-Squared Test", 'Jarque-Bera Test', 'Anderson-Darling Test']
+
+
+def subsample_groups(groups: GroupedArray, max_size: int, seed: int) -> GroupedArray:
+    """Draws a random sample without replacement of max_size values from every group larger than that. Smaller groups are kept whole.
+
+    All groups are sampled at once by giving every value a random key and keeping the max_size smallest keys of each group.
+
+    Args:
+        groups (GroupedArray): Groups from get_groups.
+
+        max_size (int): Largest number of values kept per group.
+
+        seed (int): Seed of the random sample, so repeated analyses give the same result.
+
+    Returns:
+        samples (GroupedArray): Sampled values of each group, in the same order as groups.
+    """
+    if np.all(groups.sizes <= max_size):
+        return groups
+    codes = groups.codes
+    keys = np.random.default_rng(seed).random(len(codes))
+    order = np.lexsort((keys, codes))
+    # Position of each value within its group, in order of its random key
+    positions = np.arange(len(codes)) - groups.offsets[codes]
+    kept = order[positions < max_size]
+    sizes = np.minimum(groups.sizes, max_size)
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(sizes)
+    return GroupedArray(values=groups.values[kept], offsets=offsets)
+
+
+def moment_normality_tests(groups: GroupedArray, normality_checker: str):
+    """Performs a normality test on every group at once from the groups' central moments.
+
+    The D'Agostino K-squared test combines the z-scores of the sample skewness and kurtosis (as scipy.stats.normaltest). The Jarque-Bera test compares the skewness and kurtosis to those of a normal distribution (as scipy.stats.jarque_bera). The Anderson-Darling test compares each group's sorted standardized values to the normal CDF (statistic as scipy.stats.anderson), with the p-value of the small-sample adjusted statistic from D'Agostino and Stephens (1986). Groups too small for a test (fewer than 8 values, 3 for Jarque-Bera) get NaN.
+
+    Args:
+        groups (GroupedArray): Groups from get_groups.
+
+        normality_checker (str): Which test to perform. Options: "D'Agostino K-Squared Test", 'Jarque-Bera Test', and 'Anderson-Darling Test'.
+
+    Returns:
+        statistic (np.ndarray): Test statistic of each group.
+
+        pvalue (np.ndarray): p-value of each group.
+    """
+    from scipy.special import log_ndtr
+    from scipy.stats import chi2
+    k = len(groups)
+    codes = groups.codes
+    values = groups.values
+    n = groups.sizes.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.bincount(codes, weights=values, minlength=k) / n
+        deviations = values - means[codes]
+        squared = deviations * deviations
+        m2 = np.bincount(codes, weights=squared, minlength=k) / n
+        m3 = np.bincount(codes, weights=squared * deviations, minlength=k) / n
+        m4 = np.bincount(codes, weights=squared * squared, minlength=k) / n
+        skewness = m3 / m2 ** 1.5
+        kurtosis = m4 / m2 ** 2
+
+        if normality_checker == "D'Agostino K-Squared Test":
+            # z-score of the skewness
+            y = skewness * np.sqrt((n + 1) * (n + 3) / (6 * (n - 2)))
+            beta2 = 3 * (n ** 2 + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2) * (n + 5) * (n + 7) * (n + 9))
+            w2 = -1 + np.sqrt(2 * (beta2 - 1))
+            delta = 1 / np.sqrt(0.5 * np.log(w2))
+            alpha = np.sqrt(2 / (w2 - 1))
+            y = np.where(y == 0, 1, y)
+            z_skewness = delta * np.log(y / alpha + np.sqrt((y / alpha) ** 2 + 1))
+            # z-score of the kurtosis
+            expected = 3 * (n - 1) / (n + 1)
+            variance = 24 * n * (n - 2) * (n - 3) / ((n + 1) ** 2 * (n + 3) * (n + 5))
+            x = (kurtosis - expected) / np.sqrt(variance)
+            root_beta1 = 6 * (n ** 2 - 5 * n + 2) / ((n + 7) * (n + 9)) * np.sqrt(6 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3)))
+            a = 6 + 8 / root_beta1 * (2 / root_beta1 + np.sqrt(1 + 4 / root_beta1 ** 2))
+            denominator = 1 + x * np.sqrt(2 / (a - 4))
+            term = np.sign(denominator) * np.where(denominator == 0, np.nan, ((1 - 2 / a) / np.abs(denominator)) ** (1 / 3))
+            z_kurtosis = (1 - 2 / (9 * a) - term) / np.sqrt(2 / (9 * a))
+            statistic = z_skewness ** 2 + z_kurtosis ** 2
+            pvalue = chi2.sf(statistic, 2)
+            min_size = 8
+        elif normality_checker == 'Jarque-Bera Test':
+            statistic = n / 6 * (skewness ** 2 + (kurtosis - 3) ** 2 / 4)
+            pvalue = chi2.sf(statistic, 2)
+            min_size = 3
+        elif normality_checker == 'Anderson-Darling Test':
+            ordered = values[np.lexsort((values, codes))]
+            standardized = (ordered - means[codes]) / np.sqrt(m2 * n / (n - 1))[codes]
+            # The i-th smallest value of a group is paired with its i-th largest
+            positions = np.arange(len(values)) - groups.offsets[codes]
+            mirrored = groups.offsets[codes] + groups.sizes[codes] - 1 - positions
+            terms = (2 * positions + 1) / n[codes] * (log_ndtr(standardized) + log_ndtr(-standardized[mirrored]))
+            statistic = -n - np.bincount(codes, weights=terms, minlength=k)
+            adjusted = statistic * (1 + 0.75 / n + 2.25 / n ** 2)
+            pvalue = np.select(
+                [adjusted >= 0.6, adjusted >= 0.34, adjusted >= 0.2],
+                [np.exp(1.2937 - 5.709 * adjusted + 0.0186 * adjusted ** 2), np.exp(0.9177 - 4.279 * adjusted - 1.38 * adjusted ** 2), 1 - np.exp(-8.318 + 42.796 * adjusted - 59.938 * adjusted ** 2)],
+                default=1 - np.exp(-13.436 + 101.14 * adjusted - 223.73 * adjusted ** 2)
+            )
+            pvalue = np.clip(pvalue, 0.0, 1.0)
+            min_size = 8
+        else:
+            raise ValueError(f'Unknown normality checker: {normality_checker}')
+    too_small = n < min_size
+    return np.where(too_small, np.nan, statistic), np.where(too_small, np.nan, pvalue)
+
+
+def test_normality(group_names: List[str], groups: Union['GroupedArray', List[List[float]]], params: dict) -> pd.DataFrame:
+    """Tests each group to determine if it is normally distributed, with the test chosen by params['normality_checker'].
+
+    The Shapiro-Wilk test is run once per group, and recorded as a shapiro stage of that group. The other checkers are computed for every group at once, see moment_normality_tests.
 
     Args:
         group_names (List[str]): List of names/labels for the groups.
 
-        groups (List[List[float]]): List of groups. Each group is represented a list of continuous (float) values.
+        groups (GroupedArray | List[List[float]]): Groups from get_groups. Each group is a sequence of continuous (float) values; a plain list of lists is also accepted.
         
         params (dict): Collection of passed parameters as follows:
             alpha (float): Alpha corresponding to the confidence level.
 
             center (str): Which measure of center to use. Options: 'mean', 'median', and 'trimmed'.
 
-            normality_checker (str): Which method to use to check the normality assumption. Options: 'Shapiro-Wilk Test'
+            normality_checker (str): Which method to use to check the normality assumption. Options: see NORMALITY_CHECKERS. Defaults to 'Shapiro-Wilk Test' if missing.
 
             homoskedasticity_checker (str): Which method to use to check the homoskedasticity assumption. Options: 'Levene Test'
 
             proportiontocut (float): If 'trimmed' is the chosen measure of center, proportiontocut tells which proportion of the data to trim.
 
+            normality_sample_size (int, optional): If set, groups larger than this are tested on a random sample of this size. The Shapiro-Wilk p-value is not accurate above 5000 values.
+
+            seed (int): Seed of the random sample. Defaults to 0 if missing.
+
     Returns:
-        summary (pd.DataFrame): DataFrame that summarized the Shapiro-Wilk tests on each group. Records the test statistic, pvalue, and conclusion of hypothesis test.
+        summary (pd.DataFrame): DataFrame that summarized the normality tests on each group. Records the test statistic, pvalue, conclusion of hypothesis test (missing for groups that could not be tested), and number of values tested.
     """
-    columns = ['Statistic', 'p-Value', 'Normally Distributed?']
-    summary = pd.DataFrame(index=group_names, columns=columns)
-    for i in range(len(group_names)):
-        statistic, pvalue = shapiro(groups[i])
-        summary.loc[group_names[i]] = {columns[0]: statistic, columns[1]: pvalue, columns[2]: pvalue > params['alpha']}
+    from scipy.stats import shapiro
+    groups = GroupedArray.from_groups(groups)
+    if params.get('normality_sample_size'):
+        groups = subsample_groups(groups, max_size=params['normality_sample_size'], seed=params.get('seed', 0))
+    normality_checker = params.get('normality_checker', 'Shapiro-Wilk Test')
+    if normality_checker == 'Shapiro-Wilk Test':
+        statistic = np.empty(len(groups))
+        pvalue = np.empty(len(groups))
+        for i in range(len(group_names)):
+            with stage('shapiro', group=i):
+                statistic[i], pvalue[i] = shapiro(groups[i])
+    else:
+        statistic, pvalue = moment_normality_tests(groups, normality_checker)
+    pvalue = pd.Series(pvalue, index=group_names)
+    summary = pd.DataFrame(
+        index=group_names,
+        # Groups too small or constant to test have no p-value and no conclusion
+        data={'Statistic': statistic, 'p-Value': pvalue, 'Normally Distributed?': (pvalue > params['alpha']).where(pvalue.notna()), 'Sample Size': groups.sizes}
+    )
     return summary
 
 
-def test_homoskedasticity(groups: List[List[float]], params: dict) -> pd.DataFrame:
+def test_homoskedasticity(groups: Union['GroupedArray', List[List[float]]], params: dict) -> pd.DataFrame:
     """Performs Levene Test for homoskedasticity (equal variances) in groups.
 
     Args:
-        groups (List[List[float]]): List of groups. Each group is represented a list of continuous (float) values.
+        groups (GroupedArray | List[List[float]]): Groups from get_groups. Each group is a sequence of continuous (float) values; a plain list of lists is also accepted.
         
         params (dict): Collection of passed parameters as follows:
             alpha (float): Alpha corresponding to the confidence level.
@@ -167,16 +765,44 @@ def test_homoskedasticity(groups: List[List[float]], params: dict) -> pd.DataFra
     Returns:
         summary (pd.DataFrame): DataFrame that summarized the Levene test for homoskedasticity. Records the test statistic, pvalue, and conclusion of hypothesis test.
     """
+    from scipy.stats import levene
     statistic, pvalue = levene(*groups, center=params['center'], proportiontocut=params['proportiontocut'])
     summary = pd.DataFrame(columns=['Statistic', 'p-Value', 'Equal Variance?'], data=[[statistic, pvalue, pvalue > params['alpha']]])
     return summary
 
 
-def test_anova(groups: List[List[float]], params: dict) -> pd.DataFrame:
-    """Performs one-way ANOVA test on the passed groups.
+def anova_f_test(group_stats: GroupStats):
+    """Computes the one-way ANOVA F statistic and p-value from per-group statistics.
+
+    The statistics may be 1D (one measure) or groups x measures, in which case one F test is computed per measure. Groups without values in a measure are left out of that measure's test.
+
+    Args:
+        group_stats (GroupStats): Statistics of the groups.
+
+    Returns:
+        statistic (float | np.ndarray): F statistic, one per measure.
+
+        pvalue (float | np.ndarray): p-value of the F statistic, one per measure.
+    """
+    from scipy.stats import f as f_dist
+    counts = group_stats.counts
+    nonempty = counts > 0
+    num_groups = nonempty.sum(axis=0)
+    total = counts.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        grand_mean = group_stats.sums.sum(axis=0) / total
+        between = np.sum(np.where(nonempty, counts * (group_stats.means - grand_mean) ** 2, 0.0), axis=0)
+        within = group_stats.m2.sum(axis=0)
+        statistic = (between / (num_groups - 1)) / (within / (total - num_groups))
+    pvalue = f_dist.sf(statistic, num_groups - 1, total - num_groups)
+    return statistic, pvalue
+
+
+def test_anova(groups: Union['GroupStats', 'GroupedArray', List[List[float]]], params: dict) -> pd.DataFrame:
+    """Performs one-way ANOVA test on the passed groups. The F statistic is computed from the per-group sufficient statistics.
 
     Args:
-        groups (List[List[float]]): List of groups. Each group is represented a list of continuous (float) values.
+        groups (GroupStats | GroupedArray | List[List[float]]): Statistics of the groups, or the groups themselves from get_groups.
 
         params (dict): Collection of passed parameters as follows:
             alpha (float): Alpha corresponding to the confidence level.
@@ -192,18 +818,273 @@ def test_anova(groups: List[List[float]], params: dict) -> pd.DataFrame:
     Returns:
         summary (pd.DataFrame): DataFrame that summarized the ANOVA test. Records the test statistic, pvalue, and conclusion of hypothesis test.
     """
-    statistic, pvalue = f_oneway(*groups)
+    statistic, pvalue = anova_f_test(GroupStats.from_groups(groups))
     summary = pd.DataFrame(columns=['Statistic', 'p-Value', 'All Groups the Same?'], data=[[statistic, pvalue, pvalue > params['alpha']]])
     return summary
 
 
-def test_pairwise(group_names: List[str], groups: List[List[float]], params: dict, equal_var: bool, descriptive_stats: pd.DataFrame) -> pd.DataFrame:
-    """Performs pairwise t-tests for equal means on each pairing of the groups.
+def fit_additive_means(first: np.ndarray, second: np.ndarray, counts: np.ndarray, sums: np.ndarray) -> np.ndarray:
+    """Fits cell mean = first effect + second effect by least squares on the raw data, using only the count and sum of each occupied cell.
+
+    The effects of the factor with more levels are eliminated from the normal equations, which leaves a dense system the size of the factor with fewer levels. Memory therefore grows with the number of occupied cells and the smaller number of levels, not with the full crossing.
+
+    Args:
+        first (np.ndarray): Level code of each cell in the first factor.
+
+        second (np.ndarray): Level code of each cell in the second factor.
+
+        counts (np.ndarray): Number of observations in each cell.
+
+        sums (np.ndarray): Sum of the observations in each cell.
+
+    Returns:
+        fitted (np.ndarray): Fitted mean of each cell.
+    """
+    from scipy.sparse import coo_matrix, diags
+    num_first = first.max() + 1
+    num_second = second.max() + 1
+    if num_first < num_second:
+        first, second, num_first, num_second = second, first, num_second, num_first
+    counts = np.asarray(counts, dtype=np.float64)
+    first_counts = np.bincount(first, weights=counts, minlength=num_first)
+    second_counts = np.bincount(second, weights=counts, minlength=num_second)
+    first_sums = np.bincount(first, weights=sums, minlength=num_first)
+    second_sums = np.bincount(second, weights=sums, minlength=num_second)
+    # crossing[i, j] is the number of observations in the cell of level i of the first factor and level j of the second
+    crossing = coo_matrix((counts, (first, second)), shape=(num_first, num_second)).tocsr()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse_counts = np.where(first_counts > 0, 1 / first_counts, 0.0)
+        reduced = np.diag(second_counts) - (crossing.T @ diags(inverse_counts) @ crossing).toarray()
+        right_side = second_sums - crossing.T @ (first_sums * inverse_counts)
+    # The system is singular (one free constant per connected set of cells); any solution gives the same fitted values
+    second_effects = np.linalg.lstsq(reduced, right_side, rcond=None)[0]
+    first_effects = (first_sums - crossing @ second_effects) * inverse_counts
+    return first_effects[first] + second_effects[second]
+
+
+def test_two_way_anova(cells: CellIndex, groups: Union['GroupStats', 'GroupedArray', List[List[float]]], params: dict) -> pd.DataFrame:
+    """Performs a two-way ANOVA with main effects and interaction on the cells of two grouping variables.
+
+    Uses Type II sums of squares: each main effect is adjusted for the other, and the interaction for both. For balanced data this is the usual two-way decomposition. Every sum of squares is computed from the count, sum and sum of squared deviations of each occupied cell, so empty cells cost nothing.
+
+    Args:
+        cells (CellIndex): Cells of exactly two grouping variables, from get_cells.
+
+        groups (GroupStats | GroupedArray | List[List[float]]): Statistics of the cells, or the measurements of the cells themselves from get_cells.
+
+        params (dict): Collection of passed parameters as follows:
+            alpha (float): Alpha corresponding to the confidence level.
+
+    Returns:
+        summary (pd.DataFrame): One row per source of variation (each grouping variable, their interaction and the residual). Records the sum of squares, degrees of freedom, test statistic, pvalue, and conclusion of hypothesis test.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from scipy.stats import f as f_dist
+    if len(cells.factor_names) != 2:
+        raise ValueError(f'Two-way ANOVA needs exactly two grouping variables, got {len(cells.factor_names)}.')
+    group_stats = GroupStats.from_groups(groups)
+    counts = group_stats.counts
+    first, second = cells.codes[:, 0], cells.codes[:, 1]
+    total = counts.sum()
+    grand_mean = group_stats.sums.sum() / total
+
+    def explained(codes: np.ndarray) -> float:
+        """Sum of squares explained by the levels of one factor alone."""
+        level_counts = np.bincount(codes, weights=counts)
+        level_sums = np.bincount(codes, weights=group_stats.sums)
+        present = level_counts > 0
+        return np.sum((level_sums[present] / level_counts[present] - grand_mean) ** 2 * level_counts[present])
+
+    # Codes of the levels that occur, so the ranks below count only observed levels
+    first = np.unique(first, return_inverse=True)[1].ravel()
+    second = np.unique(second, return_inverse=True)[1].ravel()
+    num_first, num_second, num_cells = first.max() + 1, second.max() + 1, len(counts)
+    fitted = fit_additive_means(first=first, second=second, counts=counts, sums=group_stats.sums)
+    additive = np.sum(counts * (fitted - grand_mean) ** 2)
+    full = np.sum(counts * (group_stats.means - grand_mean) ** 2)
+    # Each connected set of cells shares one constant between the two factors
+    graph = coo_matrix((np.ones(num_cells), (first, second + num_first)), shape=(num_first + num_second, num_first + num_second))
+    num_components = connected_components(graph, directed=False)[0]
+    additive_rank = num_first + num_second - num_components
+
+    # Differences of sums of squares can round to just below zero
+    sums_of_squares = np.maximum([additive - explained(second), additive - explained(first), full - additive, group_stats.m2.sum()], 0.0)
+    dof = np.array([additive_rank - num_second, additive_rank - num_first, num_cells - additive_rank, total - num_cells], dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_squares = sums_of_squares / dof
+        statistic = np.where(dof > 0, mean_squares / mean_squares[3], np.nan)
+    statistic[3] = np.nan
+    pvalue = pd.Series(f_dist.sf(statistic, dof, dof[3]))
+    names = cells.factor_names
+    summary = pd.DataFrame(
+        index=pd.Index([names[0], names[1], f'{names[0]} x {names[1]}', 'Residual'], name='Source'),
+        data={
+            'Sum of Squares': sums_of_squares,
+            'Degrees of Freedom': dof,
+            'Statistic': statistic,
+            'p-Value': pvalue.to_numpy(),
+            'No Effect?': (pvalue > params['alpha']).where(pvalue.notna()).to_numpy()
+        }
+    )
+    return summary
+
+
+def adjust_pvalues(pvalues: np.ndarray, correction: str, num_tests: int = None) -> np.ndarray:
+    """Adjusts a family of p-values for multiple comparisons.
+
+    Args:
+        pvalues (np.ndarray): Unadjusted p-values, one per comparison. NaN p-values are left as they are and do not count towards the family size.
+
+        correction (str): Which correction to apply. Options: 'None', 'Holm', and 'Bonferroni'.
+
+        num_tests (int, optional): Size of the family, if pvalues are only its smallest p-values (as kept by select_top_pairs). Both corrections are exact for the smallest p-values of a family. Defaults to the number of non-NaN pvalues.
+
+    Returns:
+        adjusted (np.ndarray): Adjusted p-values in the same order as pvalues.
+    """
+    pvalues = np.asarray(pvalues, dtype=float)
+    adjusted = pvalues.copy()
+    if correction in (None, 'None'):
+        return adjusted
+    valid = ~np.isnan(pvalues)
+    p = pvalues[valid]
+    m = len(p) if num_tests is None else num_tests
+    if correction == 'Bonferroni':
+        adjusted[valid] = np.minimum(p * m, 1.0)
+    elif correction == 'Holm':
+        order = np.argsort(p, kind='stable')
+        stepped = np.maximum.accumulate((m - np.arange(len(p))) * p[order])
+        holm = np.empty(len(p))
+        holm[order] = np.minimum(stepped, 1.0)
+        adjusted[valid] = holm
+    else:
+        raise ValueError(f'Unknown multiple comparison correction: {correction}')
+    return adjusted
+
+
+def pairwise_t_tests(counts: np.ndarray, means: np.ndarray, variances: np.ndarray, equal_var: bool, pairs: tuple = None):
+    """Computes two-sample t-tests for every unique pair of groups (or the given pairs) at once from per-group summaries.
+
+    Gives the same statistic and p-value as scipy.stats.ttest_ind on the raw groups (Student's t-test if equal_var, else Welch's t-test).
+
+    Args:
+        counts (np.ndarray): Number of observations in each group.
+
+        means (np.ndarray): Mean of each group.
+
+        variances (np.ndarray): Sample variance (ddof=1) of each group.
+
+        equal_var (bool): Whether to pool the variances (Student) or not (Welch).
+
+        pairs (tuple, optional): Arrays (first, second) of the group indices of the pairs to test, such as a block from iter_pair_blocks. Defaults to every unique pair.
+
+    Returns:
+        first (np.ndarray): Index of the first group of each pair.
+
+        second (np.ndarray): Index of the second group of each pair. Always greater than first.
+
+        statistic (np.ndarray): t statistic of each pair, positive when the first group has the higher mean.
+
+        pvalue (np.ndarray): Two-sided p-value of each pair.
+    """
+    from scipy.stats import t as t_dist
+    counts = np.asarray(counts, dtype=float)
+    means = np.asarray(means, dtype=float)
+    variances = np.asarray(variances, dtype=float)
+    first, second = np.triu_indices(len(counts), k=1) if pairs is None else pairs
+    n1, n2 = counts[first], counts[second]
+    v1, v2 = variances[first], variances[second]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if equal_var:
+            dof = n1 + n2 - 2
+            pooled = ((n1 - 1) * v1 + (n2 - 1) * v2) / dof
+            standard_error = np.sqrt(pooled * (1 / n1 + 1 / n2))
+        else:
+            a = v1 / n1
+            b = v2 / n2
+            dof = (a + b) ** 2 / (a ** 2 / (n1 - 1) + b ** 2 / (n2 - 1))
+            standard_error = np.sqrt(a + b)
+        statistic = (means[first] - means[second]) / standard_error
+    pvalue = 2 * t_dist.sf(np.abs(statistic), dof)
+    return first, second, statistic, pvalue
+
+
+def iter_pair_blocks(num_groups: int, block_size: int = 2 ** 18):
+    """Yields the unique pairs of num_groups groups in blocks of about block_size pairs, in the order of np.triu_indices.
+
+    Args:
+        num_groups (int): Number of groups.
+
+        block_size (int): Approximate number of pairs per block. A block always holds every pair of at least one first group.
+
+    Yields:
+        pairs (tuple): Arrays (first, second) of the group indices of each pair in the block, with first < second.
+    """
+    start = 0
+    while start < num_groups - 1:
+        # Group i is the first group of num_groups - 1 - i pairs
+        pair_counts = np.cumsum(np.arange(num_groups - 1 - start, 0, -1))
+        stop = start + max(1, int(np.searchsorted(pair_counts, block_size, side='right')))
+        first = np.repeat(np.arange(start, stop), np.arange(num_groups - 1 - start, num_groups - 1 - stop, -1))
+        # Position of each pair among the pairs of its first group
+        offsets = np.r_[0, np.cumsum(num_groups - 1 - np.arange(start, stop))[:-1]]
+        second = first + 1 + np.arange(len(first)) - np.repeat(offsets, num_groups - 1 - np.arange(start, stop))
+        yield first, second
+        start = stop
+
+
+def select_top_pairs(blocks, max_pairs: int):
+    """Keeps the max_pairs most significant pairs of a stream of pairwise test results, without holding all pairs in memory.
+
+    Each block is merged into the pairs kept so far and cut back to max_pairs with a partial sort, so memory stays bounded by max_pairs plus one block.
+
+    Args:
+        blocks: Iterable of (first, second, statistic, pvalue) arrays, such as pairwise_t_tests over iter_pair_blocks.
+
+        max_pairs (int): Largest number of pairs kept.
+
+    Returns:
+        first (np.ndarray): Index of the first group of each kept pair, sorted from the smallest p-value.
+
+        second (np.ndarray): Index of the second group of each kept pair.
+
+        statistic (np.ndarray): Statistic of each kept pair.
+
+        pvalue (np.ndarray): Unadjusted p-value of each kept pair.
+
+        num_tests (int): Number of pairs with a p-value among all blocks, for adjust_pvalues.
+    """
+    kept = [np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)]
+    num_tests = 0
+    for block in blocks:
+        num_tests += int(np.count_nonzero(~np.isnan(block[3])))
+        kept = [np.concatenate([old, new]) for old, new in zip(kept, block)]
+        if len(kept[3]) > max_pairs:
+            # NaN p-values sort last so they are dropped first
+            best = np.argpartition(np.nan_to_num(kept[3], nan=np.inf), max_pairs - 1)[:max_pairs]
+            kept = [array[best] for array in kept]
+    order = np.argsort(np.nan_to_num(kept[3], nan=np.inf), kind='stable')
+    first, second, statistic, pvalue = (array[order] for array in kept)
+    return first, second, statistic, pvalue, num_tests
+
+
+def keep_significant_pairs(first: np.ndarray, second: np.ndarray, statistic: np.ndarray, pvalue: np.ndarray, num_tests: int, params: dict):
+    """Adjusts the p-values of the pairs kept by select_top_pairs and, if params['significant_pairs_only'] is set (the default), drops the pairs that are not significant."""
+    pvalue = adjust_pvalues(pvalue, params.get('correction', 'None'), num_tests=num_tests)
+    if params.get('significant_pairs_only', True):
+        significant = pvalue < params['alpha']
+        first, second, statistic, pvalue = first[significant], second[significant], statistic[significant], pvalue[significant]
+    return first, second, statistic, pvalue
+
+
+def test_pairwise(group_names: List[str], groups: Union['GroupStats', 'GroupedArray', List[List[float]]], params: dict, equal_var: bool, descriptive_stats: pd.DataFrame = None) -> pd.DataFrame:
+    """Performs pairwise t-tests for equal means on each unique pairing of the groups.
 
     Args:
         group_names (List[str]): List of group names.
 
-        groups (List[List[float]]): List of groups. Each group is represented a list of continuous (float) values.
+        groups (GroupStats | GroupedArray | List[List[float]]): Statistics of the groups, or the groups themselves from get_groups.
 
         params (dict): Collection of passed parameters as follows:
             alpha (float): Alpha corresponding to the confidence level.
@@ -216,46 +1097,543 @@ def test_pairwise(group_names: List[str], groups: List[List[float]], params: dic
 
             proportiontocut (float): If 'trimmed' is the chosen measure of center, proportiontocut tells which proportion of the data to trim.
 
+            correction (str): Multiple comparison correction applied to the pairwise p-values. Options: 'None', 'Holm', and 'Bonferroni'. Defaults to 'None' if missing.
+
+            max_pairs (int, optional): If there are more pairs than this, the pairs are tested in blocks and only the max_pairs most significant are kept, sorted by p-value. Defaults to 10000 if missing.
+
+            significant_pairs_only (bool): When there are more than max_pairs pairs, whether to also drop the pairs that are not significant. Defaults to True if missing.
+
         equal_var (bool): Result from homoskedasticity test.
 
-        descriptive_stats (pd.DataFrame): The descriptive stats by group produced earlier in the analysis.
+        descriptive_stats (pd.DataFrame, optional): The descriptive stats by group produced earlier in the analysis. Its Mean column decides the Higher group; the group means are used if not passed.
 
     Returns:
-        summary (pd.DataFrame): Summary of paired t-tests that records for each pairing the test statistic, pvalue, and conclusion of the hypothesis test.
-    """
-    # Create Two Level Index
-    first = []
-    second = []
-    for name1 in group_names:
-        for name2 in group_names:
-            if name1 != name2:
-                first.append(name1)
-                second.append(name2)
-    index = pd.MultiIndex.from_tuples(list(zip(first, second)))
-    columns = ['Statistic', 'p-Value', 'Different?', 'Higher']
-    summary = pd.DataFrame(index=index, columns=columns)
-    
-    # Get Results
-    for i in range(len(group_names)):
-        name1 = group_names[i]
-        group1 = groups[i]
-        for j in range(len(group_names)):
-            name2 = group_names[j]
-            group2 = groups[j]
-            statistic, pvalue = ttest_ind(group1, group2, equal_var=equal_var)
-            # Determine which has higher mean score
-            higher = ''
-            if descriptive_stats.loc[name1, 'Mean'] > descriptive_stats.loc[name2, 'Mean']:
-                higher = name1
-            else:
-                higher = name2
-            summary.loc[(name1, name2)] = {columns[0]:statistic, columns[1]:pvalue, columns[2]:pvalue < params['alpha'], columns[3]:higher}
-
-    for column in [x for x in summary.columns if x not in columns]:
-        summary = summary.drop(column, axis=1)
+        summary (pd.DataFrame): Summary of paired t-tests that records for each pairing the test statistic, pvalue (adjusted if a correction was chosen), and conclusion of the hypothesis test. summary.attrs['total_pairs'] is the number of pairs tested, which is more than the rows of summary if only the most significant pairs were kept.
+    """
+    group_stats = GroupStats.from_groups(groups)
+    total_pairs = len(group_stats) * (len(group_stats) - 1) // 2
+    if total_pairs <= params.get('max_pairs', 10000):
+        first, second, statistic, pvalue = pairwise_t_tests(counts=group_stats.counts, means=group_stats.means, variances=group_stats.variances, equal_var=equal_var)
+        pvalue = adjust_pvalues(pvalue, params.get('correction', 'None'))
+    else:
+        blocks = (
+            pairwise_t_tests(counts=group_stats.counts, means=group_stats.means, variances=group_stats.variances, equal_var=equal_var, pairs=pairs)
+            for pairs in iter_pair_blocks(len(group_stats))
+        )
+        first, second, statistic, pvalue = keep_significant_pairs(*select_top_pairs(blocks, max_pairs=params.get('max_pairs', 10000)), params=params)
+
+    # Determine which has higher mean score
+    names = np.array(group_names, dtype=object)
+    if descriptive_stats is None:
+        reported_means = group_stats.means
+    else:
+        reported_means = descriptive_stats['Mean'].reindex(group_names).to_numpy(dtype=float)
+    higher = np.where(reported_means[first] > reported_means[second], names[first], names[second])
+
+    index = pd.MultiIndex.from_arrays([names[first], names[second]])
+    summary = pd.DataFrame(
+        index=index,
+        data={'Statistic': statistic, 'p-Value': pvalue, 'Different?': pvalue < params['alpha'], 'Higher': higher}
+    )
+    summary.attrs['total_pairs'] = total_pairs
     return summary
 
-def file_format_example() -> pd.DataFrame:
-    data = {'Student ID (Optional, Not Used)':['Student ID 1', 'Student ID 2'], 'Measurement (Continuous)':['Measurement for Student 1', 'Measurement for Student 2'], 'Group (Categorical)':['Group for Student 1', 'Group for Student 2']}
-    example = pd.DataFrame(data=data)
-    return example
\ No newline at end of file
+
+def test_kruskal(groups: Union['GroupRanks', 'GroupedArray', List[List[float]]], params: dict) -> pd.DataFrame:
+    """Performs the Kruskal-Wallis H test on the passed groups. Does not require the groups to be normally distributed.
+
+    Args:
+        groups (GroupRanks | GroupedArray | List[List[float]]): Ranks of the groups, or the groups themselves from get_groups.
+
+        params (dict): Collection of passed parameters as follows:
+            alpha (float): Alpha corresponding to the confidence level.
+
+    Returns:
+        summary (pd.DataFrame): DataFrame that summarized the Kruskal-Wallis test. Records the test statistic, pvalue, and conclusion of hypothesis test.
+    """
+    from scipy.stats import chi2
+    group_ranks = GroupRanks.from_groups(groups)
+    total = group_ranks.total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistic = 12 / (total * (total + 1)) * np.sum(group_ranks.rank_sums ** 2 / group_ranks.counts) - 3 * (total + 1)
+        statistic /= 1 - group_ranks.tie_sum / (total ** 3 - total)
+    pvalue = chi2.sf(statistic, len(group_ranks) - 1)
+    summary = pd.DataFrame(columns=['Statistic', 'p-Value', 'All Groups the Same?'], data=[[statistic, pvalue, pvalue > params['alpha']]])
+    return summary
+
+
+def test_dunn(group_names: List[str], groups: Union['GroupRanks', 'GroupedArray', List[List[float]]], params: dict) -> pd.DataFrame:
+    """Performs Dunn's test on each unique pairing of the groups. This is the post-hoc test for Kruskal-Wallis.
+
+    Every z statistic comes from the mean ranks of the single pooled ranking, with the tie-corrected variance.
+
+    Args:
+        group_names (List[str]): List of group names.
+
+        groups (GroupRanks | GroupedArray | List[List[float]]): Ranks of the groups, or the groups themselves from get_groups.
+
+        params (dict): Collection of passed parameters as follows:
+            alpha (float): Alpha corresponding to the confidence level.
+
+            correction (str): Multiple comparison correction applied to the pairwise p-values. Options: 'None', 'Holm', and 'Bonferroni'. Defaults to 'None' if missing.
+
+            max_pairs (int, optional): If there are more pairs than this, only the most significant are kept, as in test_pairwise. Defaults to 10000 if missing.
+
+            significant_pairs_only (bool): When there are more than max_pairs pairs, whether to also drop the pairs that are not significant. Defaults to True if missing.
+
+    Returns:
+        summary (pd.DataFrame): Summary of Dunn's tests that records for each pairing the z statistic, pvalue (adjusted if a correction was chosen), conclusion of the hypothesis test, and the group with the higher mean rank. summary.attrs['total_pairs'] is the number of pairs tested.
+    """
+    from scipy.stats import norm
+    group_ranks = GroupRanks.from_groups(groups)
+    total = group_ranks.total
+    counts = group_ranks.counts.astype(np.float64)
+    mean_ranks = group_ranks.mean_ranks
+    variance = total * (total + 1) / 12 - group_ranks.tie_sum / (12 * (total - 1))
+
+    def dunn_z_tests(first: np.ndarray, second: np.ndarray):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            statistic = (mean_ranks[first] - mean_ranks[second]) / np.sqrt(variance * (1 / counts[first] + 1 / counts[second]))
+        return first, second, statistic, 2 * norm.sf(np.abs(statistic))
+
+    total_pairs = len(group_ranks) * (len(group_ranks) - 1) // 2
+    if total_pairs <= params.get('max_pairs', 10000):
+        first, second, statistic, pvalue = dunn_z_tests(*np.triu_indices(len(group_ranks), k=1))
+        pvalue = adjust_pvalues(pvalue, params.get('correction', 'None'))
+    else:
+        blocks = (dunn_z_tests(*pairs) for pairs in iter_pair_blocks(len(group_ranks)))
+        first, second, statistic, pvalue = keep_significant_pairs(*select_top_pairs(blocks, max_pairs=params.get('max_pairs', 10000)), params=params)
+
+    names = np.array(group_names, dtype=object)
+    higher = np.where(mean_ranks[first] > mean_ranks[second], names[first], names[second])
+    index = pd.MultiIndex.from_arrays([names[first], names[second]])
+    summary = pd.DataFrame(
+        index=index,
+        data={'Statistic': statistic, 'p-Value': pvalue, 'Different?': pvalue < params['alpha'], 'Higher': higher}
+    )
+    summary.attrs['total_pairs'] = total_pairs
+    return summary
+
+
+def get_resampling_batches(n_resamples: int, row_size: int, memory_budget_mb: float, seed: int, bytes_per_value: int = 8, fixed_bytes: int = 0) -> List[tuple]:
+    """Splits n_resamples into batches whose work arrays fit the memory budget.
+
+    Args:
+        n_resamples (int): Total number of resamples.
+
+        row_size (int): Number of values in one resample.
+
+        memory_budget_mb (float): Memory the work arrays of one batch may use. Every worker runs one batch at a time, so running batches use up to this times the number of workers. Does not cover the input values or imported libraries.
+
+        seed (int): Seed the batch seeds are spawned from.
+
+        bytes_per_value (int): Peak bytes the batch function allocates per resampled value.
+
+        fixed_bytes (int): Bytes the batch function allocates per batch regardless of its size.
+
+    Returns:
+        batches (List[tuple]): (batch size, seed sequence) of each batch. Each batch gets its own seed spawned from seed, so results do not depend on the order batches run in or the number of workers running them. The batch sizes, and so the random draws, depend on the budget.
+    """
+    budget = int(memory_budget_mb * 2**20) - fixed_bytes
+    batch_size = max(1, min(n_resamples, budget // (bytes_per_value * max(row_size, 1))))
+    num_batches = -(-n_resamples // batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(num_batches)
+    sizes = [batch_size] * (num_batches - 1) + [n_resamples - batch_size * (num_batches - 1)]
+    return list(zip(sizes, seeds))
+
+
+def get_resample_count(row_size: int, params: dict) -> int:
+    """Number of resamples to draw for row_size values: params['n_resamples'], lowered for large data so that at most params['max_resampled_values'] values are resampled in total, but never below 1000.
+
+    Every resampled value costs roughly 10-30 ns on one core, so the default cap of 2*10**8 values keeps each resampling test to a few seconds. For example, 10000 permutations of 100,000 rows would take about 25 s; they are lowered to 2000.
+    """
+    n_resamples = int(params.get('n_resamples', 10000))
+    affordable = int(params.get('max_resampled_values', 2 * 10**8)) // max(row_size, 1)
+    return min(n_resamples, max(affordable, 1000))
+
+
+def warn_fewer_resamples(table: pd.DataFrame, used: int, row_size: int, params: dict) -> None:
+    """If get_resample_count lowered params['n_resamples'], warns and records the message in table.attrs['warning'], so callers without the warnings (such as the website) can show it."""
+    requested = int(params.get('n_resamples', 10000))
+    if used < requested:
+        message = f'Only {used} of the requested {requested} resamples were made, to keep resampling {row_size} values fast.'
+        table.attrs['warning'] = message
+        warnings.warn(message, stacklevel=3)
+    return
+
+
+def run_resampling_batches(batch_function, values: np.ndarray, offsets: np.ndarray, batches: List[tuple], workers: int) -> np.ndarray:
+    """Runs batch_function(values, offsets, size, seed) for every batch, in a process pool if workers > 1, and stacks the results."""
+    if workers > 1 and len(batches) > 1:
+        # Spawned rather than forked, as the website and the analysis service call this from multithreaded servers
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(batch_function, repeat(values), repeat(offsets), *zip(*batches)))
+    else:
+        results = [batch_function(values, offsets, size, seed) for size, seed in batches]
+    return np.concatenate(results)
+
+
+def _between_group_term(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Sum over groups of (group sum)^2 / count for each row. With the total sum of squares fixed, F increases with it."""
+    return np.sum(sums ** 2 / counts, axis=-1)
+
+
+# Peak memory of _permutation_batch: the buffer of permuted values, plus one row
+PERMUTATION_BYTES_PER_VALUE = 8
+# Peak memory of _bootstrap_batch: the picks and the picked values of one group at a time
+BOOTSTRAP_BYTES_PER_VALUE = 16
+
+
+def _permutation_batch(values: np.ndarray, offsets: np.ndarray, size: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Between-group term of size permutations of values, one permutation per row."""
+    rng = np.random.default_rng(seed)
+    # Permuting row by row into one buffer is faster than shuffling a broadcast copy of every row at once
+    permuted = np.empty((size, len(values)))
+    for row in permuted:
+        row[:] = rng.permutation(values)
+    # Groups are contiguous in the buffer, so each group's sums are one reduceat per row
+    sums = np.add.reduceat(permuted, offsets[:-1], axis=1)
+    return _between_group_term(sums, np.diff(offsets))
+
+
+def _bootstrap_batch(values: np.ndarray, offsets: np.ndarray, size: int, seed: np.random.SeedSequence) -> np.ndarray:
+    """Group means of size bootstrap resamples (with replacement, within each group), one resample per row."""
+    rng = np.random.default_rng(seed)
+    counts = np.diff(offsets)
+    means = np.empty((size, len(counts)))
+    for group, (start, count) in enumerate(zip(offsets[:-1], counts)):
+        means[:, group] = values[start:start + count][rng.integers(0, count, size=(size, count))].mean(axis=1)
+    return means
+
+
+def test_permutation_anova(groups: Union['GroupedArray', List[List[float]]], params: dict) -> pd.DataFrame:
+    """Performs a permutation test of the one-way ANOVA F statistic. Does not require normally distributed groups.
+
+    The group labels are reshuffled n_resamples times and the p-value is the share of shuffles with an F statistic at least as large as the observed one. Shuffles are generated in batches as 2D arrays (one row per shuffle), sized to fit the memory budget. Each shuffle costs roughly 25 ns per value on one core, so fewer shuffles are made of large data, see get_resample_count.
+
+    Args:
+        groups (GroupedArray | List[List[float]]): Groups from get_groups. Each group is a sequence of continuous (float) values; a plain list of lists is also accepted.
+
+        params (dict): Collection of passed parameters as follows:
+            alpha (float): Alpha corresponding to the confidence level.
+
+            n_resamples (int): Number of permutations. Defaults to 10000.
+
+            max_resampled_values (int): Lowers n_resamples so that at most this many values are permuted in total. Defaults to 2*10**8.
+
+            seed (int): Seed for reproducible results. Equal seeds give equal results for any number of workers. Defaults to 0.
+
+            resampling_memory_mb (float): Memory budget of each worker's batch in megabytes. Defaults to 256.
+
+            resampling_workers (int): Number of processes to spread batches over. Defaults to 1.
+
+    Returns:
+        summary (pd.DataFrame): DataFrame that summarized the permutation test. Records the F statistic, permutation pvalue, conclusion of hypothesis test, and the number of permutations made. If fewer permutations were made than requested, summary.attrs['warning'] says so.
+    """
+    groups = GroupedArray.from_groups(groups)
+    n_resamples = get_resample_count(len(groups.values), params)
+    # Centering does not change F but keeps the squared sums small
+    values = groups.values - groups.values.mean()
+    counts = groups.sizes
+    statistic = test_anova(groups=groups, params=params)['Statistic'].values[0]
+    observed = _between_group_term(np.add.reduceat(values, groups.offsets[:-1]), counts)
+
+    workers = params.get('resampling_workers', 1)
+    batches = get_resampling_batches(n_resamples, len(values), params.get('resampling_memory_mb', 256), params.get('seed', 0), bytes_per_value=PERMUTATION_BYTES_PER_VALUE)
+    permuted = run_resampling_batches(_permutation_batch, values, groups.offsets, batches, workers)
+    tolerance = 1e-12 * max(abs(observed), 1)
+    pvalue = (1 + np.sum(permuted >= observed - tolerance)) / (1 + n_resamples)
+    summary = pd.DataFrame(columns=['Statistic', 'p-Value', 'All Groups the Same?', 'Permutations'], data=[[statistic, pvalue, pvalue > params['alpha'], n_resamples]])
+    warn_fewer_resamples(summary, used=n_resamples, row_size=len(values), params=params)
+    return summary
+
+
+def get_bootstrap_intervals(group_names: List[str], groups: Union['GroupedArray', List[List[float]]], params: dict):
+    """Computes percentile bootstrap confidence intervals for each group mean and each pairwise difference in means.
+
+    Every group is resampled with replacement n_resamples times, in batches as 2D arrays (one row per resample) sized to fit the memory budget. Each resample costs roughly 10 ns per value on one core, so fewer resamples are made of large data, see get_resample_count.
+
+    Args:
+        group_names (List[str]): List of group names.
+
+        groups (GroupedArray | List[List[float]]): Groups from get_groups. Each group is a sequence of continuous (float) values; a plain list of lists is also accepted.
+
+        params (dict): Collection of passed parameters as follows:
+            alpha (float): Alpha corresponding to the confidence level.
+
+            n_resamples (int): Number of bootstrap resamples. Defaults to 10000.
+
+            max_resampled_values (int): Lowers n_resamples so that at most this many values are resampled in total. Defaults to 2*10**8.
+
+            seed (int): Seed for reproducible results. Equal seeds give equal results for any number of workers. Defaults to 0.
+
+            resampling_memory_mb (float): Memory budget of each worker's batch in megabytes. Defaults to 256.
+
+            resampling_workers (int): Number of processes to spread batches over. Defaults to 1.
+
+    Returns:
+        means (pd.DataFrame): Mean and confidence interval of each group. The number of resamples made is in means.attrs['resamples']; if it is fewer than requested, means.attrs['warning'] says so.
+
+        differences (pd.DataFrame): For each unique pairing of groups, the difference in means (first minus second), its confidence interval, and whether the interval excludes zero.
+    """
+    groups = GroupedArray.from_groups(groups)
+    alpha = params['alpha']
+    workers = params.get('resampling_workers', 1)
+    n_resamples = get_resample_count(len(groups.values), params)
+    batches = get_resampling_batches(
+        n_resamples,
+        len(groups.values),
+        params.get('resampling_memory_mb', 256),
+        params.get('seed', 0),
+        bytes_per_value=BOOTSTRAP_BYTES_PER_VALUE
+    )
+    boot_means = run_resampling_batches(_bootstrap_batch, groups.values, groups.offsets, batches, workers)
+    observed = GroupStats.from_groups(groups).means
+
+    lower, upper = np.quantile(boot_means, [alpha / 2, 1 - alpha / 2], axis=0)
+    means = pd.DataFrame(index=pd.Index(group_names), data={'Mean': observed, 'Lower': lower, 'Upper': upper})
+    means.attrs['resamples'] = n_resamples
+    warn_fewer_resamples(means, used=n_resamples, row_size=len(groups.values), params=params)
+
+    first, second = np.triu_indices(len(groups), k=1)
+    lower, upper = np.quantile(boot_means[:, first] - boot_means[:, second], [alpha / 2, 1 - alpha / 2], axis=0)
+    names = np.array(group_names, dtype=object)
+    differences = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays([names[first], names[second]]),
+        data={'Difference': observed[first] - observed[second], 'Lower': lower, 'Upper': upper, 'Different?': (lower > 0) | (upper < 0)}
+    )
+    return means, differences
+
+
+# "id" as its own word or camelCase part: Student ID, student_id, StudentId, ID Number; not Midterm, Video Quiz or Paid Lab
+IDENTIFIER_PATTERN = re.compile(r'(?<![A-Za-z])[Ii][Dd](?![a-z])|(?<=[a-z])I[Dd](?![a-z])')
+
+
+def get_default_measure_vars(df: pd.DataFrame, group_var: str = None) -> List[str]:
+    """Numeric columns other than group_var whose names do not mark them as identifiers, such as Student ID."""
+    return [column for column in df.select_dtypes(include='number').columns if column != group_var and not IDENTIFIER_PATTERN.search(str(column))]
+
+
+def get_default_params() -> dict:
+    """Parameters matching the defaults of the sidebar, for running the analysis without the website."""
+    return {'alpha':0.05, 'center':'mean', 'normality_checker':'Shapiro-Wilk Test', 'normality_sample_size':None, 'homoskedasticity_checker':'Levene Test', 'proportiontocut':0.5, 'correction':'None', 'group_test':'ANOVA', 'resampling':False, 'n_resamples':10000, 'max_resampled_values':2 * 10**8, 'resampling_workers':1, 'resampling_memory_mb':256, 'seed':0, 'min_group_size':3, 'max_groups':1000, 'max_pairs':10000, 'significant_pairs_only':True}
+
+
+def flatten_table(table: pd.DataFrame) -> pd.DataFrame:
+    """Moves the group index of a result table into Group (and Other Group) columns."""
+    if table.index.nlevels == 2:
+        return table.rename_axis(['Group', 'Other Group']).reset_index()
+    if isinstance(table.index, pd.RangeIndex):
+        return table.reset_index(drop=True)
+    return table.rename_axis('Group').reset_index()
+
+
+def use_rank_tests(normality_results: pd.DataFrame, params: dict) -> bool:
+    """Whether the groups are compared with the Kruskal-Wallis and Dunn tests rather than ANOVA, given the selected group_test and the normality results."""
+    if params['group_test'] == 'Automatic':
+        # Groups too small or constant to test have no conclusion and are left out
+        return not normality_results['Normally Distributed?'].dropna().astype(bool).all()
+    return params['group_test'] == 'Kruskal-Wallis'
+
+
+def compute_step(name: str, compute, use_params: bool = True):
+    """Step runner of build_results that computes every step directly."""
+    return compute()
+
+
+def build_results(group_names: List[str], groups: GroupedArray, group_stats: GroupStats, params: dict, descriptive_stats: pd.DataFrame, complete: bool = True, step=compute_step) -> dict:
+    """Runs the tests of the analysis on groups that were already found and summarized. Shared by every way of running the analysis, which differ only in where groups and group_stats come from.
+
+    Args:
+        group_names (List[str]): Name of each group.
+
+        groups (GroupedArray): Values of each group, for the tests that need raw values.
+
+        group_stats (GroupStats): Statistics of each group, for the tests that only need moments.
+
+        params (dict): Collection of passed parameters, see get_default_params.
+
+        descriptive_stats (pd.DataFrame): Result of get_descriptive_stats for the groups.
+
+        complete (bool): False if groups only holds a sample of the values of each group. The tests on ranks and the resampling tests, which need every value, are then left out.
+
+        step (callable): Called as step(name, compute, use_params) to run each step, so callers can time or cache them. use_params is False for steps that do not depend on params. Defaults to computing each step directly.
+
+    Returns:
+        results (dict): Result tables keyed by 'descriptive_stats', 'normality', 'homoskedasticity', 'anova' and 'pairwise'. If use_rank_tests, also 'kruskal' and 'dunn'. If params['resampling'] is set, also 'permutation_anova', 'bootstrap_means' and 'bootstrap_differences'.
+    """
+    homoskedasticity_results = step('homoskedasticity', lambda: test_homoskedasticity(groups=groups, params=params))
+    results = {
+        'descriptive_stats': descriptive_stats,
+        'normality': step('normality', lambda: test_normality(group_names=group_names, groups=groups, params=params)),
+        'homoskedasticity': homoskedasticity_results,
+        'anova': step('anova', lambda: test_anova(groups=group_stats, params=params)),
+        'pairwise': step('pairwise', lambda: test_pairwise(
+            group_names=group_names,
+            groups=group_stats,
+            params=params,
+            equal_var=homoskedasticity_results['Equal Variance?'].all(),
+            descriptive_stats=descriptive_stats
+        ))
+    }
+    if not complete:
+        return results
+    # Ranking every value is the most expensive step, so it is only done for the tests that are shown
+    if use_rank_tests(results['normality'], params):
+        group_ranks = step('group_ranks', lambda: GroupRanks.from_groups(groups), use_params=False)
+        results['kruskal'] = step('kruskal', lambda: test_kruskal(groups=group_ranks, params=params))
+        results['dunn'] = step('dunn', lambda: test_dunn(group_names=group_names, groups=group_ranks, params=params))
+    if params.get('resampling', False):
+        results['permutation_anova'] = step('permutation_anova', lambda: test_permutation_anova(groups=groups, params=params))
+        results['bootstrap_means'], results['bootstrap_differences'] = step('bootstrap', lambda: get_bootstrap_intervals(group_names=group_names, groups=groups, params=params))
+    return results
+
+
+def run_analysis(df: pd.DataFrame, measure_var: str, group_var: str, params: dict) -> dict:
+    """Runs every step of the analysis on one measurement/grouping variable combination without displaying anything.
+
+    Args:
+        df (pd.DataFrame): Original dataset.
+
+        measure_var (str): Variable in df upon which groups are compared.
+
+        group_var (str): Variable in df upon which groupings are performed.
+
+        params (dict): Collection of passed parameters, see get_default_params.
+
+    Returns:
+        results (dict): Result tables of build_results.
+
+    Raises:
+        GroupingError: If the groups fail check_groups.
+    """
+    group_names, groups = get_groups(df=df, measure_var=measure_var, group_var=group_var)
+    check_groups(group_names=group_names, groups=groups, params=params)
+    group_stats = GroupStats.from_groups(groups)
+    descriptive_stats = get_descriptive_stats(df=df, group_var=group_var, measure_var=measure_var, group_names=group_names, group_stats=group_stats)
+    return build_results(group_names=group_names, groups=groups, group_stats=group_stats, params=params, descriptive_stats=descriptive_stats)
+
+
+def levene_test_matrix(groups: GroupedArray, group_stats: GroupStats, params: dict):
+    """Computes the Levene test for every column of a GroupedArray of rows x measures at once.
+
+    The Levene statistic is the one-way ANOVA F statistic of the absolute deviations from each group's center, so it is computed from the grouped statistics of the deviations. A trimmed center trims the data as well as the center, so it falls back to scipy.stats.levene once per measure.
+
+    Args:
+        groups (GroupedArray): Rows of each group from get_grouped_matrix.
+
+        group_stats (GroupStats): Statistics of groups from GroupStats.from_matrix.
+
+        params (dict): Collection of passed parameters, see get_default_params. Uses center and proportiontocut.
+
+    Returns:
+        statistic (np.ndarray): Levene statistic of each measure.
+
+        pvalue (np.ndarray): p-value of each measure.
+    """
+    from scipy.stats import levene
+    if params['center'] == 'trimmed':
+        statistic = np.full(groups.values.shape[1], np.nan)
+        pvalue = np.full(groups.values.shape[1], np.nan)
+        for j in range(len(statistic)):
+            samples = [group[:, j][~np.isnan(group[:, j])] for group in groups]
+            statistic[j], pvalue[j] = levene(*[sample for sample in samples if len(sample)], center='trimmed', proportiontocut=params['proportiontocut'])
+        return statistic, pvalue
+    centers = group_stats.medians if params['center'] == 'median' else group_stats.means
+    deviations = GroupedArray(values=np.abs(groups.values - centers[groups.codes]), offsets=groups.offsets)
+    return anova_f_test(GroupStats.from_matrix(deviations, medians=False))
+
+
+def run_multi_measure_analysis(df: pd.DataFrame, measure_vars: List[str], group_var: str, params: dict) -> pd.DataFrame:
+    """Runs the descriptive stats, Levene test, ANOVA and pairwise t-tests for several measurement variables at once.
+
+    The group column is factorized once and every statistic is computed on a rows x measures array, so analyzing many assignment columns costs about as much as a few single-measure analyses. Missing measurements are skipped per measure.
+
+    Args:
+        df (pd.DataFrame): Original dataset.
+
+        measure_vars (List[str]): Variables in df upon which groups are compared.
+
+        group_var (str): Variable in df upon which groupings are performed.
+
+        params (dict): Collection of passed parameters, see get_default_params.
+
+    Returns:
+        summary (pd.DataFrame): One row per result, indexed by Measure, Analysis ('Descriptive Statistics', 'Homoskedasticity', 'ANOVA' or 'Pairwise'), Group and Other Group. Descriptive rows fill Count, Min, Max, Mean, Median and Standard Deviation; test rows fill Statistic, p-Value, Significant? (p-value below alpha) and, for pairwise rows, Higher. summary.attrs['total_pairs'] is the number of pairs tested per measure; above params['max_pairs'] only the most significant pairs of each measure are kept, as in test_pairwise.
+
+    Raises:
+        GroupingError: If the groups fail check_groups.
+    """
+    group_names, groups = get_grouped_matrix(df=df, measure_vars=measure_vars, group_var=group_var)
+    check_groups(group_names=group_names, groups=groups, params=params)
+    group_stats = GroupStats.from_matrix(groups)
+    num_groups, num_measures = group_stats.counts.shape
+    names = np.array(group_names, dtype=object)
+    measures = np.array(measure_vars, dtype=object)
+
+    # Descriptive stats, groups x measures flattened measure by measure
+    descriptive = pd.DataFrame({
+        'Measure': np.repeat(measures, num_groups),
+        'Analysis': 'Descriptive Statistics',
+        'Group': np.tile(names, num_measures),
+        'Other Group': '',
+        'Count': group_stats.counts.T.ravel(),
+        'Min': group_stats.mins.T.ravel(),
+        'Max': group_stats.maxs.T.ravel(),
+        'Mean': group_stats.means.T.ravel(),
+        'Median': group_stats.medians.T.ravel(),
+        'Standard Deviation': group_stats.stds.T.ravel()
+    })
+
+    levene_statistic, levene_pvalue = levene_test_matrix(groups=groups, group_stats=group_stats, params=params)
+    anova_statistic, anova_pvalue = anova_f_test(group_stats)
+    tests = pd.DataFrame({
+        'Measure': np.tile(measures, 2),
+        'Analysis': np.repeat(['Homoskedasticity', 'ANOVA'], num_measures),
+        'Group': '',
+        'Other Group': '',
+        'Statistic': np.r_[levene_statistic, anova_statistic],
+        'p-Value': np.r_[levene_pvalue, anova_pvalue]
+    })
+
+    # Student's t-test where the variances are equal, Welch's elsewhere
+    equal_var = levene_pvalue > params['alpha']
+    means = group_stats.means
+    total_pairs = num_groups * (num_groups - 1) // 2
+    if total_pairs <= params.get('max_pairs', 10000):
+        first, second, student_statistic, student_pvalue = pairwise_t_tests(counts=group_stats.counts, means=means, variances=group_stats.variances, equal_var=True)
+        _, _, welch_statistic, welch_pvalue = pairwise_t_tests(counts=group_stats.counts, means=means, variances=group_stats.variances, equal_var=False)
+        statistic = np.where(equal_var, student_statistic, welch_statistic)
+        pvalue = np.where(equal_var, student_pvalue, welch_pvalue)
+        pairs = [(first, second, statistic[:, j], adjust_pvalues(pvalue[:, j], params.get('correction', 'None'))) for j in range(num_measures)]
+    else:
+        # Like test_pairwise, each measure's pairs are tested in blocks and only its most significant pairs are kept
+        pairs = []
+        for j in range(num_measures):
+            blocks = (
+                pairwise_t_tests(counts=group_stats.counts[:, j], means=means[:, j], variances=group_stats.variances[:, j], equal_var=equal_var[j], pairs=block)
+                for block in iter_pair_blocks(num_groups)
+            )
+            pairs.append(keep_significant_pairs(*select_top_pairs(blocks, max_pairs=params.get('max_pairs', 10000)), params=params))
+    first, second, statistic, pvalue = (np.concatenate(arrays) for arrays in zip(*pairs))
+    pair_measure = np.repeat(np.arange(num_measures), [len(measure_pairs[0]) for measure_pairs in pairs])
+    higher = np.where(means[first, pair_measure] > means[second, pair_measure], names[first], names[second])
+    pairwise = pd.DataFrame({
+        'Measure': measures[pair_measure],
+        'Analysis': 'Pairwise',
+        'Group': names[first],
+        'Other Group': names[second],
+        'Statistic': statistic,
+        'p-Value': pvalue,
+        'Higher': higher
+    })
+
+    summary = pd.concat([descriptive, tests, pairwise], ignore_index=True)
+    summary['Significant?'] = (summary['p-Value'] < params['alpha']).where(summary['p-Value'].notna())
+    # Keep each measure's results together, in the order of measure_vars
+    position = summary['Measure'].map({measure: j for j, measure in enumerate(measure_vars)})
+    summary = summary.iloc[np.argsort(position.to_numpy(), kind='stable')]
+    columns = ['Count', 'Min', 'Max', 'Mean', 'Median', 'Standard Deviation', 'Statistic', 'p-Value', 'Significant?', 'Higher']
+    summary = summary.set_index(['Measure', 'Analysis', 'Group', 'Other Group'])[columns]
+    summary.attrs['total_pairs'] = total_pairs
+    return summary
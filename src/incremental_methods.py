@@ -0,0 +1,212 @@
+"""Incremental re-analysis of a gradebook that is uploaded again with appended or changed rows.
+
+Rows are matched between uploads by a key column such as Student ID, and compared with the values kept from the last upload. For each measurement/grouping variable combination, the per-group count, sum and sum of squared deviations are updated by removing the old values of removed or changed rows and adding the new values of added or changed rows, so the descriptive stats, ANOVA and pairwise t-tests only touch the changed rows. Min, max and median are recomputed only for the groups the change touched, and the statistics are recomputed from scratch when so many rows changed that this is cheaper. Tests on order statistics or on every residual (Shapiro-Wilk, Levene, and Kruskal-Wallis and Dunn when they are selected) are recomputed from the full groups.
+"""
+import threading
+from typing import List
+import numpy as np
+import pandas as pd
+from analysis_cache import AnalysisCache, cached_get_groups
+from instrumentation import stage
+from helper_methods import GroupedArray, GroupStats, build_results, check_groups, get_descriptive_stats, get_groups, group_labels
+
+
+def get_lineage_id(df: pd.DataFrame, key_var: str, owner: str = None) -> tuple:
+    """Identifies uploads of the same gradebook by the same owner: the same key column and the same non-numeric (grouping) columns. New measurement columns keep the lineage.
+
+    Args:
+        df (pd.DataFrame): Current upload of the dataset.
+
+        key_var (str): Column that identifies a row across uploads, such as Student ID.
+
+        owner (str): Identifies who uploaded df, such as the website session. Gradebooks with the same layout from different owners are never compared.
+
+    Returns:
+        lineage_id (tuple): Hashable identifier of the gradebook.
+    """
+    return (owner, key_var, tuple(df.select_dtypes(exclude='number').columns.drop(key_var, errors='ignore')))
+
+
+def get_group_labels(df: pd.DataFrame, group_var: str) -> np.ndarray:
+    """Group of each row as named by get_groups, missing where the group is."""
+    return group_labels(df[group_var]).to_numpy(dtype=object)
+
+
+def values_equal(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Elementwise equality that treats two missing values as equal."""
+    return (old == new) | (pd.isna(old) & pd.isna(new))
+
+
+class IncrementalGroupStats:
+    """Group statistics of one measurement/grouping variable combination that are updated from the rows that changed since the last upload.
+
+    The keys, measurements and group labels of the last upload are kept, so changed rows are found by comparing values with it rather than rehashing both uploads. If rows were only appended, no key lookup is needed either.
+
+    Args:
+        key_var (str): Column that identifies a row across uploads, such as Student ID.
+
+        measure_var (str): Variable upon which groups are compared.
+
+        group_var (str): Variable upon which groupings are performed.
+
+        max_delta_fraction (float): Recompute from scratch instead when more than this fraction of the rows were added, removed or changed, as that is cheaper.
+    """
+
+    def __init__(self, key_var: str, measure_var: str, group_var: str, max_delta_fraction: float = 0.5):
+        self.key_var = key_var
+        self.measure_var = measure_var
+        self.group_var = group_var
+        self.max_delta_fraction = max_delta_fraction
+        self.keys = None
+        self.values = None
+        self.labels = None
+        self.group_names = []
+        self.stats = GroupStats.empty(0)
+        self.last_update = {}
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self, group_names: List[str]) -> np.ndarray:
+        for name in group_names:
+            if name not in self._index:
+                self._index[name] = len(self.group_names)
+                self.group_names.append(name)
+        return np.array([self._index[name] for name in group_names], dtype=np.int64)
+
+    def _grouped_stats(self, values: np.ndarray, labels: np.ndarray) -> GroupStats:
+        """Statistics of the rows with these measurements and group labels, placed at the positions of their groups."""
+        rows = pd.DataFrame({'measure':values, 'group':labels})
+        group_names, groups = get_groups(df=rows, measure_var='measure', group_var='group')
+        index = self._get_index(group_names)
+        return GroupStats.from_groups(groups).scatter(index, len(self.group_names))
+
+    def _recompute(self, values: np.ndarray, labels: np.ndarray) -> None:
+        self.group_names = []
+        self._index = {}
+        self.stats = self._grouped_stats(values, labels)
+        self.last_update = {'mode':'full', 'rows':len(values)}
+        return
+
+    def _match_rows(self, keys: pd.Index):
+        """Positions (or slices) of the previous rows that are still present and of the current rows they are now at, and whether every current key is new or matched once."""
+        num_previous = len(self.keys)
+        if len(keys) >= num_previous and keys[:num_previous].equals(self.keys):
+            # Rows were only appended (the usual weekly export). The previous keys are scanned for the few new ones, not the other way around
+            appended = keys[num_previous:]
+            matched = slice(0, num_previous)
+            return matched, matched, appended.is_unique and not self.keys.isin(appended).any()
+        previous_positions = self.keys.get_indexer(keys)
+        current_positions = np.flatnonzero(previous_positions >= 0)
+        return previous_positions[current_positions], current_positions, keys.is_unique
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Brings the statistics up to date with df, using only the rows that were added, removed or changed since the last call."""
+        keys = pd.Index(df[self.key_var], copy=True)
+        values = df[self.measure_var].to_numpy(dtype=np.float64, copy=True)
+        labels = get_group_labels(df, self.group_var)
+        with self._lock:
+            if self.keys is None or not self.keys.is_unique:
+                self._recompute(values, labels)
+                self.keys, self.values, self.labels = keys, values, labels
+                return
+
+            previous_common, current_common, unique = self._match_rows(keys)
+            if unique:
+                old_values, new_values = self.values[previous_common], values[current_common]
+                old_labels, new_labels = self.labels[previous_common], labels[current_common]
+                # Compared directly first, then only the rows that differ are checked for missing values, which never compare equal
+                differ = np.flatnonzero((old_values != new_values) | (old_labels != new_labels))
+                same = values_equal(old_values[differ], new_values[differ]) & values_equal(old_labels[differ], new_labels[differ])
+                changed = differ[~same]
+                changed_previous = np.arange(len(self.keys))[previous_common][changed]
+                changed_current = np.arange(len(keys))[current_common][changed]
+                kept = np.zeros(len(self.keys), dtype=bool)
+                kept[previous_common] = True
+                present = np.zeros(len(keys), dtype=bool)
+                present[current_common] = True
+                removed = np.concatenate([np.flatnonzero(~kept), changed_previous])
+                added = np.concatenate([np.flatnonzero(~present), changed_current])
+            if not unique or len(removed) + len(added) > self.max_delta_fraction * len(keys):
+                self._recompute(values, labels)
+                self.keys, self.values, self.labels = keys, values, labels
+                return
+
+            removed_stats = self._grouped_stats(self.values[removed], self.labels[removed])
+            added_stats = self._grouped_stats(values[added], labels[added])
+            num_groups = len(self.group_names)
+            stats = self.stats.scatter(np.arange(len(self.stats)), num_groups)
+            removed_stats = removed_stats.scatter(np.arange(len(removed_stats)), num_groups)
+            self.stats = stats.subtract(removed_stats).merge(added_stats)
+            # Min and max of groups that lost rows are unknown until get_stats recomputes them
+            self.stats.mins[removed_stats.counts > 0] = np.nan
+            self.stats.maxs[removed_stats.counts > 0] = np.nan
+            self.keys, self.values, self.labels = keys, values, labels
+            num_changed = len(changed)
+            self.last_update = {'mode':'delta', 'added':len(added) - num_changed, 'removed':len(removed) - num_changed, 'changed':num_changed}
+        return
+
+    def get_stats(self, group_names: List[str], groups) -> GroupStats:
+        """Statistics of the named groups, in that order. Min, max and median of groups touched by the last update are filled in from groups, which must be the groups of the last upload."""
+        groups = GroupedArray.from_groups(groups)
+        with self._lock:
+            index = np.array([self._index[name] for name in group_names], dtype=np.int64)
+            group_stats = self.stats.take(index)
+            # Appended rows keep min and max exact, so usually only the median of each touched group is recomputed, in linear time
+            for i in np.flatnonzero(np.isnan(group_stats.medians) & (group_stats.counts > 0)):
+                group_stats.medians[i] = np.median(groups[i])
+            for i in np.flatnonzero(np.isnan(group_stats.mins) & (group_stats.counts > 0)):
+                group_stats.mins[i] = groups[i].min()
+                group_stats.maxs[i] = groups[i].max()
+            # Kept so the next update starts from exact order statistics
+            self.stats.mins[index] = group_stats.mins
+            self.stats.maxs[index] = group_stats.maxs
+            self.stats.medians[index] = group_stats.medians
+        return group_stats
+
+
+# Trackers of recently analyzed gradebooks, evicted least recently used first
+default_lineages = AnalysisCache(max_bytes=256 * 2**20)
+
+
+def run_incremental_analysis(df: pd.DataFrame, key_var: str, measure_var: str, group_var: str, params: dict, owner: str = None, lineages: AnalysisCache = default_lineages, fingerprint: str = None) -> dict:
+    """Runs every step of the analysis like helper_methods.run_analysis, reusing the group statistics of the previous upload of the same gradebook.
+
+    Args:
+        df (pd.DataFrame): Current upload of the dataset.
+
+        key_var (str): Column that identifies a row across uploads, such as Student ID.
+
+        measure_var (str): Variable in df upon which groups are compared.
+
+        group_var (str): Variable in df upon which groupings are performed.
+
+        params (dict): Collection of passed parameters, see helper_methods.get_default_params.
+
+        owner (str): Identifies who uploaded df, such as the website session, so only their own previous upload is reused.
+
+        lineages (AnalysisCache): Where the trackers of previous uploads are kept.
+
+        fingerprint (str, optional): Fingerprint of the data, such as the content_fingerprint of the file df was read from, so the groups are found in the cache without hashing df again.
+
+    Returns:
+        results (dict): Result tables of helper_methods.build_results, plus 'update', a dict describing whether the statistics were updated from a delta or recomputed.
+
+    Raises:
+        GroupingError: If the groups fail helper_methods.check_groups.
+    """
+    # Tests on order statistics or on every residual need the full groups
+    group_names, groups = cached_get_groups(df=df, measure_var=measure_var, group_var=group_var, fingerprint=fingerprint)
+    check_groups(group_names=group_names, groups=groups, params=params)
+
+    key = (get_lineage_id(df, key_var, owner=owner), measure_var, group_var)
+    tracker = lineages.get_or_compute(key, lambda: IncrementalGroupStats(key_var=key_var, measure_var=measure_var, group_var=group_var))
+    with stage('incremental_update'):
+        tracker.update(df)
+    # Store again so the memory budget accounts for the new snapshot
+    lineages.put(key, tracker)
+
+    group_stats = tracker.get_stats(group_names, groups)
+    descriptive_stats = get_descriptive_stats(df=df, group_var=group_var, measure_var=measure_var, group_names=group_names, group_stats=group_stats)
+    results = build_results(group_names=group_names, groups=groups, group_stats=group_stats, params=params, descriptive_stats=descriptive_stats)
+    results['update'] = dict(tracker.last_update)
+    return results
@@ -0,0 +1,173 @@
+"""Per-stage latency and memory instrumentation of the analysis.
+
+A Profiler records wall time, CPU time and (optionally) peak allocated memory of each stage. Memory is measured with tracemalloc, which traces the whole process: start_memory_tracing() turns it on once for the life of the process, and profilers only read it. Peaks are therefore approximate when several sessions run at once, as they include each other's allocations. Code marks stages with the stage() context manager, which does nothing unless a profiler is active, so the analysis functions can be instrumented without changing their signatures. Stages can be nested; nested stages are recorded with a path such as 'render/two_way_anova'. Stage names are fixed strings in the code, never values from the data, so the number of Prometheus series stays bounded. Stages run once per group (such as each Shapiro-Wilk test) also record the index of the group in the JSON lines and the diagnostics panel, and are summed into one series per stage in Prometheus.
+
+Records can be exported as JSON lines or as a Prometheus text file.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import pandas as pd
+from file_methods import atomic_write
+
+_active_profiler = contextvars.ContextVar('active_profiler', default=None)
+# Open stages of every profiler in the process. tracemalloc has one peak, so whoever resets it first credits it to all of them
+_open_frames = {}
+_frames_lock = threading.Lock()
+
+
+def start_memory_tracing() -> None:
+    """Starts tracemalloc for the rest of the process, if it is not already running. It slows every allocation down, so it is never started per session."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return
+
+
+class Profiler:
+    """Records how long each stage takes and how much memory it allocates at its peak.
+
+    Args:
+        track_memory (bool): Whether to record peak allocated memory, if start_memory_tracing() was called. The peak is process-wide, so it includes allocations of other sessions running at the same time.
+    """
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.records = []
+        self.labels = {}
+        self._stack = []
+
+    @contextmanager
+    def activate(self):
+        """Makes this the profiler that stage() records to, for the duration of the with block."""
+        token = _active_profiler.set(self)
+        try:
+            yield self
+        finally:
+            _active_profiler.reset(token)
+
+    @staticmethod
+    def _update_peaks() -> int:
+        """Credits the peak since the last reset to every open stage in the process, then resets it. Returns current allocated memory."""
+        with _frames_lock:
+            current, peak = tracemalloc.get_traced_memory()
+            for frame in _open_frames.values():
+                frame['peak'] = max(frame['peak'], peak)
+            tracemalloc.reset_peak()
+        return current
+
+    @contextmanager
+    def stage(self, name: str, group: int = None):
+        tracing = self.track_memory and tracemalloc.is_tracing()
+        start_memory = self._update_peaks() if tracing else 0
+        frame = {'name':name, 'peak':start_memory}
+        self._stack.append(frame)
+        if tracing:
+            with _frames_lock:
+                _open_frames[id(frame)] = frame
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            if tracing:
+                self._update_peaks()
+                with _frames_lock:
+                    del _open_frames[id(frame)]
+            path = '/'.join(open_frame['name'] for open_frame in self._stack)
+            self._stack.pop()
+            record = {
+                'stage':path,
+                'wall_seconds':wall,
+                'cpu_seconds':cpu,
+                'peak_bytes':frame['peak'] - start_memory if tracing else None
+            }
+            if group is not None:
+                record['group'] = int(group)
+            self.records.append(record)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        records = pd.DataFrame(self.records, columns=['stage', 'group', 'wall_seconds', 'cpu_seconds', 'peak_bytes'])
+        # Missing for stages that are not run per group
+        records['group'] = records['group'].astype('Int64')
+        return records
+
+    def to_jsonl(self, path: str) -> None:
+        """Appends one JSON object per record, with the labels and a timestamp, to path."""
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with open(path, 'a') as output:
+            for record in self.records:
+                output.write(json.dumps({'timestamp':timestamp, **self.labels, **record}) + '\n')
+        return
+
+    def to_prometheus(self) -> str:
+        """Formats the records in the Prometheus text exposition format, one gauge per measured quantity labeled by stage, and one gauge per label (such as analysis_dataset_groups)."""
+        metrics = [
+            ('analysis_stage_wall_seconds', 'wall_seconds', 'Wall time of each analysis stage.'),
+            ('analysis_stage_cpu_seconds', 'cpu_seconds', 'CPU time of each analysis stage.'),
+            ('analysis_stage_peak_bytes', 'peak_bytes', 'Peak memory allocated in the process during each analysis stage.')
+        ]
+        # Stages that ran more than once, such as once per group, are summed (times) or maxed (memory) so every series is unique and group indexes never become labels
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'wall_seconds':0.0, 'cpu_seconds':0.0, 'peak_bytes':None})
+            total['wall_seconds'] += record['wall_seconds']
+            total['cpu_seconds'] += record['cpu_seconds']
+            if record['peak_bytes'] is not None:
+                total['peak_bytes'] = max(total['peak_bytes'] or 0, record['peak_bytes'])
+        lines = []
+        for metric, field, description in metrics:
+            lines += [f'# HELP {metric} {description}', f'# TYPE {metric} gauge']
+            for stage_name, total in totals.items():
+                if total[field] is None:
+                    continue
+                lines.append(f'{metric}{{stage="{escape_label(stage_name)}"}} {total[field]}')
+        # Labels such as the number of rows or groups would make a new series for every dataset, so they are values of their own
+        for key, value in self.labels.items():
+            metric = f'analysis_dataset_{key}'
+            lines += [f'# HELP {metric} Dataset {key} of the last analysis.', f'# TYPE {metric} gauge', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        """Writes to_prometheus() to path atomically, for a node exporter textfile collector."""
+        with atomic_write(path) as temporary:
+            with open(temporary, 'w') as output:
+                output.write(self.to_prometheus())
+        return
+
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+@contextmanager
+def stage(name: str, group: int = None):
+    """Records the with block as a stage of the active profiler, if there is one. group is the index of the group in group_names, for stages run once per group."""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name, group=group):
+            yield
+
+
+def add_labels(**labels) -> None:
+    """Attaches labels (such as the dataset shape) to every exported record of the active profiler, if there is one."""
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler.labels.update(labels)
+    return
+
+
+def export_metrics(profiler: Profiler, directory: str) -> None:
+    """Appends the records of profiler to directory/stages.jsonl and rewrites directory/analysis.prom."""
+    os.makedirs(directory, exist_ok=True)
+    profiler.to_jsonl(os.path.join(directory, 'stages.jsonl'))
+    profiler.write_prometheus(os.path.join(directory, 'analysis.prom'))
+    return
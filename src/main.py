@@ -1,6 +1,13 @@
+import os
 import streamlit as st
 import pandas as pd
 from helper_methods import *
+from ui_methods import *
+from analysis_cache import cached_get_groups, run_cached_analysis
+from incremental_methods import run_incremental_analysis
+from streaming_methods import run_streaming_analysis
+from results_store import write_results
+from instrumentation import Profiler, add_labels, export_metrics, stage, start_memory_tracing
 
 def main():
     # Set Page Configuration
@@ -13,40 +20,62 @@ def main():
     # Create Sidebar
     params = create_sidebar()
 
-    # Disclaimer
-    st.write('# Disclaimer: How to Interpret Results')
-    st.write('Correlation is not causation! Just because groups may have different grades does not mean that the grouping variable caused those grade differences. For example, if you group students by race and find that black students have lower grades than white students, this does not mean that the difference in race caused the difference in grades. There are likely lurking variables that relate the two such as economic status, parents education level, systemic racism, and others. This website is meant as a tool for teachers to investigate if there is a difference in grades based on some characteristic of students. It cannot tell you where that difference comes from, if it exists.\n\nIf you want to determine if your grouping variable is the cause of the difference in grades, you must perform a randomized controlled study (or find research that has already been done).')
+    show_diagnostics = create_diagnostics_option()
+    metrics_dir = os.environ.get('ANALYSIS_METRICS_DIR')
+    if show_diagnostics or metrics_dir is not None:
+        # Once on, traces every session for the life of the server, as tracemalloc is process-wide; one session never turns it off for the others
+        start_memory_tracing()
+    profiler = Profiler(track_memory=show_diagnostics or metrics_dir is not None)
 
-    # Get Data
-    st.write('# Step 1: Choose Your Data File Or Use Example')
-    st.write('I suggest you use the example first, then try the analysis with your own data. Note that the example data was artificially created and is not from real students.')
-    own_data_vs_example = st.radio(
-        label = 'Decide to use your own data or use the example data.', 
-        options = ['Example', 'Bring Your Own Data'],
-        index = 0
-    )
-    if own_data_vs_example == 'Example':
-        df = get_example_data()
-        main2(df=df, params=params)
-    else:
-        st.write('The file must have the following:\n* Be one of these file types: .csv, .xls, .xlsx\n* Be in the format below')
-        st.write(file_format_example())
-        st.write('* The Measurement column must be continuous - any positive number (in a range) is meaningful. Example: scores from 0 to 30.\n* The Group column must be categorical - students can have one of only a few possible values. Example: race. Also, each group must have at least 3 members.\n* Note: You will likely have to create the Group column yourself in the data file.\n* Look at the Example dataset for further clarification.')
-        uploaded_file = st.file_uploader(label="Choose a file",type=['csv', 'xls', 'xlsx'])
-        if uploaded_file is not None:
-            try:
-                df = file_to_dataframe(file=uploaded_file)
-                main2(df=df, params=params)
-            except TypeError:
-                st.warning("You need to upload a csv or excel file.")
+    with profiler.activate():
+        # Disclaimer
+        st.write('# Disclaimer: How to Interpret Results')
+        st.write('Correlation is not causation! Just because groups may have different grades does not mean that the grouping variable caused those grade differences. For example, if you group students by race and find that black students have lower grades than white students, this does not mean that the difference in race caused the difference in grades. There are likely lurking variables that relate the two such as economic status, parents education level, systemic racism, and others. This website is meant as a tool for teachers to investigate if there is a difference in grades based on some characteristic of students. It cannot tell you where that difference comes from, if it exists.\n\nIf you want to determine if your grouping variable is the cause of the difference in grades, you must perform a randomized controlled study (or find research that has already been done).')
+
+        # Get Data
+        st.write('# Step 1: Choose Your Data File Or Use Example')
+        st.write('I suggest you use the example first, then try the analysis with your own data. Note that the example data was artificially created and is not from real students.')
+        own_data_vs_example = st.radio(
+            label = 'Decide to use your own data or use the example data.', 
+            options = ['Example', 'Bring Your Own Data'],
+            index = 0
+        )
+        if own_data_vs_example == 'Example':
+            with stage('load_data'):
+                df, fingerprint = get_example_data()
+            main2(df=df, params=params, fingerprint=fingerprint)
+        else:
+            st.write('The file must have the following:\n* Be one of these file types: .csv, .xls, .xlsx\n* Be in the format below')
+            st.write(file_format_example())
+            st.write('* The Measurement column must be continuous - any positive number (in a range) is meaningful. Example: scores from 0 to 30.\n* The Group column must be categorical - students can have one of only a few possible values. Example: race. Also, each group must have at least 3 members.\n* Note: You will likely have to create the Group column yourself in the data file.\n* Look at the Example dataset for further clarification.')
+            uploaded_file = st.file_uploader(label="Choose a file",type=['csv', 'xls', 'xlsx'])
+            large_file = st.checkbox(label='My file is too large to analyze all at once (csv only). Some results will be approximate.')
+            if uploaded_file is not None and large_file:
+                main_streaming(file=uploaded_file, params=params)
+            elif uploaded_file is not None:
+                try:
+                    with stage('load_data'):
+                        df, fingerprint = load_uploaded_file(file=uploaded_file)
+                    main2(df=df, params=params, fingerprint=fingerprint)
+                except TypeError:
+                    st.warning("You need to upload a csv or excel file.")
+
+    if show_diagnostics:
+        create_diagnostics_panel(profiler)
+    if metrics_dir is not None:
+        export_metrics(profiler, metrics_dir)
     return
 
 
-def main2(df: pd.DataFrame, params: dict):
+def main2(df: pd.DataFrame, params: dict, fingerprint: str = None):
     visual_check(df)
 
     # Get Variables
     st.write('# Step 2: Select Variables')
+    analyze_all = st.checkbox(label='Analyze all measurement columns at once (such as every quiz and test). Shows one table of results for every numeric column.')
+    if analyze_all:
+        main_all_measures(df=df, params=params)
+        return
     st.write('## Measurement Variable')
     measure_var = st.selectbox(
         label = 'Select the measurement variable. This is the variable we will compare groups with. Typically this will be a test grade column or cumulative grade column in your data.', 
@@ -61,59 +90,226 @@ def main2(df: pd.DataFrame, params: dict):
     )
     if group_var == measure_var:
         st.warning('The measurement variable cannot be the same as the grouping variable.')
+    st.write('## Second Grouping Variable (Optional)')
+    second_group_var = st.selectbox(
+        label = 'Select a second grouping variable to also study both grouping variables together (two-way ANOVA). For example, race and neighborhood.', 
+        options = ['None'] + df.columns.to_list(),
+        index = 0
+    )
+    if second_group_var in (group_var, measure_var):
+        st.warning('The second grouping variable must differ from the measurement and grouping variables.')
+        second_group_var = 'None'
+    st.write('## Student Identifier (Optional)')
+    key_var = st.selectbox(
+        label = 'If you upload a new version of this file while this page is open, select the column that identifies each student (such as Student ID). Then only the rows that were added or changed since your last upload are re-analyzed where possible.', 
+        options = ['None'] + df.columns.to_list(),
+        index = 0
+    )
     
     # Get Groups
-    group_names, groups = get_groups(df=df, measure_var=measure_var, group_var=group_var)
+    group_names, groups = cached_get_groups(df=df, measure_var=measure_var, group_var=group_var, fingerprint=fingerprint)
+    # Check the groups can be compared before running any test
+    try:
+        check_groups(group_names=group_names, groups=groups, params=params)
+    except GroupingError as error:
+        st.warning(str(error))
+        return
+    add_labels(rows=len(df), columns=len(df.columns), groups=len(group_names))
 
     st.write('# Step 3: Run Analysis')
     st.write('See additional options in the sidebar on the left. Access it with the arrow at the top left of the page.')
 
     if st.button(label='Analyze'):
-        st.write('## Descriptive Statistics')
-        descriptive_stats = get_descriptive_stats(df=df, group_var=group_var,measure_var=measure_var)
-        st.write(descriptive_stats)
+        if key_var == 'None':
+            results = run_cached_analysis(df=df, measure_var=measure_var, group_var=group_var, params=params, fingerprint=fingerprint)
+        else:
+            results = run_incremental_analysis(df=df, key_var=key_var, measure_var=measure_var, group_var=group_var, params=params, owner=get_session_id(), fingerprint=fingerprint)
+            if results['update']['mode'] == 'delta':
+                st.info(f"Updated from your last upload: {results['update']['added']} rows added, {results['update']['changed']} changed, {results['update']['removed']} removed.")
+        results_dir = os.environ.get('ANALYSIS_RESULTS_DIR')
+        if results_dir is not None:
+            with stage('save_results'):
+                write_results(results, results_dir, df=df, measure_var=measure_var, group_var=group_var, params=params)
 
-        st.write('## ANOVA Hypothesis Testing Assumptions')
-        normality_results = test_normality(group_names=group_names, groups=groups, params=params)
+        with stage('render'):
+            st.write('## Descriptive Statistics')
+            descriptive_stats = results['descriptive_stats']
+            st.write(descriptive_stats)
 
-        homoskedasticity_results = test_homoskedasticity(groups=groups, params=params)
+            st.write('## ANOVA Hypothesis Testing Assumptions')
+            normality_results = results['normality']
+
+            homoskedasticity_results = results['homoskedasticity']
         
-        anova_result = test_anova(groups=groups, params=params)
+            anova_result = results['anova']
 
-        st.write('### Normal Distribution')
-        st.write(f'The ANOVA test requires that each of the groups based on {group_var} are normally distributed in {measure_var}.')
-        if normality_results['Normally Distributed?'].all():
-            st.success('All groups are normally distributed.')
-        else:
-            st.error('Not all groups are normally distributed. Results of ANOVA test may not be valid.')
-        st.write(normality_results)
+            st.write('### Normal Distribution')
+            st.write(f'The ANOVA test requires that each of the groups based on {group_var} are normally distributed in {measure_var}.')
+            # Groups too small or constant to test have no conclusion and are left out
+            normally_distributed = normality_results['Normally Distributed?'].dropna().astype(bool).all()
+            if normally_distributed:
+                st.success('All groups are normally distributed.')
+            else:
+                st.error('Not all groups are normally distributed. Results of ANOVA test may not be valid.')
+            num_untested = normality_results['Normally Distributed?'].isna().sum()
+            if num_untested:
+                st.info(f'{num_untested} groups are too small or have too few distinct values to test for normality with the {params["normality_checker"]}.')
+            st.write(normality_results)
 
-        st.write('### Homoskedasticity')
-        st.write(f'The ANOVA test requires that each of the groups in {group_var} are have equal variance in {measure_var}.')
-        if homoskedasticity_results['Equal Variance?'].all():
-            st.success('All groups have similar variances.')
-        else:
-            st.error('Not all groups have similar variances. Results of ANOVA test may not be valid.')
-        st.write(homoskedasticity_results)
+            st.write('### Homoskedasticity')
+            st.write(f'The ANOVA test requires that each of the groups in {group_var} are have equal variance in {measure_var}.')
+            if homoskedasticity_results['Equal Variance?'].all():
+                st.success('All groups have similar variances.')
+            else:
+                st.error('Not all groups have similar variances. Results of ANOVA test may not be valid.')
+            st.write(homoskedasticity_results)
 
-        st.write(f'## Results of ANOVA Test')
-        if anova_result['All Groups the Same?'].values:
-            st.write(f'### There is NO statistically significant difference in {measure_var} means between {group_var} groups at the {(1-params["alpha"])*100}% confidence level.')
-            st.write(anova_result)
-        else:
-            st.write(f'### There IS a statistically significant difference in {measure_var} means between {group_var} groups at the {(1-params["alpha"])*100}% confidence level.')
-            st.write(anova_result)
-
-            st.write('### Post-Hoc Pairwise Significance Test')
-            st.write(f'First see if there is a statistically significant difference between the {measure_var} means (recorded in the "Different?" column) of the two {group_var}s on the left. If there is a statistically significant difference, then you can see which {group_var} has higher mean {measure_var} in the "Higher" column.')
-            pairwise_results = test_pairwise(
-                group_names=group_names, 
-                groups=groups, 
-                params=params, 
-                equal_var=homoskedasticity_results['Equal Variance?'].all(),
-                descriptive_stats=descriptive_stats
-            )
-            st.write(pairwise_results)
+            if params['resampling']:
+                st.write('## Permutation Test and Bootstrap Confidence Intervals')
+                st.write(f'These results do not require the groups to be normally distributed. The permutation test shuffles the {group_var} labels {results["permutation_anova"]["Permutations"].iloc[0]} times to see how often groups differ as much as they do in your data by chance alone.')
+                if 'warning' in results['permutation_anova'].attrs:
+                    st.warning(results['permutation_anova'].attrs['warning'])
+                st.write(results['permutation_anova'])
+                st.write(f'### {(1-params["alpha"])*100}% Confidence Intervals for the Mean {measure_var} of Each Group')
+                st.write(results['bootstrap_means'])
+                st.write(f'### {(1-params["alpha"])*100}% Confidence Intervals for the Difference in Mean {measure_var} Between Groups')
+                st.write(results['bootstrap_differences'])
+
+            if second_group_var != 'None':
+                with stage('two_way_anova'):
+                    cells, cell_groups = get_cells(df=df, measure_var=measure_var, group_vars=[group_var, second_group_var])
+                    two_way_result = test_two_way_anova(cells=cells, groups=cell_groups, params=params)
+                st.write(f'## Results of Two-Way ANOVA Test ({group_var} and {second_group_var})')
+                st.write(f'This test checks whether {group_var} and {second_group_var} each make a difference in mean {measure_var} after accounting for the other, and whether the difference {group_var} makes depends on {second_group_var} (the interaction, "{group_var} x {second_group_var}"). A False in the "No Effect?" column means a statistically significant effect at the {(1-params["alpha"])*100}% confidence level.')
+                st.write(two_way_result)
+                st.write(f'### Descriptive Statistics of Each {group_var} / {second_group_var} Combination')
+                st.write(get_descriptive_stats(df=df, group_var=f'{group_var} / {second_group_var}', measure_var=measure_var, group_names=cells.names, group_stats=GroupStats.from_groups(cell_groups)))
+
+            if use_rank_tests(normality_results, params):
+                kruskal_result = results['kruskal']
+                st.write('## Results of Kruskal-Wallis Test')
+                st.write('The Kruskal-Wallis test compares the groups by the ranks of their values, so it does not require normally distributed groups.')
+                if kruskal_result['All Groups the Same?'].values:
+                    st.write(f'### There is NO statistically significant difference in {measure_var} between {group_var} groups at the {(1-params["alpha"])*100}% confidence level.')
+                    st.write(kruskal_result)
+                else:
+                    st.write(f'### There IS a statistically significant difference in {measure_var} between {group_var} groups at the {(1-params["alpha"])*100}% confidence level.')
+                    st.write(kruskal_result)
+
+                    st.write('### Post-Hoc Pairwise Significance Test (Dunn)')
+                    st.write(f'First see if there is a statistically significant difference between the {measure_var} ranks (recorded in the "Different?" column) of the two {group_var}s on the left. If there is a statistically significant difference, then you can see which {group_var} tends to have higher {measure_var} in the "Higher" column.')
+                    write_pairwise_table(results['dunn'])
+                return
+
+            st.write(f'## Results of ANOVA Test')
+            if anova_result['All Groups the Same?'].values:
+                st.write(f'### There is NO statistically significant difference in {measure_var} means between {group_var} groups at the {(1-params["alpha"])*100}% confidence level.')
+                st.write(anova_result)
+            else:
+                st.write(f'### There IS a statistically significant difference in {measure_var} means between {group_var} groups at the {(1-params["alpha"])*100}% confidence level.')
+                st.write(anova_result)
+
+                st.write('### Post-Hoc Pairwise Significance Test')
+                st.write(f'First see if there is a statistically significant difference between the {measure_var} means (recorded in the "Different?" column) of the two {group_var}s on the left. If there is a statistically significant difference, then you can see which {group_var} has higher mean {measure_var} in the "Higher" column.')
+                write_pairwise_table(results['pairwise'])
+    return
+
+def write_pairwise_table(summary: pd.DataFrame):
+    total_pairs = summary.attrs.get('total_pairs', len(summary))
+    if len(summary) < total_pairs:
+        st.info(f'There are too many groups to show all {total_pairs} pairs. Showing the {len(summary)} most significant pairs.')
+    st.write(summary)
+    return
+
+def main_all_measures(df: pd.DataFrame, params: dict):
+    st.write('## Grouping Variable')
+    group_var = st.selectbox(
+        label = 'Select the grouping variable. This is the variable with which we will form groups of students. If the group variable is race, all students of the same race will be grouped together.', 
+        options = df.columns.to_list(),
+        index = len(df.columns.to_list())-1
+    )
+    measure_vars = st.multiselect(
+        label = 'Select the measurement variables. Remove any numeric columns that are not grades, such as Student ID.', 
+        options = [column for column in df.select_dtypes(include='number').columns if column != group_var],
+        default = get_default_measure_vars(df=df, group_var=group_var)
+    )
+    if len(measure_vars) == 0:
+        st.warning('Select at least one measurement variable.')
+        return
+    add_labels(rows=len(df), columns=len(df.columns), measures=len(measure_vars))
+
+    st.write('# Step 3: Run Analysis')
+    if st.button(label='Analyze'):
+        try:
+            with stage('multi_measure_analysis'):
+                summary = run_multi_measure_analysis(df=df, measure_vars=measure_vars, group_var=group_var, params=params)
+        except GroupingError as error:
+            st.warning(str(error))
+            return
+        with stage('render'):
+            st.write(f'Each measurement variable is compared between {group_var} groups. The "Significant?" column is True when the p-value is below {params["alpha"]}: for Homoskedasticity this means the variances differ, for ANOVA that the means differ, and for Pairwise that the two groups differ (the "Higher" group has the higher mean).')
+            anova = summary.xs('ANOVA', level='Analysis')
+            different = anova.index.get_level_values('Measure')[anova['Significant?'] == True].unique().to_list()
+            if different:
+                st.write(f'### There IS a statistically significant difference between {group_var} groups at the {(1-params["alpha"])*100}% confidence level in: {", ".join(different)}')
+            else:
+                st.write(f'### There is NO statistically significant difference between {group_var} groups in any measurement variable at the {(1-params["alpha"])*100}% confidence level.')
+            if summary.attrs.get('total_pairs', 0) > params.get('max_pairs', 10000):
+                st.info(f'There are too many groups to show all {summary.attrs["total_pairs"]} pairs. Showing the most significant pairs of each measurement variable.')
+            st.write(summary)
+    return
+
+def main_streaming(file, params: dict):
+    if detect_file_format(file) != 'csv':
+        st.warning('Only csv files can be analyzed in parts. Save the file as csv, or uncheck the box above to analyze the Excel file all at once.')
+        return
+    # Only read the first rows to choose variables
+    try:
+        preview = pd.read_csv(file, nrows=5)
+    except (ValueError, UnicodeDecodeError):
+        st.warning('Could not read file as csv.')
+        return
+    st.write('## Visually Check Data')
+    st.write('Below are the first few rows of your file. Please check that these are correct.')
+    st.write(preview)
+
+    st.write('# Step 2: Select Variables')
+    measure_var = st.selectbox(
+        label = 'Select the measurement variable.', 
+        options = preview.columns.to_list(),
+        index = 1
+    )
+    group_var = st.selectbox(
+        label = 'Select the grouping variable.', 
+        options = preview.columns.to_list(),
+        index = len(preview.columns.to_list())-1
+    )
+    if group_var == measure_var:
+        st.warning('The measurement variable cannot be the same as the grouping variable.')
+        return
+
+    st.write('# Step 3: Run Analysis')
+    if st.button(label='Analyze'):
+        file.seek(0)
+        try:
+            results = run_streaming_analysis(file=file, measure_var=measure_var, group_var=group_var, params=params, seed=params['seed'])
+        except GroupingError as error:
+            st.warning(str(error))
+            return
+        except (ValueError, UnicodeDecodeError):
+            st.warning(f'Could not read file as csv with a numeric {measure_var} column.')
+            return
+        st.write('Medians, the normality test and the homoskedasticity test are computed on a random sample of each large group. These are marked in the "Approximate?" column.')
+        st.write('## Descriptive Statistics')
+        st.write(results['descriptive_stats'])
+        st.write('### Normal Distribution')
+        st.write(results['normality'])
+        st.write('### Homoskedasticity')
+        st.write(results['homoskedasticity'])
+        st.write('## Results of ANOVA Test')
+        st.write(results['anova'])
+        st.write('### Post-Hoc Pairwise Significance Test')
+        write_pairwise_table(results['pairwise'])
     return
 
 if __name__ == '__main__':
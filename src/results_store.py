@@ -0,0 +1,268 @@
+"""Columnar store of analysis results that can be queried later without loading every result into memory.
+
+Each run of the analysis is written to one uncompressed Arrow IPC (Feather v2) file with the fixed RESULTS_SCHEMA:
+
+    results/<measure_var>/<group_var>/<fingerprint>-<params digest>.arrow
+
+The file's schema metadata records the dataset fingerprint, the variables, the params used and the schema version. Readers memory-map the files, skip directories of other measure/group variables and only copy the rows that pass the filter.
+
+Example:
+    python src/results_store.py ./results --measure Final --significant --output significant.csv
+"""
+import argparse
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+from analysis_cache import dataset_fingerprint
+from file_methods import atomic_write
+from helper_methods import flatten_table
+
+SCHEMA_VERSION = 1
+FILE_SUFFIX = '.arrow'
+
+# Result table columns and the type each is stored as. Conclusion columns ('Normally Distributed?', 'Different?', ...) are replaced by Significant?
+RESULTS_SCHEMA = pa.schema([
+    ('Measure Variable', pa.string()),
+    ('Group Variable', pa.string()),
+    ('Fingerprint', pa.dictionary(pa.int32(), pa.string())),
+    ('Analysis', pa.dictionary(pa.int32(), pa.string())),
+    ('Group', pa.string()),
+    ('Other Group', pa.string()),
+    ('Min', pa.float64()),
+    ('Max', pa.float64()),
+    ('Mean', pa.float64()),
+    ('Median', pa.float64()),
+    ('Standard Deviation', pa.float64()),
+    ('Statistic', pa.float64()),
+    ('p-Value', pa.float64()),
+    ('Significant?', pa.bool_()),
+    ('Higher', pa.string()),
+    ('Sample Size', pa.int64()),
+    ('Permutations', pa.int64()),
+    ('Difference', pa.float64()),
+    ('Lower', pa.float64()),
+    ('Upper', pa.float64()),
+    ('Params', pa.dictionary(pa.int32(), pa.string()))
+])
+PARTITIONING = ds.partitioning(pa.schema([RESULTS_SCHEMA.field('Measure Variable'), RESULTS_SCHEMA.field('Group Variable')]))
+CONCLUSION_COLUMNS = ['Normally Distributed?', 'Equal Variance?', 'All Groups the Same?', 'Different?']
+
+
+def params_to_json(params: dict) -> str:
+    """Order-independent JSON text of params."""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def get_results_path(directory: str, fingerprint: str, measure_var: str, group_var: str, params: dict) -> Path:
+    """Path of the file holding the results of one analysis. Rerunning the same analysis overwrites the same file."""
+    digest = hashlib.blake2b(params_to_json(params).encode(), digest_size=8).hexdigest()
+    return Path(directory) / quote(str(measure_var), safe='') / quote(str(group_var), safe='') / f'{fingerprint}-{digest}{FILE_SUFFIX}'
+
+
+def results_to_frame(results: dict, alpha: float) -> pd.DataFrame:
+    """Flattens the result tables of run_analysis into the columns of RESULTS_SCHEMA (without the run columns).
+
+    Args:
+        results (dict): Result tables of helper_methods.run_analysis or analysis_cache.run_cached_analysis. Entries that are not tables are skipped.
+
+        alpha (float): Significance level the results were computed with.
+
+    Returns:
+        frame (pd.DataFrame): One row per result row with an Analysis column.
+
+    Raises:
+        ValueError: If a result table has a column that RESULTS_SCHEMA cannot store.
+    """
+    tables = []
+    for analysis, table in results.items():
+        if not isinstance(table, pd.DataFrame):
+            continue
+        table = flatten_table(table)
+        unknown = set(table.columns) - set(RESULTS_SCHEMA.names) - set(CONCLUSION_COLUMNS)
+        if unknown:
+            raise ValueError(f'The {analysis} table has columns the results schema does not store: {sorted(unknown)}')
+        if 'p-Value' in table.columns:
+            table['Significant?'] = (table['p-Value'] < alpha).where(table['p-Value'].notna())
+        elif 'Different?' in table.columns:
+            table['Significant?'] = table['Different?']
+        table = table.drop(columns=[column for column in CONCLUSION_COLUMNS if column in table.columns])
+        table.insert(0, 'Analysis', analysis)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=['Analysis'])
+    return pd.concat(tables, ignore_index=True, sort=False)
+
+
+def results_to_table(results: dict, fingerprint: str, measure_var: str, group_var: str, params: dict) -> pa.Table:
+    """Converts the result tables of one analysis to an Arrow table with RESULTS_SCHEMA and metadata describing the run."""
+    frame = results_to_frame(results, alpha=params['alpha'])
+    params_json = params_to_json(params)
+    run_columns = {'Measure Variable':str(measure_var), 'Group Variable':str(group_var), 'Fingerprint':fingerprint, 'Params':params_json}
+    arrays = []
+    for field in RESULTS_SCHEMA:
+        if field.name in run_columns:
+            values = pd.Series(run_columns[field.name], index=frame.index, dtype=object)
+        elif field.name in frame.columns:
+            values = frame[field.name]
+        else:
+            values = pd.Series(None, index=frame.index, dtype=object)
+        if pa.types.is_string(field.type):
+            # Group labels and Higher may be numbers in the original data
+            values = values.map(lambda x: x if x is None or pd.isna(x) else str(x))
+        elif pa.types.is_integer(field.type):
+            values = values.astype('Int64')
+        elif pa.types.is_floating(field.type):
+            values = values.astype(float)
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    metadata = {
+        'schema_version':str(SCHEMA_VERSION),
+        'fingerprint':fingerprint,
+        'measure_var':str(measure_var),
+        'group_var':str(group_var),
+        'params':params_json,
+        'created':datetime.now(timezone.utc).isoformat()
+    }
+    return pa.Table.from_arrays(arrays, schema=RESULTS_SCHEMA.with_metadata(metadata))
+
+
+def write_results(results: dict, directory: str, df: pd.DataFrame, measure_var: str, group_var: str, params: dict, fingerprint: str = None) -> Path:
+    """Writes the results of one analysis to the results store in directory.
+
+    Args:
+        results (dict): Result tables of helper_methods.run_analysis or analysis_cache.run_cached_analysis.
+
+        directory (str): Root directory of the results store. Created if missing.
+
+        df (pd.DataFrame): Dataset the results were computed from. Only used for its fingerprint.
+
+        measure_var (str): Variable in df upon which groups were compared.
+
+        group_var (str): Variable in df upon which groupings were performed.
+
+        params (dict): Collection of passed parameters, see helper_methods.get_default_params.
+
+        fingerprint (str): analysis_cache.dataset_fingerprint of the measure_var and group_var columns of df, if already known.
+
+    Returns:
+        path (Path): Path of the written file.
+
+    Raises:
+        ValueError: If a result table has a column that RESULTS_SCHEMA cannot store.
+    """
+    if fingerprint is None:
+        fingerprint = dataset_fingerprint(df, [measure_var, group_var])
+    table = results_to_table(results, fingerprint=fingerprint, measure_var=measure_var, group_var=group_var, params=params)
+    path = get_results_path(directory, fingerprint=fingerprint, measure_var=measure_var, group_var=group_var, params=params)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as temporary:
+        with pa.OSFile(temporary, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    return path
+
+
+def open_results(directory: str) -> ds.Dataset:
+    """Memory-mapped dataset of every results file in directory. Nothing is read until the dataset is scanned."""
+    return ds.dataset(
+        directory,
+        schema=RESULTS_SCHEMA,
+        format='ipc',
+        partitioning=PARTITIONING,
+        filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True)
+    )
+
+
+def get_results_filter(measure_vars: List[str] = None, group_vars: List[str] = None, analyses: List[str] = None, significant: bool = None, fingerprint: str = None) -> ds.Expression:
+    """Dataset filter selecting the given variables, analyses and significance. Arguments left as None do not filter."""
+    conditions = []
+    if measure_vars is not None:
+        conditions.append(ds.field('Measure Variable').isin([str(measure_var) for measure_var in measure_vars]))
+    if group_vars is not None:
+        conditions.append(ds.field('Group Variable').isin([str(group_var) for group_var in group_vars]))
+    if analyses is not None:
+        conditions.append(ds.field('Analysis').isin(list(analyses)))
+    if significant is not None:
+        conditions.append(ds.field('Significant?') == significant)
+    if fingerprint is not None:
+        conditions.append(ds.field('Fingerprint') == fingerprint)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_results(directory: str, measure_vars: List[str] = None, group_vars: List[str] = None, analyses: List[str] = None, significant: bool = None, fingerprint: str = None, columns: List[str] = None) -> pd.DataFrame:
+    """Reads the matching rows of a results store. Files of other measure/group variables are not opened.
+
+    Args:
+        directory (str): Root directory of the results store.
+
+        measure_vars (List[str]): Only read results of these measurement variables.
+
+        group_vars (List[str]): Only read results of these grouping variables.
+
+        analyses (List[str]): Only read these analyses, such as 'normality' or 'pairwise'.
+
+        significant (bool): Only read rows whose Significant? is this value. Rows without a p-value (such as descriptive statistics) are left out when set.
+
+        fingerprint (str): Only read results of the dataset with this analysis_cache.dataset_fingerprint.
+
+        columns (List[str]): Columns of RESULTS_SCHEMA to read. Defaults to all.
+
+    Returns:
+        results (pd.DataFrame): Matching rows.
+    """
+    if not Path(directory).is_dir():
+        return pd.DataFrame(columns=columns or RESULTS_SCHEMA.names)
+    expression = get_results_filter(measure_vars=measure_vars, group_vars=group_vars, analyses=analyses, significant=significant, fingerprint=fingerprint)
+    table = open_results(directory).to_table(columns=columns, filter=expression)
+    return table.to_pandas()
+
+
+def read_results_metadata(path: str) -> dict:
+    """Schema version, fingerprint, variables, params and creation time of one results file, read without its rows."""
+    with pa.memory_map(str(path)) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    metadata = {key.decode():value.decode() for key, value in metadata.items()}
+    if 'params' in metadata:
+        metadata['params'] = json.loads(metadata['params'])
+    return metadata
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Query a directory of saved analysis results.')
+    parser.add_argument('directory', help='Results directory written by write_results (see batch_analysis.py --results-dir).')
+    parser.add_argument('-m', '--measure', action='append', dest='measure_vars', help='Measurement variable to keep. Repeatable. Defaults to all.')
+    parser.add_argument('-g', '--group', action='append', dest='group_vars', help='Grouping variable to keep. Repeatable. Defaults to all.')
+    parser.add_argument('-a', '--analysis', action='append', dest='analyses', help='Analysis to keep, such as anova or pairwise. Repeatable. Defaults to all.')
+    significance = parser.add_mutually_exclusive_group()
+    significance.add_argument('--significant', action='store_const', const=True, dest='significant', help='Only keep statistically significant rows.')
+    significance.add_argument('--not-significant', action='store_const', const=False, dest='significant', help='Only keep rows that are not statistically significant.')
+    parser.add_argument('-o', '--output', default=None, help='Write the rows to this csv (or .parquet) path instead of printing them.')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> None:
+    args = parse_args(argv)
+    results = read_results(args.directory, measure_vars=args.measure_vars, group_vars=args.group_vars, analyses=args.analyses, significant=args.significant)
+    if args.output is None:
+        print(results.to_string(index=False))
+    elif Path(args.output).suffix.lower() == '.parquet':
+        results.to_parquet(args.output, index=False)
+    else:
+        results.to_csv(args.output, index=False)
+    return
+
+
+if __name__ == '__main__':
+    main()
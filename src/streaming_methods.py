@@ -0,0 +1,155 @@
+"""Analysis of csv files too large to load into memory at once.
+
+The file is read in chunks holding only the measurement and group columns. Per-group count, mean, sum of squared deviations, min and max are updated online and are exact, so the descriptive stats (except the median), the ANOVA and the pairwise tests are exact. Tests that need the raw values (Shapiro-Wilk, Levene) and the medians are computed on a bounded-size uniform reservoir sample of each group, and are marked as approximate whenever a group has more values than the sample holds. The Kruskal-Wallis, Dunn and resampling tests need every value, so they are only run when every group fits in its sample.
+"""
+from typing import List
+import numpy as np
+import pandas as pd
+from helper_methods import GroupedArray, GroupingError, GroupStats, build_results, check_groups, get_descriptive_stats, get_groups
+
+
+class StreamingGroupStats:
+    """Running per-group statistics and reservoir samples, updated one chunk of rows at a time.
+
+    Args:
+        sample_size (int): Maximum number of values kept per group for the tests that need raw values.
+
+        seed (int, optional): Seed of the reservoir sampling, for reproducible results.
+    """
+
+    def __init__(self, sample_size: int = 5000, seed: int = None):
+        self.sample_size = sample_size
+        self.group_names = []
+        self.stats = GroupStats.empty(0)
+        self.samples = []
+        self._index = {}
+        self._rng = np.random.default_rng(seed)
+
+    def _get_index(self, group_name: str) -> int:
+        if group_name not in self._index:
+            self._index[group_name] = len(self.group_names)
+            self.group_names.append(group_name)
+            self.samples.append(np.empty(0))
+        return self._index[group_name]
+
+    def update(self, group_names: List[str], groups: GroupedArray) -> None:
+        """Adds one chunk of grouped values, as returned by get_groups."""
+        index = np.array([self._get_index(name) for name in group_names], dtype=np.int64)
+        num_groups = len(self.group_names)
+        previous = self.stats.scatter(np.arange(len(self.stats)), num_groups)
+        self.stats = previous.merge(GroupStats.from_groups(groups).scatter(index, num_groups))
+        for i, values in zip(index, groups):
+            self._update_sample(i, values, seen=previous.counts[i])
+        return
+
+    def _update_sample(self, i: int, values: np.ndarray, seen: int) -> None:
+        """Reservoir sampling (Algorithm R), vectorized over the values of one chunk."""
+        sample = self.samples[i]
+        room = max(0, self.sample_size - len(sample))
+        sample = np.concatenate([sample, values[:room]])
+        rest = values[room:]
+        if len(rest):
+            # Value number t (counting from 1) replaces a random slot with probability sample_size / t
+            positions = seen + room + np.arange(1, len(rest) + 1)
+            slots = self._rng.integers(0, positions)
+            keep = slots < self.sample_size
+            sample[slots[keep]] = rest[keep]
+        self.samples[i] = sample
+        return
+
+    def result(self):
+        """Returns the accumulated groups, sorted by name.
+
+        Returns:
+            group_names (List[str]): Sorted names of the groups.
+
+            group_stats (GroupStats): Exact statistics of each group. Medians are taken from the samples.
+
+            samples (GroupedArray): Reservoir sample of each group.
+
+            approximate (np.ndarray): Whether each group has more values than its sample holds.
+        """
+        order = np.argsort(np.array(self.group_names, dtype=object), kind='stable')
+        group_names = [self.group_names[i] for i in order]
+        samples = GroupedArray.from_groups([self.samples[i] for i in order])
+        group_stats = self.stats.take(order)
+        group_stats.medians = np.array([np.median(sample) for sample in samples])
+        approximate = group_stats.counts > self.sample_size
+        return group_names, group_stats, samples, approximate
+
+
+def stream_group_stats(file, measure_var: str, group_var: str, chunksize: int = 100000, sample_size: int = 5000, seed: int = None, max_groups: int = None) -> StreamingGroupStats:
+    """Reads a csv file in chunks and accumulates the statistics of each group.
+
+    Args:
+        file: Path or file object of a csv file.
+
+        measure_var (str): Variable in the file upon which groups are compared.
+
+        group_var (str): Variable in the file upon which groupings are performed.
+
+        chunksize (int): Number of rows read at a time.
+
+        sample_size (int): Maximum number of values kept per group for the tests that need raw values.
+
+        seed (int, optional): Seed of the reservoir sampling.
+
+        max_groups (int, optional): Stop reading as soon as there are more groups than this, rather than after the whole file.
+
+    Returns:
+        accumulator (StreamingGroupStats): The accumulated statistics.
+
+    Raises:
+        GroupingError: If there are more than max_groups groups.
+    """
+    accumulator = StreamingGroupStats(sample_size=sample_size, seed=seed)
+    # Every chunk infers its own dtypes, so a whole-number group column is float only in chunks with a missing group; get_groups names its groups the same either way
+    for chunk in pd.read_csv(file, usecols=[measure_var, group_var], chunksize=chunksize):
+        group_names, groups = get_groups(df=chunk, measure_var=measure_var, group_var=group_var)
+        # Checked before and after adding the chunk, so at most twice max_groups reservoirs are ever allocated
+        if max_groups is not None and len(group_names) > max_groups:
+            raise too_many_groups(max_groups)
+        accumulator.update(group_names, groups)
+        if max_groups is not None and len(accumulator.group_names) > max_groups:
+            raise too_many_groups(max_groups)
+    return accumulator
+
+
+def too_many_groups(max_groups: int) -> GroupingError:
+    return GroupingError(f'The grouping variable has more than {max_groups} different values, more than the groups that can be compared. Choose a grouping variable with fewer values, such as a category rather than an identifier.')
+
+
+def run_streaming_analysis(file, measure_var: str, group_var: str, params: dict, chunksize: int = 100000, sample_size: int = 5000, seed: int = None) -> dict:
+    """Runs every step of the analysis on a csv file read in chunks.
+
+    Args:
+        file: Path or file object of a csv file.
+
+        measure_var (str): Variable in the file upon which groups are compared.
+
+        group_var (str): Variable in the file upon which groupings are performed.
+
+        params (dict): Collection of passed parameters, see helper_methods.get_default_params.
+
+        chunksize (int): Number of rows read at a time.
+
+        sample_size (int): Maximum number of values kept per group for the tests that need raw values.
+
+        seed (int, optional): Seed of the reservoir sampling.
+
+    Returns:
+        results (dict): Result tables of helper_methods.build_results. The tests on ranks and the resampling tests are only run if every group fit in its sample. The descriptive stats, normality and homoskedasticity tables have an 'Approximate?' column.
+
+    Raises:
+        GroupingError: If the groups fail helper_methods.check_groups.
+    """
+    accumulator = stream_group_stats(file, measure_var=measure_var, group_var=group_var, chunksize=chunksize, sample_size=sample_size, seed=seed, max_groups=params.get('max_groups', 1000))
+    group_names, group_stats, samples, approximate = accumulator.result()
+    check_groups(group_names=group_names, groups=group_stats, params=params)
+
+    descriptive_stats = get_descriptive_stats(df=None, group_var=group_var, measure_var=measure_var, group_names=group_names, group_stats=group_stats)
+    descriptive_stats['Approximate?'] = approximate
+    results = build_results(group_names=group_names, groups=samples, group_stats=group_stats, params=params, descriptive_stats=descriptive_stats, complete=not approximate.any())
+    results['normality']['Approximate?'] = approximate
+    results['homoskedasticity']['Approximate?'] = approximate.any()
+    return results
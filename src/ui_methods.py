@@ -0,0 +1,197 @@
+import io
+import os
+import uuid
+from typing import Tuple
+import pandas as pd
+import streamlit as st
+from analysis_cache import content_fingerprint, default_cache
+from examples import get_example_source, read_example_file, seed_example_results
+from helper_methods import NORMALITY_CHECKERS, file_to_dataframe, get_default_params
+from instrumentation import Profiler
+
+
+def load_uploaded_file(file) -> Tuple[pd.DataFrame, str]:
+    """Reads an uploaded file, reusing the result of any earlier upload with identical contents.
+
+    The contents are only hashed the first time each upload is seen, not on every rerun of the page.
+
+    Returns:
+        df (pd.DataFrame): Contents of the file.
+
+        fingerprint (str): analysis_cache.content_fingerprint of the file, to key the analyses of df by.
+    """
+    # Streamlit 1.1 calls the upload's identifier id, later versions file_id
+    upload_id = getattr(file, 'file_id', None) or getattr(file, 'id', None)
+    if upload_id is None:
+        fingerprint = content_fingerprint(file.getvalue())
+    else:
+        fingerprint = default_cache.get_or_compute(('upload', get_session_id(), upload_id, file.name, file.size), lambda: content_fingerprint(file.getvalue()))
+    df = default_cache.get_or_compute(('file', fingerprint), lambda: file_to_dataframe(file.getvalue()))
+    return df, fingerprint
+
+
+def get_session_id() -> str:
+    """Random identifier of the current browser session, so one user's uploads are never compared with another's."""
+    if 'session_id' not in st.session_state:
+        st.session_state['session_id'] = uuid.uuid4().hex
+    return st.session_state['session_id']
+
+
+def get_example_data() -> Tuple[pd.DataFrame, str]:
+    """Reads the bundled example data (or EXAMPLE_DATA_URL if set) and its content_fingerprint. The first read also loads its precomputed results into the cache, if there are any for this version of the analysis."""
+    source = get_example_source()
+
+    def load() -> Tuple[pd.DataFrame, str]:
+        seed_example_results(default_cache)
+        content = read_example_file(source)
+        return pd.read_csv(io.BytesIO(content)), content_fingerprint(content)
+    return default_cache.get_or_compute(('example_data', source), load)
+
+
+def create_sidebar() -> dict:
+    st.sidebar.write('# Additional Parameters')
+    confidence_level = st.sidebar.number_input(
+        label='Confidence Level:',
+        min_value=0.0,
+        max_value=1.0,
+        value=0.95
+    )
+    # Rounded so the default matches get_default_params and the precomputed example results
+    alpha = round(1 - confidence_level, 10)
+
+    center = st.sidebar.selectbox(
+        label = 'Measure of Center:',
+        options = ['mean', 'median', 'trimmed'],
+        index = 0
+    )
+
+    if center == 'trimmed':
+        proportiontocut = st.sidebar.number_input(
+        label = 'Proportion to Cut:',
+        min_value=0.0,
+        max_value=1.0,
+        value=0.5
+    )
+    else:
+        proportiontocut = 0.5
+
+    normality_checker = st.sidebar.selectbox(
+        label = 'How to Check Normality Assumption:',
+        options = NORMALITY_CHECKERS,
+        index = 0,
+        help = "Shapiro-Wilk is the most powerful for small groups. D'Agostino K-Squared, Jarque-Bera and Anderson-Darling are much faster for large files."
+    )
+    subsample = st.sidebar.checkbox(
+        label = 'Check Normality on a Random Sample of Large Groups',
+        value = False,
+        help = 'Shapiro-Wilk p-values are not accurate for groups of more than 5000 students. The random sample uses the Random Seed below.'
+    )
+    if subsample:
+        normality_sample_size = st.sidebar.number_input(
+        label = 'Sample Size per Group:',
+        min_value=20,
+        value=5000
+    )
+    else:
+        normality_sample_size = None
+
+    homoskedasticity_checker = st.sidebar.selectbox(
+        label = 'How to Check Homoskedasticity Assumption:',
+        options = ['Levene Test'],
+        index = 0
+    )
+
+    correction = st.sidebar.selectbox(
+        label = 'Multiple Comparison Correction for Pairwise Tests:',
+        options = ['None', 'Holm', 'Bonferroni'],
+        index = 0
+    )
+
+    group_test = st.sidebar.selectbox(
+        label = 'Test for Differences Between Groups:',
+        options = ['ANOVA', 'Kruskal-Wallis', 'Automatic'],
+        index = 0,
+        help = 'Kruskal-Wallis does not require normally distributed groups. Automatic uses Kruskal-Wallis when not all groups are normally distributed.'
+    )
+
+    resampling = st.sidebar.checkbox(
+        label = 'Add Permutation Test and Bootstrap Confidence Intervals',
+        value = False,
+        help = 'These do not require normally distributed groups, but take longer for large files.'
+    )
+    n_resamples = st.sidebar.number_input(
+        label = 'Number of Permutations/Bootstrap Resamples:',
+        min_value=100,
+        max_value=100000,
+        value=10000
+    )
+    seed = st.sidebar.number_input(
+        label = 'Random Seed:',
+        min_value=0,
+        value=0
+    )
+    resampling_workers = st.sidebar.number_input(
+        label = 'Processes for Permutations/Bootstrap Resamples:',
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=1,
+        help = 'More processes finish large resampling jobs sooner. Results are the same for any number of processes.'
+    )
+    resampling_memory_mb = st.sidebar.number_input(
+        label = 'Memory per Resampling Process (MB):',
+        min_value=16,
+        value=256
+    )
+
+    return {**get_default_params(), 'alpha':alpha, 'center':center, 'normality_checker':normality_checker, 'normality_sample_size':normality_sample_size, 'homoskedasticity_checker':homoskedasticity_checker, 'proportiontocut':proportiontocut, 'correction':correction, 'group_test':group_test, 'resampling':resampling, 'n_resamples':n_resamples, 'resampling_workers':resampling_workers, 'resampling_memory_mb':resampling_memory_mb, 'seed':seed}
+
+
+def visual_check(df: pd.DataFrame) -> None:
+    st.write('## Visually Check Data')
+    st.write('Below are the first few rows of your file. Please check that these are correct.')
+    st.write(df.head())
+    return
+
+
+def create_diagnostics_option() -> bool:
+    return st.sidebar.checkbox(
+        label = 'Show Diagnostics',
+        value = False,
+        help = 'Time and memory use of each step of the analysis. Memory is only measured when the server runs with ANALYSIS_METRICS_DIR set, and includes other users analyzing at the same time.'
+    )
+
+
+def create_diagnostics_panel(profiler: Profiler) -> None:
+    st.sidebar.write('# Diagnostics')
+    stages = profiler.to_dataframe()
+    stages['wall_ms'] = stages['wall_seconds'] * 1000
+    stages['cpu_ms'] = stages['cpu_seconds'] * 1000
+    # Missing unless memory is traced
+    stages['peak_MiB'] = stages['peak_bytes'].astype(float) / 2**20
+    st.sidebar.write(stages[['stage', 'group', 'wall_ms', 'cpu_ms', 'peak_MiB']])
+    st.sidebar.download_button(
+        label = 'Download as JSON Lines',
+        data = stages[['stage', 'group', 'wall_seconds', 'cpu_seconds', 'peak_bytes']].assign(**profiler.labels).to_json(orient='records', lines=True),
+        file_name = 'stages.jsonl'
+    )
+    st.sidebar.download_button(
+        label = 'Download as Prometheus Text',
+        data = profiler.to_prometheus(),
+        file_name = 'analysis.prom'
+    )
+    return
+
+
+def get_menu_items() -> dict:
+    menu = {
+        "Get Help": None,
+        "Report a Bug": 'https://github.com/middlec000/grades_vs_student_characteristic',
+        "About": "Last Updated: December 5, 2021\n\nThis site is intended to be used by teachers to test if there are statistically significant differences in class performance between groups of students. These groups are formed using characteristics of the students such as ethnicity, income level, or neighborhood. These characteristics must be present in the data file before it is uploaded and likely must be added to the grades file by the teacher.\n\nThis site may be used by anyone wishing to investigate differences in a continuous variable between groups where groups are based on a categorical variable.\n\nView code at: [https://github.com/middlec000/grades_vs_student_characteristic](https://github.com/middlec000/grades_vs_student_characteristic)\n\nCreated by Colin Middleton.\n\nPersonal website: [https://middlec000.github.io/](https://middlec000.github.io/)"
+    }
+    return menu
+
+
+def file_format_example() -> pd.DataFrame:
+    data = {'Student ID (Optional, Not Used)':['Student ID 1', 'Student ID 2'], 'Measurement (Continuous)':['Measurement for Student 1', 'Measurement for Student 2'], 'Group (Categorical)':['Group for Student 1', 'Group for Student 2']}
+    example = pd.DataFrame(data=data)
+    return example
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+import sys
+
+# The modules in src import each other by name, as when the website runs from that directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import numpy as np
+import pandas as pd
+import pytest
+from helper_methods import get_default_params, run_analysis
+
+
+@pytest.fixture
+def make_gradebook():
+    """Builds a gradebook with a Student ID, a Final score and a Race group of each student. groups defaults to random choices of A to D."""
+    def make(num_rows: int, groups=None, seed: int = 0) -> pd.DataFrame:
+        rng = np.random.default_rng(seed)
+        final = rng.normal(loc=70, scale=10, size=num_rows).round(1)
+        if groups is None:
+            groups = rng.choice(['A', 'B', 'C', 'D'], size=num_rows)
+        return pd.DataFrame({'Student ID': np.arange(num_rows), 'Final': final, 'Race': groups})
+    return make
+
+
+@pytest.fixture
+def assert_matches_full():
+    """Checks result tables against helper_methods.run_analysis of the whole gradebook. columns optionally limits a table to the columns that should match."""
+    def check(results: dict, df: pd.DataFrame, tables: list, columns: dict = None) -> None:
+        columns = columns or {}
+        full = run_analysis(df, measure_var='Final', group_var='Race', params=get_default_params())
+        for table in tables:
+            assert results[table].index.tolist() == full[table].index.tolist()
+            expected, actual = full[table], results[table]
+            if table in columns:
+                expected, actual = expected[columns[table]], actual[columns[table]]
+            pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-9)
+    return check
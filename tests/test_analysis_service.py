@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from analysis_service import PARAM_TYPES, serve
+from helper_methods import get_default_params
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('data')
+    # A file next to the data directory that requests must not reach
+    (data_dir.parent / 'secret.csv').write_text('Final,Race\n1,A\n')
+    server = serve(port=0, workers=2, data_dir=str(data_dir))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.service.shutdown()
+
+
+def request(server, path: str, body: dict = None) -> tuple:
+    """Sends a GET (or, with a body, a POST) request and returns the status and the decoded response."""
+    host, port = server.server_address[:2]
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(f'http://{host}:{port}{path}', data=data), timeout=60) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def to_dataset(df) -> dict:
+    return {'columns': df.columns.to_list(), 'data': df.to_numpy().tolist()}
+
+
+def test_param_types_cover_default_params():
+    assert set(PARAM_TYPES) == set(get_default_params())
+
+
+def test_health(server):
+    status, response = request(server, '/health')
+    assert status == 200
+    assert response['status'] == 'ok'
+    assert response['workers'] == 2
+
+
+def test_identical_requests_are_coalesced(server, make_gradebook):
+    service = server.service
+    df = make_gradebook(300, seed=1)
+    coalesced = service.coalesced
+    first = service.submit(df, 'Final', 'Race', get_default_params())
+    second = service.submit(df, 'Final', 'Race', get_default_params())
+    assert second is first
+    assert service.coalesced == coalesced + 1
+    status, response = request(server, '/analyze', {'dataset': to_dataset(df), 'measure_var': 'Final', 'group_var': 'Race'})
+    assert status == 200
+    assert response['results'] == first.result()
+
+
+def test_batch_reports_errors_per_pair(server, make_gradebook):
+    df = make_gradebook(100, seed=2)
+    df.loc[0, 'Race'] = 'E'
+    body = {'dataset': to_dataset(df), 'pairs': [['Final', 'Race'], ['Missing', 'Race'], ['Final', 'Race']], 'params': {'min_group_size': 3}}
+    status, response = request(server, '/batch', body)
+    assert status == 200
+    first, missing, last = response['analyses']
+    assert 'Missing' in missing['error']
+    # Group E has one member, which the analysis itself rejects
+    assert 'error' in first and first == last
+
+
+def test_path_outside_data_dir_is_not_found(server):
+    status, response = request(server, '/analyze', {'dataset': {'path': '../secret.csv'}, 'measure_var': 'Final', 'group_var': 'Race'})
+    assert status == 404
+    assert 'results' not in response
+
+
+@pytest.mark.parametrize('params', [{'alpha': '0.05'}, {'resampling': 1}, {'n_resamples': 100.5}, {'seed': True}])
+def test_params_of_the_wrong_type_are_rejected(server, make_gradebook, params):
+    status, response = request(server, '/analyze', {'dataset': to_dataset(make_gradebook(50)), 'measure_var': 'Final', 'group_var': 'Race', 'params': params})
+    assert status == 400
+    assert next(iter(params)) in response['error']
+
+
+def test_pool_is_replaced_after_a_worker_dies(server, make_gradebook):
+    service = server.service
+    broken = service.executor
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result(timeout=60)
+    status, response = request(server, '/analyze', {'dataset': to_dataset(make_gradebook(120, seed=3)), 'measure_var': 'Final', 'group_var': 'Race'})
+    assert status == 200
+    assert 'results' in response
+    assert service.executor is not broken
@@ -0,0 +1,62 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from helper_methods import detect_file_format, file_to_dataframe, get_csv_engine
+
+CSV = b'Student ID,Final,Race\n1,71.5,A\n2,64.0,B\n3,88.0,A\n4,90.5,A\n5,55.0,B\n6,70.0,B\n'
+
+
+@pytest.mark.parametrize('header, name, expected', [
+    (b'PK\x03\x04rest of the zip', 'grades.csv', 'xlsx'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1rest', 'grades.csv', 'xls'),
+    (CSV, 'grades.xlsx', 'xlsx'),
+    (CSV, 'grades.XLS', 'xls'),
+    (CSV, 'grades.txt', 'csv'),
+    (CSV, '', 'csv')
+])
+def test_detect_file_format(header, name, expected):
+    file = io.BytesIO(header)
+    file.name = name
+    assert detect_file_format(file) == expected
+    # Uploaded files are read again afterwards, so the position is kept
+    assert file.read() == header
+
+
+def test_detect_file_format_from_path_and_bytes(tmp_path):
+    path = tmp_path / 'grades.bin'
+    path.write_bytes(b'PK\x03\x04')
+    assert detect_file_format(path) == 'xlsx'
+    assert detect_file_format(str(path)) == 'xlsx'
+    assert detect_file_format(CSV) == 'csv'
+
+
+def test_csv_engine_uses_pyarrow_when_installed():
+    pytest.importorskip('pyarrow')
+    assert get_csv_engine() == 'pyarrow'
+
+
+@pytest.mark.parametrize('file', [CSV, io.BytesIO(CSV)])
+def test_csv_columns_are_typed(file):
+    df = file_to_dataframe(file)
+    assert df.columns.tolist() == ['Student ID', 'Final', 'Race']
+    assert df['Race'].dtype == 'category'
+    assert np.issubdtype(df['Final'].dtype, np.floating)
+    assert df['Final'].tolist() == [71.5, 64.0, 88.0, 90.5, 55.0, 70.0]
+
+
+def test_high_cardinality_text_is_not_categorized():
+    df = file_to_dataframe(b'Name,Final\nAda,1\nBo,2\nCy,3\nDee,4\n')
+    assert df['Name'].dtype != 'category'
+
+
+def test_corrupt_excel_file_raises_type_error():
+    with pytest.raises(TypeError):
+        file_to_dataframe(b'PK\x03\x04 not really a zip file')
+
+
+def test_excel_round_trip(tmp_path):
+    pytest.importorskip('openpyxl')
+    path = tmp_path / 'grades.xlsx'
+    pd.read_csv(io.BytesIO(CSV)).to_excel(path, index=False)
+    pd.testing.assert_frame_equal(file_to_dataframe(str(path)), file_to_dataframe(CSV), check_dtype=False)
@@ -0,0 +1,48 @@
+import os
+import threading
+import pytest
+from file_methods import atomic_write
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = tmp_path / 'report.txt'
+    path.write_text('old')
+    with atomic_write(path) as temporary:
+        with open(temporary, 'w') as output:
+            output.write('new')
+        assert path.read_text() == 'old'
+    assert path.read_text() == 'new'
+    assert os.listdir(tmp_path) == ['report.txt']
+
+
+def test_atomic_write_keeps_file_on_error(tmp_path):
+    path = tmp_path / 'report.txt'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as temporary:
+            with open(temporary, 'w') as output:
+                output.write('partial')
+            raise RuntimeError
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['report.txt']
+
+
+def test_concurrent_atomic_writes_do_not_collide(tmp_path):
+    path = tmp_path / 'report.txt'
+    errors = []
+
+    def write(i: int) -> None:
+        try:
+            with atomic_write(path) as temporary:
+                with open(temporary, 'w') as output:
+                    output.write(str(i) * 1000)
+        except Exception as error:
+            errors.append(error)
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert path.read_text() in {str(i) * 1000 for i in range(10)}
+    assert os.listdir(tmp_path) == ['report.txt']
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from analysis_cache import AnalysisCache
+from helper_methods import get_default_params
+from incremental_methods import run_incremental_analysis
+
+TABLES = ['descriptive_stats', 'anova', 'pairwise']
+
+
+@pytest.fixture
+def assert_update_matches_full(assert_matches_full):
+    """Analyzing current after previous gives the same tables as analyzing current from scratch."""
+    def check(previous, current, mode: str) -> None:
+        params = get_default_params()
+        lineages = AnalysisCache()
+        run_incremental_analysis(previous, key_var='Student ID', measure_var='Final', group_var='Race', params=params, lineages=lineages)
+        incremental = run_incremental_analysis(current, key_var='Student ID', measure_var='Final', group_var='Race', params=params, lineages=lineages)
+        assert incremental['update']['mode'] == mode
+        assert_matches_full(incremental, current, tables=TABLES)
+    return check
+
+
+def test_appended_rows_match_full(make_gradebook, assert_update_matches_full):
+    gradebook = make_gradebook(220)
+    assert_update_matches_full(gradebook.iloc[:200], gradebook, mode='delta')
+
+
+def test_changed_and_removed_rows_match_full(make_gradebook, assert_update_matches_full):
+    previous = make_gradebook(200)
+    current = previous.drop(index=[3, 50, 120]).reset_index(drop=True)
+    current.loc[10, 'Final'] = 99.5
+    current.loc[20, 'Race'] = 'A' if current.loc[20, 'Race'] != 'A' else 'B'
+    current.loc[30, 'Final'] = np.nan
+    assert_update_matches_full(previous, current, mode='delta')
+
+
+def test_removing_a_whole_group_matches_full(make_gradebook, assert_update_matches_full):
+    previous = make_gradebook(200)
+    previous.loc[:4, 'Race'] = 'E'
+    current = previous.iloc[5:].reset_index(drop=True)
+    assert_update_matches_full(previous, current, mode='delta')
+
+
+def test_reordered_rows_match_full(make_gradebook, assert_update_matches_full):
+    previous = make_gradebook(200)
+    current = previous.sample(frac=1, random_state=0).reset_index(drop=True)
+    current.loc[0, 'Final'] += 5
+    assert_update_matches_full(previous, current, mode='delta')
+
+
+def test_large_change_is_recomputed(make_gradebook, assert_update_matches_full):
+    previous = make_gradebook(200)
+    current = previous.copy()
+    current.loc[:149, 'Final'] += 1
+    assert_update_matches_full(previous, current, mode='full')
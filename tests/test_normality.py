@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+import helper_methods
+# The test_* functions of helper_methods are used through the module, so pytest does not collect them as tests
+from helper_methods import NORMALITY_CHECKERS, get_default_params
+
+
+def make_groups() -> list:
+    rng = np.random.default_rng(6)
+    return [rng.normal(size=30), rng.exponential(size=45), rng.uniform(size=60), rng.standard_t(3, size=200)]
+
+
+def check_normality(groups: list, **params) -> pd.DataFrame:
+    names = [f'Group {i}' for i in range(len(groups))]
+    return helper_methods.test_normality(group_names=names, groups=groups, params={**get_default_params(), **params})
+
+
+@pytest.mark.parametrize('checker, reference', [
+    ('Shapiro-Wilk Test', 'shapiro'),
+    ("D'Agostino K-Squared Test", 'normaltest'),
+    ('Jarque-Bera Test', 'jarque_bera')
+])
+def test_checkers_match_scipy(checker, reference):
+    import scipy.stats
+    groups = make_groups()
+    summary = check_normality(groups, normality_checker=checker)
+    expected = np.array([tuple(getattr(scipy.stats, reference)(group)) for group in groups])
+    np.testing.assert_allclose(summary[['Statistic', 'p-Value']].to_numpy(), expected, rtol=1e-8)
+
+
+# scipy.stats.anderson asks newer versions to choose a p-value method; only its statistic is compared
+@pytest.mark.filterwarnings('ignore::FutureWarning')
+def test_anderson_darling_statistic_matches_scipy():
+    from scipy.stats import anderson
+    groups = make_groups()
+    summary = check_normality(groups, normality_checker='Anderson-Darling Test')
+    np.testing.assert_allclose(summary['Statistic'].to_numpy(), [anderson(group).statistic for group in groups], rtol=1e-8)
+    # The exponential and t(3) groups are far from normal, the normal group is not
+    assert summary['p-Value'].iloc[0] > 0.05
+    assert (summary['p-Value'].iloc[[1, 3]] < 0.05).all()
+
+
+@pytest.mark.parametrize('checker', NORMALITY_CHECKERS)
+def test_untestable_groups_have_no_conclusion(checker):
+    summary = check_normality([[1.0, 2.0], np.random.default_rng(0).normal(size=50)], normality_checker=checker)
+    assert pd.isna(summary['Normally Distributed?'].iloc[0])
+    assert summary['Normally Distributed?'].iloc[1] in (True, False)
+
+
+def test_large_groups_are_sampled():
+    groups = make_groups()
+    summary = check_normality(groups, normality_sample_size=40, seed=1)
+    assert summary['Sample Size'].tolist() == [30, 40, 40, 40]
+    pd.testing.assert_frame_equal(summary, check_normality(groups, normality_sample_size=40, seed=1))
+
+
+@pytest.mark.parametrize('center', ['mean', 'median', 'trimmed'])
+def test_levene_matches_scipy(center):
+    from scipy.stats import levene
+    groups = make_groups()
+    summary = helper_methods.test_homoskedasticity(groups=groups, params={**get_default_params(), 'center': center, 'proportiontocut': 0.1})
+    expected = levene(*groups, center=center, proportiontocut=0.1)
+    np.testing.assert_allclose(summary[['Statistic', 'p-Value']].to_numpy().ravel(), [expected.statistic, expected.pvalue], rtol=1e-10)
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pytest
+import helper_methods
+# The test_* functions of helper_methods are used through the module, so pytest does not collect them as tests
+from helper_methods import adjust_pvalues, get_default_params, iter_pair_blocks, pairwise_t_tests, select_top_pairs
+
+
+CORRECTIONS = ['None', 'Holm', 'Bonferroni']
+
+
+def make_groups(num_groups: int, size: int = 20, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [rng.normal(loc=i * 0.2, size=size) for i in range(num_groups)]
+
+
+def get_params(**params) -> dict:
+    return {**get_default_params(), **params}
+
+
+def assert_top_pairs_match(full: pd.DataFrame, top: pd.DataFrame, max_pairs: int) -> None:
+    """top holds max_pairs pairs of full with the smallest p-values, with the same statistics and adjusted p-values."""
+    assert len(top) == max_pairs
+    expected = full.sort_values('p-Value', kind='stable')['p-Value'].to_numpy()[:max_pairs]
+    np.testing.assert_allclose(np.sort(top['p-Value'].to_numpy()), expected)
+    pd.testing.assert_frame_equal(top, full.loc[top.index], check_exact=False)
+
+
+def test_iter_pair_blocks_covers_every_pair_once():
+    first, second = (np.concatenate(arrays) for arrays in zip(*iter_pair_blocks(13, block_size=7)))
+    expected_first, expected_second = np.triu_indices(13, k=1)
+    np.testing.assert_array_equal(first, expected_first)
+    np.testing.assert_array_equal(second, expected_second)
+
+
+def holm_reference(pvalues: np.ndarray) -> np.ndarray:
+    """Holm's step-down adjustment, one p-value at a time."""
+    order = np.argsort(pvalues, kind='stable')
+    adjusted = np.empty(len(pvalues))
+    running = 0.0
+    for step, i in enumerate(order):
+        running = max(running, min(1.0, (len(pvalues) - step) * pvalues[i]))
+        adjusted[i] = running
+    return adjusted
+
+
+@pytest.mark.parametrize('equal_var', [True, False])
+def test_pairwise_matches_scipy_ttest_ind(equal_var):
+    from scipy.stats import ttest_ind
+    rng = np.random.default_rng(3)
+    groups = [rng.normal(loc=i * 0.3, scale=1 + i, size=10 + 7 * i) for i in range(5)]
+    names = [f'Group {i}' for i in range(5)]
+    summary = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(), equal_var=equal_var)
+    for i, j in zip(*np.triu_indices(5, k=1)):
+        expected = ttest_ind(groups[i], groups[j], equal_var=equal_var)
+        row = summary.loc[(names[i], names[j])]
+        np.testing.assert_allclose([row['Statistic'], row['p-Value']], [expected.statistic, expected.pvalue], rtol=1e-10)
+
+
+@pytest.mark.parametrize('correction', ['Holm', 'Bonferroni'])
+def test_corrections_match_reference(correction):
+    groups = make_groups(8, seed=4)
+    names = [f'Group {i}' for i in range(8)]
+    raw = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(), equal_var=False)['p-Value'].to_numpy()
+    adjusted = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(correction=correction), equal_var=False)['p-Value'].to_numpy()
+    expected = holm_reference(raw) if correction == 'Holm' else np.minimum(raw * len(raw), 1.0)
+    np.testing.assert_allclose(adjusted, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('correction', CORRECTIONS)
+def test_pairwise_at_max_pairs_keeps_every_pair(correction):
+    groups = make_groups(10)
+    names = [f'Group {i}' for i in range(10)]
+    params = get_params(correction=correction, max_pairs=45, significant_pairs_only=False)
+    summary = helper_methods.test_pairwise(group_names=names, groups=groups, params=params, equal_var=True)
+    assert len(summary) == summary.attrs['total_pairs'] == 45
+
+
+@pytest.mark.parametrize('correction', CORRECTIONS)
+@pytest.mark.parametrize('equal_var', [True, False])
+def test_pairwise_above_max_pairs_matches_full(correction, equal_var):
+    groups = make_groups(10)
+    names = [f'Group {i}' for i in range(10)]
+    full = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(correction=correction, max_pairs=45), equal_var=equal_var)
+    top = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(correction=correction, max_pairs=44, significant_pairs_only=False), equal_var=equal_var)
+    assert top.attrs['total_pairs'] == 45
+    assert_top_pairs_match(full, top, max_pairs=44)
+
+
+@pytest.mark.parametrize('correction', CORRECTIONS)
+def test_pairwise_above_max_pairs_keeps_significant_pairs_of_full(correction):
+    groups = make_groups(12)
+    names = [f'Group {i}' for i in range(12)]
+    full = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(correction=correction), equal_var=True)
+    top = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(correction=correction, max_pairs=30), equal_var=True)
+    significant = full[full['Different?']]
+    assert top['Different?'].all()
+    assert len(top) == min(30, len(significant))
+    pd.testing.assert_frame_equal(top, full.loc[top.index], check_exact=False)
+
+
+@pytest.mark.parametrize('correction', CORRECTIONS)
+def test_pairwise_with_tied_pvalues_matches_full(correction):
+    # Identical groups give identical p-values for every pair they are in
+    base = make_groups(3)
+    groups = [base[0], base[0], base[1], base[1], base[2], base[2]]
+    names = [f'Group {i}' for i in range(6)]
+    full = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(correction=correction), equal_var=True)
+    for max_pairs in (4, 7, 14):
+        top = helper_methods.test_pairwise(group_names=names, groups=groups, params=get_params(correction=correction, max_pairs=max_pairs, significant_pairs_only=False), equal_var=True)
+        assert_top_pairs_match(full, top, max_pairs=max_pairs)
+
+
+@pytest.mark.parametrize('correction', CORRECTIONS)
+def test_select_top_pairs_over_many_blocks_matches_full(correction):
+    groups = make_groups(15)
+    counts = np.array([len(group) for group in groups])
+    means = np.array([group.mean() for group in groups])
+    variances = np.array([group.var(ddof=1) for group in groups])
+    _, _, _, pvalue = pairwise_t_tests(counts=counts, means=means, variances=variances, equal_var=False)
+    expected = np.sort(adjust_pvalues(pvalue, correction))[:20]
+
+    blocks = (pairwise_t_tests(counts=counts, means=means, variances=variances, equal_var=False, pairs=pairs) for pairs in iter_pair_blocks(15, block_size=9))
+    first, second, statistic, top_pvalue, num_tests = select_top_pairs(blocks, max_pairs=20)
+    assert num_tests == len(pvalue)
+    np.testing.assert_allclose(adjust_pvalues(top_pvalue, correction, num_tests=num_tests), expected)
+
+
+@pytest.mark.parametrize('correction', CORRECTIONS)
+def test_dunn_above_max_pairs_matches_full(correction):
+    groups = make_groups(10)
+    names = [f'Group {i}' for i in range(10)]
+    full = helper_methods.test_dunn(group_names=names, groups=groups, params=get_params(correction=correction))
+    top = helper_methods.test_dunn(group_names=names, groups=groups, params=get_params(correction=correction, max_pairs=44, significant_pairs_only=False))
+    assert_top_pairs_match(full, top, max_pairs=44)
+
+
+@pytest.mark.parametrize('correction', CORRECTIONS)
+def test_multi_measure_above_max_pairs_matches_full(correction):
+    rng = np.random.default_rng(0)
+    group = rng.integers(0, 12, size=600)
+    df = pd.DataFrame({'Quiz': rng.normal(size=600), 'Final': rng.normal(size=600) + group * 0.2, 'Group': group.astype(str)})
+    full = helper_methods.run_multi_measure_analysis(df, measure_vars=['Quiz', 'Final'], group_var='Group', params=get_params(correction=correction))
+    top = helper_methods.run_multi_measure_analysis(df, measure_vars=['Quiz', 'Final'], group_var='Group', params=get_params(correction=correction, max_pairs=40, significant_pairs_only=False))
+    assert top.attrs['total_pairs'] == 66
+    full_pairs = full.xs('Pairwise', level='Analysis')
+    top_pairs = top.xs('Pairwise', level='Analysis')
+    for measure in ['Quiz', 'Final']:
+        assert_top_pairs_match(full_pairs.loc[measure], top_pairs.loc[measure], max_pairs=40)
+    pd.testing.assert_frame_equal(top.drop(index='Pairwise', level='Analysis'), full.drop(index='Pairwise', level='Analysis'))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import helper_methods
+# The test_* functions of helper_methods are used through the module, so pytest does not collect them as tests
+from helper_methods import get_default_params
+
+
+def make_groups(ties: bool) -> list:
+    rng = np.random.default_rng(5)
+    groups = [rng.normal(loc=i * 0.4, size=8 + 5 * i) for i in range(5)]
+    # Rounding makes many values tie, within and across groups
+    return [group.round(0) for group in groups] if ties else groups
+
+
+def dunn_reference(groups: list) -> tuple:
+    """Dunn's z statistics and two-sided p-values of each pair, from a ranking of the pooled values."""
+    from scipy.stats import norm, rankdata
+    pooled = np.concatenate(groups)
+    ranks = np.split(rankdata(pooled), np.cumsum([len(group) for group in groups])[:-1])
+    total = len(pooled)
+    _, tie_counts = np.unique(pooled, return_counts=True)
+    variance = total * (total + 1) / 12 - np.sum(tie_counts ** 3 - tie_counts) / (12 * (total - 1))
+    statistic = np.array([
+        (ranks[i].mean() - ranks[j].mean()) / np.sqrt(variance * (1 / len(groups[i]) + 1 / len(groups[j])))
+        for i, j in zip(*np.triu_indices(len(groups), k=1))
+    ])
+    return statistic, 2 * norm.sf(np.abs(statistic))
+
+
+@pytest.mark.parametrize('ties', [False, True])
+def test_kruskal_matches_scipy(ties):
+    from scipy.stats import kruskal
+    groups = make_groups(ties)
+    summary = helper_methods.test_kruskal(groups=groups, params=get_default_params())
+    expected = kruskal(*groups)
+    np.testing.assert_allclose(summary[['Statistic', 'p-Value']].to_numpy().ravel(), [expected.statistic, expected.pvalue], rtol=1e-10)
+
+
+@pytest.mark.parametrize('ties', [False, True])
+def test_dunn_matches_reference(ties):
+    groups = make_groups(ties)
+    names = [f'Group {i}' for i in range(len(groups))]
+    summary = helper_methods.test_dunn(group_names=names, groups=groups, params=get_default_params())
+    statistic, pvalue = dunn_reference(groups)
+    np.testing.assert_allclose(summary['Statistic'].to_numpy(), statistic, rtol=1e-10)
+    np.testing.assert_allclose(summary['p-Value'].to_numpy(), pvalue, rtol=1e-10)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+import helper_methods
+# The test_* functions of helper_methods are used through the module, so pytest does not collect them as tests
+from helper_methods import get_bootstrap_intervals, get_default_params, get_resample_count, get_resampling_batches
+
+
+def make_groups() -> list:
+    rng = np.random.default_rng(8)
+    return [rng.normal(loc=0.3 * i, size=15 + 5 * i) for i in range(4)]
+
+
+def get_params(**params) -> dict:
+    # A tiny memory budget splits the resamples into many batches
+    return {**get_default_params(), 'n_resamples': 2000, 'resampling_memory_mb': 0.01, **params}
+
+
+def test_batches_cover_every_resample_within_the_budget():
+    batches = get_resampling_batches(10001, row_size=500, memory_budget_mb=1, seed=0)
+    sizes = [size for size, _ in batches]
+    assert sum(sizes) == 10001
+    assert max(sizes) * 500 * 8 <= 2**20
+    assert len({seed.entropy for _, seed in batches}) == 1
+    assert len({tuple(seed.spawn_key) for _, seed in batches}) == len(batches)
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_results_do_not_depend_on_workers(workers):
+    groups = make_groups()
+    names = [f'Group {i}' for i in range(len(groups))]
+    one = get_params(resampling_workers=1)
+    many = get_params(resampling_workers=workers)
+    pd.testing.assert_frame_equal(helper_methods.test_permutation_anova(groups=groups, params=many), helper_methods.test_permutation_anova(groups=groups, params=one))
+    for table, expected in zip(get_bootstrap_intervals(names, groups, many), get_bootstrap_intervals(names, groups, one)):
+        pd.testing.assert_frame_equal(table, expected)
+
+
+def test_permutation_anova_matches_scipy_permutation_test():
+    from scipy.stats import f_oneway, permutation_test
+    groups = make_groups()
+    summary = helper_methods.test_permutation_anova(groups=groups, params=get_params())
+    expected = permutation_test(groups, lambda *samples, axis: f_oneway(*samples, axis=axis).statistic, n_resamples=2000, alternative='greater', vectorized=True, random_state=0)
+    assert summary['Statistic'].iloc[0] == pytest.approx(expected.statistic)
+    # Different random shuffles, so only close: the standard error of either p-value is below 0.011
+    assert summary['p-Value'].iloc[0] == pytest.approx(expected.pvalue, abs=0.05)
+
+
+def test_bootstrap_intervals_hold_the_observed_means():
+    groups = make_groups()
+    names = [f'Group {i}' for i in range(len(groups))]
+    means, differences = get_bootstrap_intervals(names, groups, get_params())
+    np.testing.assert_allclose(means['Mean'].to_numpy(), [group.mean() for group in groups])
+    assert ((means['Lower'] < means['Mean']) & (means['Mean'] < means['Upper'])).all()
+    assert ((differences['Lower'] < differences['Difference']) & (differences['Difference'] < differences['Upper'])).all()
+    assert means.attrs['resamples'] == 2000
+
+
+def test_resamples_are_capped_with_a_warning():
+    groups = make_groups()
+    num_values = sum(len(group) for group in groups)
+    params = get_params(max_resampled_values=1500 * num_values)
+    # Never fewer than 1000 resamples, however low the cap
+    assert get_resample_count(num_values, get_params(max_resampled_values=1)) == 1000
+    with pytest.warns(UserWarning, match='Only 1500 of the requested 2000'):
+        summary = helper_methods.test_permutation_anova(groups=groups, params=params)
+    assert summary['Permutations'].iloc[0] == 1500
+    assert 'warning' in summary.attrs
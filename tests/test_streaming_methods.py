@@ -0,0 +1,50 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from helper_methods import GroupingError, get_default_params
+from streaming_methods import run_streaming_analysis
+
+# Tables computed from the exact merged statistics; normality and homoskedasticity use samples of large groups. The pairwise tests also depend on the homoskedasticity conclusion, so the samples are seeded
+EXACT_TABLES = ['descriptive_stats', 'anova', 'pairwise']
+EXACT_COLUMNS = {'descriptive_stats': ['Min', 'Max', 'Mean', 'Standard Deviation']}
+
+
+def stream(text: str, chunksize: int, sample_size: int = 5000) -> dict:
+    return run_streaming_analysis(io.StringIO(text), measure_var='Final', group_var='Race', params=get_default_params(), chunksize=chunksize, sample_size=sample_size, seed=0)
+
+
+@pytest.mark.parametrize('chunksize', [7, 100, 1000])
+def test_streamed_chunks_match_full(chunksize, make_gradebook, assert_matches_full):
+    rng = np.random.default_rng(1)
+    gradebook = make_gradebook(1000, groups=rng.choice(['A', 'B', 'C'], size=1000))
+    assert_matches_full(stream(gradebook.to_csv(index=False), chunksize=chunksize), gradebook, tables=EXACT_TABLES, columns=EXACT_COLUMNS)
+
+
+def test_whole_number_groups_missing_in_some_chunks_match_full(make_gradebook, assert_matches_full):
+    rng = np.random.default_rng(1)
+    grades = pd.array(rng.integers(9, 13, size=1000), dtype='Int64')
+    # Only the chunks holding these rows are read with a float group column
+    grades[[150, 720]] = pd.NA
+    gradebook = make_gradebook(1000, groups=grades)
+    streamed = stream(gradebook.to_csv(index=False), chunksize=100)
+    assert streamed['descriptive_stats'].index.tolist() == ['10', '11', '12', '9']
+    assert_matches_full(streamed, gradebook, tables=EXACT_TABLES, columns=EXACT_COLUMNS)
+
+
+def test_small_samples_keep_exact_statistics(make_gradebook, assert_matches_full):
+    rng = np.random.default_rng(1)
+    gradebook = make_gradebook(1000, groups=rng.choice(['A', 'B', 'C'], size=1000))
+    streamed = stream(gradebook.to_csv(index=False), chunksize=64, sample_size=50)
+    assert streamed['descriptive_stats']['Approximate?'].all()
+    assert (streamed['normality']['Sample Size'] == 50).all()
+    assert_matches_full(streamed, gradebook, tables=EXACT_TABLES, columns=EXACT_COLUMNS)
+
+
+def test_too_many_groups_stops_reading_early(make_gradebook):
+    num_rows = 200000
+    text = make_gradebook(num_rows, groups=np.arange(num_rows)).to_csv(index=False)
+    file = io.StringIO(text)
+    with pytest.raises(GroupingError):
+        run_streaming_analysis(file, measure_var='Final', group_var='Race', params=get_default_params(), chunksize=500)
+    assert file.tell() < len(text) / 10
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+import helper_methods
+# The test_* functions of helper_methods are used through the module, so pytest does not collect them as tests
+from helper_methods import get_cells, get_default_params
+
+
+def make_data(empty_cell: bool) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    num_rows = 240
+    df = pd.DataFrame({'School': rng.choice(['North', 'South', 'East'], size=num_rows), 'Grade': rng.choice(['9', '10', '11', '12'], size=num_rows)})
+    df['Final'] = rng.normal(loc=70, scale=10, size=num_rows) + (df['School'] == 'North') * 3 + (df['Grade'] == '12') * (df['School'] == 'East') * 6
+    if empty_cell:
+        df = df[~((df['School'] == 'South') & (df['Grade'] == '9'))]
+    return df
+
+
+def residual_sum_of_squares(y: np.ndarray, *blocks: np.ndarray) -> tuple:
+    """Residual sum of squares and rank of the least-squares fit of y on an intercept and the columns of blocks."""
+    design = np.column_stack([np.ones(len(y)), *blocks])
+    coefficients = np.linalg.lstsq(design, y, rcond=None)[0]
+    return np.sum((y - design @ coefficients) ** 2), np.linalg.matrix_rank(design)
+
+
+def type_ii_reference(df: pd.DataFrame) -> tuple:
+    """Type II sums of squares and degrees of freedom of School, Grade, their interaction and the residual, from ordinary least squares fits."""
+    y = df['Final'].to_numpy()
+    first = pd.get_dummies(df['School']).to_numpy(dtype=float)
+    second = pd.get_dummies(df['Grade']).to_numpy(dtype=float)
+    interaction = pd.get_dummies(df['School'] + ':' + df['Grade']).to_numpy(dtype=float)
+    rss_first, rank_first = residual_sum_of_squares(y, first)
+    rss_second, rank_second = residual_sum_of_squares(y, second)
+    rss_additive, rank_additive = residual_sum_of_squares(y, first, second)
+    rss_full, rank_full = residual_sum_of_squares(y, first, second, interaction)
+    sums_of_squares = [rss_second - rss_additive, rss_first - rss_additive, rss_additive - rss_full, rss_full]
+    dof = [rank_additive - rank_second, rank_additive - rank_first, rank_full - rank_additive, len(y) - rank_full]
+    return np.array(sums_of_squares), np.array(dof, dtype=float)
+
+
+@pytest.mark.parametrize('empty_cell', [False, True])
+def test_two_way_anova_matches_ols_type_ii(empty_cell):
+    from scipy.stats import f
+    df = make_data(empty_cell)
+    cells, groups = get_cells(df=df, measure_var='Final', group_vars=['School', 'Grade'])
+    summary = helper_methods.test_two_way_anova(cells=cells, groups=groups, params=get_default_params())
+    sums_of_squares, dof = type_ii_reference(df)
+    np.testing.assert_allclose(summary['Sum of Squares'].to_numpy(), sums_of_squares, rtol=1e-8)
+    np.testing.assert_array_equal(summary['Degrees of Freedom'].to_numpy(), dof)
+    statistic = sums_of_squares[:3] / dof[:3] / (sums_of_squares[3] / dof[3])
+    np.testing.assert_allclose(summary['Statistic'].to_numpy()[:3], statistic, rtol=1e-8)
+    np.testing.assert_allclose(summary['p-Value'].to_numpy()[:3], f.sf(statistic, dof[:3], dof[3]), rtol=1e-8)